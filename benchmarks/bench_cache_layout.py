@@ -0,0 +1,101 @@
+"""Compare Redis memory per URL cache entry between the cache layouts.
+
+Usage:
+    REDIS_URL=redis://localhost:6379/15 \\
+        python -m benchmarks.bench_cache_layout --entries 100000
+
+Memory is measured as the change in the server's `used_memory`, so run it
+against an otherwise idle Redis. Entries written by the benchmark use slugs of
+`bench.example.com` URLs and are removed afterwards; with the default bucket
+count, the server's `hash-max-*-entries` and `hash-max-*-value` limits decide
+whether buckets keep the compact encoding (see docker-compose.yml).
+"""
+
+import argparse
+import asyncio
+import os
+from datetime import datetime, timezone
+
+from redis.asyncio import Redis
+
+from src.cachelayout import (
+    CACHE_BUCKET_COUNT,
+    CACHE_BUCKET_SWEEP_ENTRIES,
+    BucketLayout,
+    KeyLayout,
+)
+from src.helpers import shorten_url
+from src.models import URLMapping
+
+BATCH_SIZE = 1000
+TTL_SECONDS = 3600
+
+
+def build_entries(count: int) -> list[tuple[str, str, int]]:
+    created_at = datetime.now(timezone.utc)
+    entries = {}
+    for i in range(count):
+        original_url = f"https://bench.example.com/articles/{i}/some-title"
+        slug = shorten_url(original_url)
+        mapping = URLMapping(
+            slug=slug, original_url=original_url, created_at=created_at
+        )
+        entries[slug] = (slug, mapping.to_cache_value(), TTL_SECONDS)
+    return list(entries.values())
+
+
+async def used_memory(redis: Redis) -> int:
+    return (await redis.info("memory"))["used_memory"]
+
+
+async def measure(redis: Redis, layout, entries) -> float:
+    before = await used_memory(redis)
+    for start in range(0, len(entries), BATCH_SIZE):
+        await layout.setMany(redis, entries[start : start + BATCH_SIZE])
+    return (await used_memory(redis) - before) / len(entries)
+
+
+async def cleanup(redis: Redis, layout, entries):
+    slugs = [slug for slug, _, _ in entries]
+    async with redis.pipeline(transaction=False) as pipe:
+        for slug in slugs:
+            if isinstance(layout, BucketLayout):
+                pipe.hdel(layout.bucketKey(slug), slug)
+            else:
+                pipe.delete(f"url:{slug}")
+        await pipe.execute()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--buckets", type=int, default=CACHE_BUCKET_COUNT)
+    args = parser.parse_args()
+
+    redis = Redis.from_url(
+        os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True
+    )
+    entries = build_entries(args.entries)
+    layouts = {
+        "keys": KeyLayout(),
+        "buckets": BucketLayout(args.buckets, CACHE_BUCKET_SWEEP_ENTRIES, False),
+    }
+    try:
+        for name, layout in layouts.items():
+            try:
+                bytes_per_entry = await measure(redis, layout, entries)
+                line = f"{name:>8}: {bytes_per_entry:,.1f} bytes/entry"
+                if isinstance(layout, BucketLayout):
+                    encoding = await redis.object(
+                        "encoding", layout.bucketKey(entries[0][0])
+                    )
+                    line += f" ({args.buckets} buckets, {encoding} encoding)"
+                print(line)
+            finally:
+                await cleanup(redis, layout, entries)
+    finally:
+        await redis.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""Compare the batch slug helpers with their one-at-a-time counterparts.
+
+Usage:
+    python -m benchmarks.bench_helpers --count 200000 --repeat 5
+
+Each pair is timed on the same inputs, and their results are checked to be
+identical. `shorten_url` is called without its LFU cache, which only helps
+when URLs repeat.
+"""
+
+import argparse
+import random
+import timeit
+
+from src.helpers import (
+    DEFAULT_LENGTH,
+    SLUG_SPACE,
+    decode,
+    decode_many,
+    encode,
+    encode_many,
+    shorten_url,
+    shorten_urls,
+)
+
+
+def best_of(function, repeat: int) -> float:
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    numbers = [rng.randrange(SLUG_SPACE) for _ in range(args.count)]
+    slugs = encode_many(numbers)
+    urls = [f"https://bench.example.com/articles/{i}" for i in range(args.count)]
+    uncached_shorten_url = shorten_url.__wrapped__
+
+    cases = {
+        "encode": (
+            lambda: [encode(number).rjust(DEFAULT_LENGTH, "0") for number in numbers],
+            lambda: encode_many(numbers),
+        ),
+        "decode": (
+            lambda: [decode(slug) for slug in slugs],
+            lambda: decode_many(slugs),
+        ),
+        "shorten": (
+            lambda: [uncached_shorten_url(url) for url in urls],
+            lambda: shorten_urls(urls),
+        ),
+    }
+    for name, (single, batch) in cases.items():
+        if single() != batch():
+            raise AssertionError(f"{name}: batch results differ")
+        single_seconds = best_of(single, args.repeat)
+        batch_seconds = best_of(batch, args.repeat)
+        print(
+            f"{name:>8}: {args.count / single_seconds:>12,.0f}/s one at a time, "
+            f"{args.count / batch_seconds:>12,.0f}/s batched "
+            f"({single_seconds / batch_seconds:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Compare rate limiter backend throughput against local Postgres and Redis.
+
+Usage:
+    DATABASE_URL=postgresql://... REDIS_URL=redis://localhost:6379/0 \\
+        python -m benchmarks.bench_ratelimit --requests 20000 --concurrency 50
+
+The `rate_limits` table from init.sql must exist. Keys written by the benchmark
+use the `bench-` IP prefix and are removed afterwards.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import asyncpg
+from redis.asyncio import Redis
+
+from src.ratelimit import createRateLimiter
+
+IP_PREFIX = "bench-"
+
+
+async def run_backend(backend, pool, redis, requests, concurrency, ips):
+    limiter = createRateLimiter(backend)
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(f"{IP_PREFIX}{i % ips}")
+
+    async def worker():
+        while not queue.empty():
+            client_ip = queue.get_nowait()
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    await limiter.hit(conn, redis, client_ip)
+
+    async def redis_worker():
+        while not queue.empty():
+            await limiter.hit(None, redis, queue.get_nowait())
+
+    start = time.perf_counter()
+    target = worker if backend == "postgres" else redis_worker
+    await asyncio.gather(*(target() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return requests / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--ips", type=int, default=100)
+    args = parser.parse_args()
+
+    pool = await asyncpg.create_pool(
+        os.environ["DATABASE_URL"], min_size=5, max_size=20
+    )
+    redis = Redis.from_url(
+        os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True
+    )
+    try:
+        for backend in ("postgres", "redis"):
+            rate = await run_backend(
+                backend, pool, redis, args.requests, args.concurrency, args.ips
+            )
+            print(f"{backend:>8}: {rate:,.0f} checks/s")
+    finally:
+        await pool.execute(
+            "DELETE FROM rate_limits WHERE ip_address LIKE $1", f"{IP_PREFIX}%"
+        )
+        keys = [key async for key in redis.scan_iter(f"ratelimit:{IP_PREFIX}*")]
+        if keys:
+            await redis.delete(*keys)
+        await pool.close()
+        await redis.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
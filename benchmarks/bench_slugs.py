@@ -0,0 +1,100 @@
+"""Compare slug strategies: allocation throughput and round trips per shorten.
+
+Usage:
+    python -m benchmarks.bench_slugs --shortens 20000 --block-size 1000
+
+Each strategy first allocates `--shortens` slugs one at a time with no
+latency, which measures the local cost of allocation. It then runs the same
+number of `generateSlug` calls against the in-memory stand-ins, with
+`--db-latency-ms` and `--redis-latency-ms` per round trip and `--concurrency`
+calls in flight, and reports throughput and Postgres queries and Redis
+commands per shorten.
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.standins import StandinDatabase, StandinPool, StandinRedis
+from src import services
+from src.slugs import HashSlugs, SequenceSlugs
+
+
+def build_allocators(block_size: int) -> dict:
+    return {
+        "hash": lambda: HashSlugs(),
+        "sequence/postgres": lambda: SequenceSlugs("postgres", block_size),
+        "sequence/redis": lambda: SequenceSlugs("redis", block_size),
+    }
+
+
+async def allocation_rate(allocator, shortens: int) -> float:
+    pool = StandinPool(StandinDatabase())
+    redis = StandinRedis()
+    async with pool.acquire() as conn:
+        start = time.perf_counter()
+        for i in range(shortens):
+            await allocator.allocate(conn, redis, [f"https://bench.example.com/{i}"])
+        return shortens / (time.perf_counter() - start)
+
+
+async def shorten_load(
+    allocator, shortens: int, concurrency: int, db_latency: float, redis_latency: float
+) -> dict:
+    db = StandinDatabase(db_latency)
+    pool = StandinPool(db)
+    redis = StandinRedis(redis_latency)
+    queue = iter(range(shortens))
+
+    async def worker():
+        for i in queue:
+            async with pool.acquire() as conn:
+                await services.generateSlug(
+                    conn, redis, f"https://bench.example.com/{i}"
+                )
+
+    services.slug_allocator = allocator
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "rate": shortens / elapsed,
+        "queries": db.queries / shortens,
+        "commands": redis.commands / shortens,
+        "mappings": len(db.url_mappings),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shortens", type=int, default=20000)
+    parser.add_argument("--block-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--db-latency-ms", type=float, default=1.0)
+    parser.add_argument("--redis-latency-ms", type=float, default=0.2)
+    args = parser.parse_args()
+
+    original = services.slug_allocator
+    try:
+        for name, create in build_allocators(args.block_size).items():
+            rate = await allocation_rate(create(), args.shortens)
+            load = await shorten_load(
+                create(),
+                args.shortens,
+                args.concurrency,
+                args.db_latency_ms / 1000,
+                args.redis_latency_ms / 1000,
+            )
+            print(
+                f"{name:>18}: {rate:>10,.0f} slugs/s allocated, "
+                f"{load['rate']:>7,.0f} shortens/s, "
+                f"{load['queries']:.3f} queries and "
+                f"{load['commands']:.3f} Redis commands per shorten, "
+                f"{load['mappings']} distinct slugs"
+            )
+    finally:
+        services.slug_allocator = original
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
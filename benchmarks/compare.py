@@ -0,0 +1,35 @@
+"""Compare two benchmark result files written by `benchmarks.run`.
+
+python -m benchmarks.compare baseline.json candidate.json
+"""
+
+import argparse
+import json
+
+FIELDS = ("throughput", "p50_ms", "p99_ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    with open(args.baseline) as baseline_file, open(args.candidate) as candidate_file:
+        baseline, candidate = json.load(baseline_file), json.load(candidate_file)
+
+    print(f"{'':>20} {baseline['commit']:>12} {candidate['commit']:>12} {'change':>8}")
+    for route in ("redirect", "shorten"):
+        for field in FIELDS:
+            before = baseline["results"][route][field]
+            after = candidate["results"][route][field]
+            change = (after - before) / before if before else 0.0
+            label = f"{route} {field}"
+            print(f"{label:>20} {before:>12.2f} {after:>12.2f} {change:>+8.1%}")
+    before = baseline["results"]["cache_hit_rate"]
+    after = candidate["results"]["cache_hit_rate"]
+    print(f"{'cache_hit_rate':>20} {before:>12.1%} {after:>12.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""Load test the redirect and shorten routes and save the results as JSON.
+
+The application is driven either in-process through the ASGI transport or over
+HTTP through a uvicorn subprocess, against in-memory stand-ins or the services
+from DATABASE_URL and REDIS_URL (e.g. `docker-compose up db redis`):
+
+    python -m benchmarks.run --mode asgi --backend standins
+    python -m benchmarks.run --mode uvicorn --backend services
+
+Redirect slugs are drawn from a Zipf distribution over the slugs created during
+setup, and `--shorten-ratio` of the requests shorten a new URL instead.
+Results are written to `benchmarks/results/` unless `--output` is given and can
+be compared with `python -m benchmarks.compare`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from itertools import accumulate
+from pathlib import Path
+
+import httpx
+
+RESULTS_DIR = Path(__file__).parent / "results"
+BATCH_SIZE = 500
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument(
+        "--backend", choices=["standins", "services"], default="standins"
+    )
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--slugs", type=int, default=10000)
+    parser.add_argument("--zipf-s", type=float, default=1.1)
+    parser.add_argument("--shorten-ratio", type=float, default=0.05)
+    parser.add_argument("--db-latency-ms", type=float, default=0.5)
+    parser.add_argument("--redis-latency-ms", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path)
+    return parser.parse_args()
+
+
+def configure_environment(args):
+    os.environ["BENCH_BACKEND"] = args.backend
+    os.environ["BENCH_DB_LATENCY_MS"] = str(args.db_latency_ms)
+    os.environ["BENCH_REDIS_LATENCY_MS"] = str(args.redis_latency_ms)
+
+
+def build_workload(args, slugs: list[str]) -> list[tuple[str, str]]:
+    rng = random.Random(args.seed)
+    weights = list(
+        accumulate(1 / rank**args.zipf_s for rank in range(1, len(slugs) + 1))
+    )
+    workload = []
+    for i in range(args.requests):
+        if rng.random() < args.shorten_ratio:
+            workload.append(("shorten", f"https://bench.example.com/new/{i}"))
+        else:
+            workload.append(("redirect", rng.choices(slugs, cum_weights=weights)[0]))
+    return workload
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def parse_cache_requests(metrics_text: str) -> dict[str, float]:
+    counts = {}
+    for line in metrics_text.splitlines():
+        if line.startswith("minime_cache_requests_total{"):
+            labels, value = line.rsplit(" ", 1)
+            counts[labels] = float(value)
+    return counts
+
+
+async def create_slugs(client: httpx.AsyncClient, count: int) -> list[str]:
+    slugs = []
+    for start in range(0, count, BATCH_SIZE):
+        urls = [
+            f"https://bench.example.com/page/{i}"
+            for i in range(start, min(start + BATCH_SIZE, count))
+        ]
+        response = await client.post("/shorten/batch", json={"urls": urls})
+        response.raise_for_status()
+        slugs.extend(mapping["slug"] for mapping in response.json())
+    return slugs
+
+
+async def drive(client: httpx.AsyncClient, workload, concurrency: int) -> dict:
+    latencies: dict[str, list[float]] = {"redirect": [], "shorten": []}
+    errors: dict[str, int] = {"redirect": 0, "shorten": 0}
+    expected = {"redirect": 307, "shorten": 200}
+    position = iter(workload)
+
+    async def worker():
+        for route, value in position:
+            start = time.perf_counter()
+            if route == "redirect":
+                response = await client.get(f"/{value}")
+            else:
+                response = await client.post("/shorten", json={"url": value})
+            latencies[route].append(time.perf_counter() - start)
+            if response.status_code != expected[route]:
+                errors[route] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    results = {"elapsed_seconds": elapsed, "throughput": len(workload) / elapsed}
+    for route, values in latencies.items():
+        values.sort()
+        results[route] = {
+            "requests": len(values),
+            "errors": errors[route],
+            "throughput": len(values) / elapsed,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+        }
+    return results
+
+
+async def benchmark(client: httpx.AsyncClient, args) -> dict:
+    slugs = await create_slugs(client, args.slugs)
+    workload = build_workload(args, slugs)
+
+    before = parse_cache_requests((await client.get("/metrics")).text)
+    results = await drive(client, workload, args.concurrency)
+    after = parse_cache_requests((await client.get("/metrics")).text)
+
+    delta = {key: after.get(key, 0) - before.get(key, 0) for key in after}
+    # Every redirect that misses all the cache layers ends with one Redis miss,
+    # counted even when Redis is skipped. Redirects are the denominator, since
+    # those served by the ASGI fast path are not counted by layer.
+    misses = delta.get('minime_cache_requests_total{layer="redis",result="miss"}', 0)
+    redirects = results["redirect"]["requests"]
+    results["cache_hit_rate"] = 1 - misses / redirects if redirects else 0.0
+    results["cache_requests"] = delta
+    return results
+
+
+async def run_asgi(args) -> dict:
+    from benchmarks.serve import app
+    from src.app import shutdown_event, startup_event
+
+    await startup_event()
+    try:
+        transport = httpx.ASGITransport(app=app, client=("127.0.0.1", 50000))
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            return await benchmark(client, args)
+    finally:
+        await shutdown_event()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_uvicorn(args) -> dict:
+    port = free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "benchmarks.serve:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        env=os.environ.copy(),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+            for _ in range(100):
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn did not become healthy")
+            return await benchmark(client, args)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    runner = run_asgi if args.mode == "asgi" else run_uvicorn
+    results = asyncio.run(runner(args))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            key: str(value) if isinstance(value, Path) else value
+            for key, value in vars(args).items()
+        },
+        "results": results,
+    }
+    output = args.output or RESULTS_DIR / (
+        f"{report['commit']}-{args.mode}-{args.backend}-"
+        f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    print(f"throughput: {results['throughput']:,.0f} req/s")
+    for route in ("redirect", "shorten"):
+        stats = results[route]
+        print(
+            f"{route:>9}: {stats['throughput']:,.0f} req/s, "
+            f"p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms, "
+            f"{stats['errors']} errors"
+        )
+    print(f"cache hit rate: {results['cache_hit_rate']:.1%}")
+    print(f"results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
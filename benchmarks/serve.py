@@ -0,0 +1,48 @@
+"""The application wired to stand-in or real backends, for benchmarking.
+
+With `BENCH_BACKEND=standins` (the default) the startup hook builds in-memory
+stand-ins instead of connecting to Postgres and Redis; with
+`BENCH_BACKEND=services` it uses DATABASE_URL and REDIS_URL as usual.
+
+    uvicorn benchmarks.serve:app
+"""
+
+import os
+from types import SimpleNamespace
+
+# Settings are read at import time, so they must be in place before `src` loads.
+os.environ.setdefault("RATE_LIMIT_REQUESTS", str(10**9))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("LOG_FILE", os.devnull)
+
+import src.app  # noqa: E402
+from benchmarks.standins import (  # noqa: E402
+    StandinDatabase,
+    StandinPool,
+    StandinRedis,
+)
+
+BENCH_BACKEND = os.getenv("BENCH_BACKEND", "standins")
+BENCH_DB_LATENCY_MS = float(os.getenv("BENCH_DB_LATENCY_MS", 0.5))
+BENCH_REDIS_LATENCY_MS = float(os.getenv("BENCH_REDIS_LATENCY_MS", 0.2))
+
+
+def useStandins(db_latency_ms: float, redis_latency_ms: float):
+    """Make the regular startup hook create stand-ins instead of connections."""
+
+    async def create_pool(*args, **kwargs):
+        return StandinPool(
+            StandinDatabase(db_latency_ms / 1000), kwargs.get("max_size", 20)
+        )
+
+    def from_url(*args, **kwargs):
+        return StandinRedis(redis_latency_ms / 1000)
+
+    src.app.asyncpg = SimpleNamespace(create_pool=create_pool)
+    src.app.Redis = SimpleNamespace(from_url=from_url)
+
+
+if BENCH_BACKEND == "standins":
+    useStandins(BENCH_DB_LATENCY_MS, BENCH_REDIS_LATENCY_MS)
+
+app = src.app.app
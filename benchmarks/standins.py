@@ -0,0 +1,385 @@
+"""In-memory stand-ins for the Postgres pool and Redis client used by the app.
+
+They implement only the calls made by `src`, answer them from dictionaries and
+optionally sleep for a fixed round-trip time, so that benchmarks can run the
+real application code without external services. Postgres statements are
+recognised by the table and verb they use, not parsed.
+
+Setting `fault` on a database or Redis stand-in to an exception makes every
+round trip (and, for the database, every pool checkout) raise it, which lets
+tests simulate an outage.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from fnmatch import fnmatch
+from typing import Any, Optional
+
+
+class StandinTransaction:
+    async def start(self):
+        pass
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class StandinConnection:
+    def __init__(self, db: "StandinDatabase"):
+        self.db = db
+
+    def transaction(self) -> StandinTransaction:
+        return StandinTransaction()
+
+    async def fetchrow(self, query: str, *args: Any) -> Optional[dict]:
+        rows = await self.fetch(query, *args)
+        return rows[0] if rows else None
+
+    async def fetchval(self, query: str, *args: Any) -> Any:
+        row = await self.fetchrow(query, *args)
+        return next(iter(row.values())) if row else None
+
+    async def fetch(self, query: str, *args: Any) -> list[dict]:
+        await self.db.roundtrip()
+        return self.db.run(" ".join(query.split()), args)
+
+    async def execute(self, query: str, *args: Any) -> str:
+        rows = await self.fetch(query, *args)
+        return f"OK {len(rows)}"
+
+    async def copy_records_to_table(self, table: str, records, columns):
+        await self.db.roundtrip()
+        self.db.tables.setdefault(table, []).extend(records)
+
+    async def cursor(self, query: str, *args: Any, prefetch: int = 0):
+        for row in self.db.run(" ".join(query.split()), args):
+            yield row
+
+
+class _Acquire:
+    def __init__(self, pool: "StandinPool"):
+        self.pool = pool
+        self.conn: Optional[StandinConnection] = None
+
+    def __await__(self):
+        return self.pool._acquire().__await__()
+
+    async def __aenter__(self) -> StandinConnection:
+        self.conn = await self.pool._acquire()
+        return self.conn
+
+    async def __aexit__(self, *exc_info):
+        await self.pool.release(self.conn)
+
+
+class StandinDatabase:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.url_mappings: dict[str, dict] = {}
+        self.rate_limits: dict[str, dict] = {}
+        self.tables: dict[str, list] = {}
+        self.sequences: dict[str, int] = {}
+        self.queries = 0
+        self.fault: Optional[BaseException] = None
+
+    async def roundtrip(self):
+        self.queries += 1
+        if self.fault is not None:
+            raise self.fault
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _upsert(
+        self,
+        slug: str,
+        original_url: str,
+        permanent: bool,
+        expires_at,
+        skip_unchanged: bool = False,
+        overwrite: bool = True,
+    ) -> Optional[dict]:
+        current = self.url_mappings.get(slug)
+        if current is not None and not overwrite:
+            return None
+        if (
+            skip_unchanged
+            and current is not None
+            and (current["original_url"], current["permanent"], current["expires_at"])
+            == (original_url, permanent, expires_at)
+        ):
+            return None
+        row = {
+            "slug": slug,
+            "original_url": original_url,
+            "created_at": datetime.now(timezone.utc),
+            "permanent": permanent,
+            "expires_at": expires_at,
+        }
+        self.url_mappings[slug] = row
+        return row
+
+    def run(self, query: str, args: tuple) -> list[dict]:
+        skip_unchanged = "IS DISTINCT FROM" in query
+        overwrite = "DO NOTHING" not in query
+        if query.startswith("INSERT INTO url_mappings") and "unnest" in query:
+            slugs, urls, permanent, expires_at = args
+            rows = [
+                self._upsert(
+                    slug, url, permanent, expires_at, skip_unchanged, overwrite
+                )
+                for slug, url in zip(slugs, urls)
+            ]
+            return [row for row in rows if row is not None]
+        if query.startswith("INSERT INTO url_mappings"):
+            row = self._upsert(*args, skip_unchanged=skip_unchanged)
+            return [row] if row else []
+        if query.startswith("SELECT slug, original_url, created_at, permanent,"):
+            slugs = args[0] if isinstance(args[0], list) else [args[0]]
+            rows = [self.url_mappings.get(slug) for slug in slugs]
+            return [row for row in rows if row]
+        if query.startswith("SELECT slug FROM url_mappings"):
+            return [{"slug": slug} for slug in list(self.url_mappings)]
+        if query.startswith('SELECT max(slug COLLATE "C")'):
+            slugs = [
+                slug
+                for slug in self.url_mappings
+                if len(slug) == args[0] and slug.isascii() and slug.isalnum()
+            ]
+            return [{"max": max(slugs, default=None)}]
+        if query.startswith("SELECT setval('url_slug_ids', $1)"):
+            last_value = max(self.sequences.get("url_slug_ids", 0), args[0])
+            self.sequences["url_slug_ids"] = last_value
+            return [{"setval": last_value}]
+        if query.startswith("SELECT nextval('url_slug_ids')"):
+            start = self.sequences.get("url_slug_ids", 0)
+            self.sequences["url_slug_ids"] = start + args[0]
+            return [{"id": start + i} for i in range(1, args[0] + 1)]
+        if query.startswith("INSERT INTO rate_limits"):
+            client_ip, now, window_start, cost = args
+            row = self.rate_limits.get(client_ip)
+            if row is None or row["last_request"] < window_start:
+                count = cost
+            else:
+                count = row["request_count"] + cost
+            row = {"ip_address": client_ip, "request_count": count, "last_request": now}
+            self.rate_limits[client_ip] = row
+            return [row]
+        raise NotImplementedError(f"Stand-in database cannot run: {query[:60]}")
+
+
+class StandinPool:
+    def __init__(self, db: StandinDatabase, max_size: int = 20):
+        self.db = db
+        self._max_size = max_size
+        self._semaphore = asyncio.Semaphore(max_size)
+        self._in_use = 0
+
+    def acquire(self, *, timeout: Optional[float] = None) -> _Acquire:
+        return _Acquire(self)
+
+    async def _acquire(self) -> StandinConnection:
+        if self.db.fault is not None:
+            raise self.db.fault
+        await self._semaphore.acquire()
+        self._in_use += 1
+        return StandinConnection(self.db)
+
+    async def release(self, conn: StandinConnection, *, timeout=None):
+        self._in_use -= 1
+        self._semaphore.release()
+
+    def get_size(self) -> int:
+        return self._max_size
+
+    def get_idle_size(self) -> int:
+        return self._max_size - self._in_use
+
+    def get_max_size(self) -> int:
+        return self._max_size
+
+    async def close(self):
+        pass
+
+
+class StandinPipeline:
+    def __init__(self, redis: "StandinRedis"):
+        self.redis = redis
+        self._commands: list[tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self) -> list:
+        await self.redis.roundtrip()
+        results = []
+        for name, args, kwargs in self._commands:
+            results.append(getattr(self.redis, f"_{name}")(*args, **kwargs))
+        self._commands = []
+        return results
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class StandinPubSub:
+    async def subscribe(self, *channels: str):
+        pass
+
+    async def listen(self):
+        await asyncio.Event().wait()
+        yield {}
+
+    async def aclose(self):
+        pass
+
+
+class StandinScript:
+    """Counts like the sliding-window script, without the window."""
+
+    def __init__(self, redis: "StandinRedis"):
+        self.redis = redis
+
+    async def __call__(self, keys, args, client=None):
+        await self.redis.roundtrip()
+        key, (limit, cost) = keys[0], (int(args[1]), int(args[3]))
+        count = self.redis.counters.get(key, 0) + cost
+        if count < limit:
+            self.redis.counters[key] = count
+        return count
+
+
+class StandinBucketScript:
+    """Writes hash bucket entries like the bucket write script, without sweeping."""
+
+    def __init__(self, redis: "StandinRedis"):
+        self.redis = redis
+
+    async def __call__(self, keys, args, client=None):
+        if isinstance(client, StandinPipeline):
+            return client.bucket_write(keys, args)
+        await self.redis.roundtrip()
+        return self.redis._bucket_write(keys, args)
+
+
+class StandinRedis:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.data: dict[str, tuple[str, Optional[float]]] = {}
+        self.counters: dict[str, int] = {}
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.commands = 0
+        self.published: list[tuple[str, str]] = []
+        self.fault: Optional[BaseException] = None
+
+    async def roundtrip(self):
+        self.commands += 1
+        if self.fault is not None:
+            raise self.fault
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _live(self, key: str) -> Optional[tuple[str, Optional[float]]]:
+        entry = self.data.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+    def _get(self, key: str) -> Optional[str]:
+        if key in self.counters:
+            return str(self.counters[key])
+        entry = self._live(key)
+        return entry[0] if entry else None
+
+    def _ttl(self, key: str) -> int:
+        entry = self._live(key)
+        if entry is None:
+            return -2
+        return -1 if entry[1] is None else int(entry[1] - time.monotonic())
+
+    def _setex(self, key: str, seconds: int, value: Any) -> bool:
+        self.data[key] = (str(value), time.monotonic() + seconds)
+        return True
+
+    def _set(self, key, value, nx=False, px=None, ex=None) -> Optional[bool]:
+        if nx and self._live(key):
+            return None
+        expiry = px / 1000 if px else ex
+        self.data[key] = (
+            str(value),
+            time.monotonic() + expiry if expiry else None,
+        )
+        return True
+
+    def _hget(self, key: str, field: str) -> Optional[str]:
+        return self.hashes.get(key, {}).get(field)
+
+    def _bucket_write(self, keys, args) -> int:
+        bucket = self.hashes.setdefault(keys[0], {})
+        now = int(args[0])
+        for i in range(2, len(args), 3):
+            bucket[args[i]] = f"{now + int(args[i + 1])}|{args[i + 2]}"
+        return 1
+
+    def _incrby(self, key: str, amount: int) -> int:
+        self.counters[key] = self.counters.get(key, 0) + amount
+        return self.counters[key]
+
+    def _delete(self, *keys: str) -> int:
+        return sum(
+            self.data.pop(key, None) is not None
+            or self.counters.pop(key, None) is not None
+            for key in keys
+        )
+
+    def __getattr__(self, name: str):
+        method = getattr(self, f"_{name}", None)
+        if method is None:
+            raise AttributeError(name)
+
+        async def command(*args, **kwargs):
+            await self.roundtrip()
+            return method(*args, **kwargs)
+
+        return command
+
+    async def publish(self, channel: str, message: str) -> int:
+        await self.roundtrip()
+        self.published.append((channel, message))
+        return 0
+
+    def pubsub(self, **kwargs) -> StandinPubSub:
+        return StandinPubSub()
+
+    def pipeline(self, transaction: bool = True) -> StandinPipeline:
+        return StandinPipeline(self)
+
+    def register_script(self, script: str) -> StandinScript | StandinBucketScript:
+        if "HSET" in script:
+            return StandinBucketScript(self)
+        return StandinScript(self)
+
+    async def scan_iter(self, match: str):
+        for key in list(self.data):
+            if fnmatch(key, match):
+                yield key
+
+    async def aclose(self):
+        pass
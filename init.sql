@@ -1,8 +1,47 @@
+-- Hash partitioned on slug, so that each partition's index and autovacuum stay
+-- small. Databases created before partitioning keep their plain table.
 CREATE TABLE IF NOT EXISTS url_mappings (
     slug TEXT PRIMARY KEY,
     original_url TEXT NOT NULL,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    permanent BOOLEAN NOT NULL DEFAULT FALSE,
+    expires_at TIMESTAMP WITH TIME ZONE
+) PARTITION BY HASH (slug);
+
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_partitioned_table
+        WHERE partrelid = 'url_mappings'::regclass
+    ) THEN
+        FOR i IN 0..15 LOOP
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS url_mappings_p%s PARTITION OF '
+                'url_mappings FOR VALUES WITH (MODULUS 16, REMAINDER %s)',
+                i,
+                i
+            );
+        END LOOP;
+    END IF;
+END
+$$;
+
+ALTER TABLE url_mappings
+    ADD COLUMN IF NOT EXISTS permanent BOOLEAN NOT NULL DEFAULT FALSE;
+
+ALTER TABLE url_mappings
+    ADD COLUMN IF NOT EXISTS expires_at TIMESTAMP WITH TIME ZONE;
+
+-- Lets the reaper find expired links without scanning links that never expire.
+CREATE INDEX IF NOT EXISTS url_mappings_expires_at_idx
+    ON url_mappings (expires_at) WHERE expires_at IS NOT NULL;
+
+-- Lets the cache warm-up read the newest links first.
+CREATE INDEX IF NOT EXISTS url_mappings_created_at_idx
+    ON url_mappings (created_at);
+
+-- IDs leased in blocks by workers using SLUG_STRATEGY=sequence.
+CREATE SEQUENCE IF NOT EXISTS url_slug_ids;
 
 
 CREATE TABLE IF NOT EXISTS rate_limits (
@@ -10,3 +49,19 @@ CREATE TABLE IF NOT EXISTS rate_limits (
     request_count INTEGER,
     last_request TIMESTAMP WITH TIME ZONE
 );
+
+CREATE INDEX IF NOT EXISTS rate_limits_last_request_idx
+    ON rate_limits (last_request);
+
+
+CREATE TABLE IF NOT EXISTS url_clicks (
+    slug TEXT NOT NULL,
+    clicked_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS url_clicks_slug_clicked_at_idx
+    ON url_clicks (slug, clicked_at);
+
+-- Lets the cache warm-up count recent clicks without scanning older ones.
+CREATE INDEX IF NOT EXISTS url_clicks_clicked_at_idx
+    ON url_clicks (clicked_at);
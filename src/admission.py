@@ -0,0 +1,180 @@
+import os
+import time
+from typing import Optional
+
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.breakers import BreakerOpen, postgres_breaker
+from src.metrics import registerStats, requests_shed
+
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", 0))
+ADMISSION_SHORTEN_SHARE = float(os.getenv("ADMISSION_SHORTEN_SHARE", 0.5))
+ADMISSION_QUEUE_DELAY_MS = float(os.getenv("ADMISSION_QUEUE_DELAY_MS", 0))
+ADMISSION_INTERVAL_MS = float(os.getenv("ADMISSION_INTERVAL_MS", 500))
+ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", 1))
+
+SHORTEN_PATHS = frozenset(("/shorten", "/shorten/batch"))
+# Probes and metrics are never shed, so that an overloaded worker stays visible.
+EXEMPT_PATHS = frozenset(("/health", "/ready", "/stats", "/metrics"))
+
+
+class AdmissionController:
+    """Sheds requests a worker cannot serve in time, `/shorten` traffic first.
+
+    Requests are tracked in flight per route class. Shorten requests are shed
+    once the worker has `max_in_flight * shorten_share` requests in flight, or
+    while the Postgres pool has a standing queue: the shortest pool-acquire wait
+    seen over an `interval` exceeded `target_delay`. Redirects, mostly served
+    from the caches, are only shed at `max_in_flight`. Either limit at 0 is off.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        shorten_share: float,
+        target_delay: float,
+        interval: float,
+        retry_after: int,
+    ):
+        self.max_in_flight = max_in_flight
+        self.shorten_limit = max_in_flight * shorten_share
+        self.target_delay = target_delay
+        self.interval = interval
+        self.retry_after = retry_after
+        self.enabled = max_in_flight > 0 or target_delay > 0
+        self.in_flight = {"redirect": 0, "shorten": 0}
+        self.shed = {"redirect": 0, "shorten": 0}
+        self._window_start = time.monotonic()
+        self._window_min: Optional[float] = None
+        self._queue_delay = 0.0
+
+    def classify(self, scope: Scope) -> Optional[str]:
+        if scope["type"] != "http":
+            return None
+        path = scope["path"]
+        if scope["method"] == "POST" and path in SHORTEN_PATHS:
+            return "shorten"
+        if scope["method"] == "GET" and path not in EXEMPT_PATHS:
+            return "redirect"
+        return None
+
+    def observeQueueDelay(self, seconds: float):
+        """Record how long a request waited for a Postgres connection."""
+
+        now = time.monotonic()
+        if now - self._window_start >= self.interval:
+            # A queue that drains within an interval is a burst, not overload.
+            self._queue_delay = (
+                seconds if self._window_min is None else self._window_min
+            )
+            self._window_start = now
+            self._window_min = seconds
+        elif self._window_min is None or seconds < self._window_min:
+            self._window_min = seconds
+
+    @property
+    def overloaded(self) -> bool:
+        if self.target_delay <= 0:
+            return False
+        # Without recent waits to measure, the queue is assumed to have drained.
+        if time.monotonic() - self._window_start >= 2 * self.interval:
+            return False
+        return self._queue_delay > self.target_delay
+
+    def admit(self, route_class: str) -> Optional[str]:
+        """None if the request may proceed, else the reason to shed it."""
+
+        if not self.enabled:
+            return None
+        in_flight = self.in_flight["redirect"] + self.in_flight["shorten"]
+        if route_class == "shorten":
+            if self.overloaded:
+                return "queue_delay"
+            if self.max_in_flight and in_flight >= self.shorten_limit:
+                return "in_flight"
+        elif self.max_in_flight and in_flight >= self.max_in_flight:
+            return "in_flight"
+        return None
+
+    def reject(
+        self, route_class: str, reason: str, retry_after: Optional[float] = None
+    ) -> JSONResponse:
+        self.shed[route_class] += 1
+        requests_shed.inc(route_class, reason)
+        return JSONResponse(
+            status_code=503,
+            content={
+                "error": "Service overloaded",
+                "detail": f"Request shed ({reason}), retry later",
+            },
+            headers={"Retry-After": str(round(retry_after or self.retry_after))},
+        )
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "overloaded": self.overloaded,
+            "queue_delay_ms": self._queue_delay * 1000,
+            "in_flight_redirect": self.in_flight["redirect"],
+            "in_flight_shorten": self.in_flight["shorten"],
+            "shed_redirect": self.shed["redirect"],
+            "shed_shorten": self.shed["shorten"],
+        }
+
+
+admission_controller = AdmissionController(
+    ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_SHORTEN_SHARE,
+    ADMISSION_QUEUE_DELAY_MS / 1000,
+    ADMISSION_INTERVAL_MS / 1000,
+    ADMISSION_RETRY_AFTER_SECONDS,
+)
+registerStats("admission", admission_controller.stats)
+
+
+class AdmissionControl:
+    """Applies `admission_controller` to every request before it is routed.
+
+    Also answers 503 with Retry-After, rather than 500, when Postgres is
+    unavailable before the response starts: a connection or query timed out,
+    failed to connect, or was refused by the open circuit breaker.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        route_class = admission_controller.classify(scope)
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        reason = admission_controller.admit(route_class)
+        if reason is not None:
+            await admission_controller.reject(route_class, reason)(scope, receive, send)
+            return
+
+        started = False
+
+        async def send_tracked(message: Message):
+            nonlocal started
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        admission_controller.in_flight[route_class] += 1
+        try:
+            await self.app(scope, receive, send_tracked)
+        except postgres_breaker.unavailable as exc:
+            if started:
+                raise
+            if isinstance(exc, BreakerOpen):
+                response = admission_controller.reject(
+                    route_class, "breaker_open", exc.retry_after
+                )
+            else:
+                reason = "timeout" if isinstance(exc, TimeoutError) else "unavailable"
+                response = admission_controller.reject(route_class, reason)
+            await response(scope, receive, send)
+        finally:
+            admission_controller.in_flight[route_class] -= 1
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from asyncpg import Pool
+
+from src.metrics import registerStats
+from src.repository import insertClicks
+
+logger = logging.getLogger(__name__)
+
+CLICK_TRACKING_ENABLED = os.getenv("CLICK_TRACKING_ENABLED", "false").lower() == "true"
+CLICK_QUEUE_SIZE = int(os.getenv("CLICK_QUEUE_SIZE", 10000))
+CLICK_FLUSH_SIZE = int(os.getenv("CLICK_FLUSH_SIZE", 1000))
+CLICK_FLUSH_INTERVAL_SECONDS = float(os.getenv("CLICK_FLUSH_INTERVAL_SECONDS", 1.0))
+CLICK_OVERFLOW_POLICY = os.getenv("CLICK_OVERFLOW_POLICY", "drop_newest")
+
+
+class ClickRecorder:
+    """Buffers click events in memory and writes them to `url_clicks` in batches.
+
+    Recording never blocks: when the buffer is full, the newest event is dropped
+    (`drop_newest`) or the oldest buffered event makes room for it
+    (`drop_oldest`).
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        maxsize: int,
+        flush_size: int,
+        flush_interval: float,
+        overflow_policy: str,
+    ):
+        if overflow_policy not in ("drop_newest", "drop_oldest"):
+            raise ValueError(f"Unknown click overflow policy: {overflow_policy}")
+        self.enabled = enabled
+        self.maxsize = maxsize
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self._queue: deque[tuple[str, datetime]] = deque()
+        self._flush_needed = asyncio.Event()
+        self.recorded = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+        self.last_flush_seconds = 0.0
+
+    def record(self, slug: str) -> None:
+        if not self.enabled:
+            return
+        if len(self._queue) >= self.maxsize:
+            self.dropped += 1
+            if self.overflow_policy == "drop_newest":
+                return
+            self._queue.popleft()
+        self._queue.append((slug, datetime.now(timezone.utc)))
+        self.recorded += 1
+        if len(self._queue) >= self.flush_size:
+            self._flush_needed.set()
+
+    async def flush(self, pool: Pool) -> None:
+        while self._queue:
+            batch = [
+                self._queue.popleft()
+                for _ in range(min(self.flush_size, len(self._queue)))
+            ]
+            start = time.perf_counter()
+            try:
+                async with pool.acquire() as conn:
+                    await insertClicks(conn, batch)
+            except Exception as exc:
+                self.failed += len(batch)
+                logger.error("Could not flush %d clicks: %s", len(batch), exc)
+                return
+            finally:
+                self.last_flush_seconds = time.perf_counter() - start
+            self.flushed += len(batch)
+
+    async def run(self, pool: Pool) -> None:
+        """Flush every `flush_interval` seconds, or sooner when a batch is full."""
+
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(
+                        self._flush_needed.wait(), self.flush_interval
+                    )
+                except TimeoutError:
+                    pass
+                self._flush_needed.clear()
+                await self.flush(pool)
+        finally:
+            await self.flush(pool)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "queue_depth": len(self._queue),
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+
+click_recorder = ClickRecorder(
+    CLICK_TRACKING_ENABLED,
+    CLICK_QUEUE_SIZE,
+    CLICK_FLUSH_SIZE,
+    CLICK_FLUSH_INTERVAL_SECONDS,
+    CLICK_OVERFLOW_POLICY,
+)
+registerStats("clicks", click_recorder.stats)
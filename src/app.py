@@ -1,51 +1,111 @@
+import asyncio
 import logging
 import os
-from logging.handlers import TimedRotatingFileHandler
 from typing import cast
 
 import asyncpg
 from fastapi import FastAPI
 from redis.asyncio import Redis
 
+from src.admission import AdmissionControl
+from src.analytics import click_recorder
+from src.bloom import cancelSlugFilterLoad
+from src.cache import listenForInvalidations
 from src.controller import router
+from src.fastpath import ASGI_FAST_PATH, RedirectFastPath
+from src.logs import configureLogging
+from src.metrics import RequestTimingMiddleware
+from src.reaper import reaper
+from src.replicas import DATABASE_REPLICA_URLS, replica_set
+from src.repository import COMMAND_TIMEOUT, DATABASE_SHARD_URLS, shard_router
+from src.sharedcache import shared_cache
+from src.warmup import cache_warmer
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 REDIS_URL = os.getenv("REDIS_URL")
+REDIS_CONNECT_TIMEOUT_SECONDS = float(os.getenv("REDIS_CONNECT_TIMEOUT_SECONDS", 1))
+REDIS_SOCKET_TIMEOUT_SECONDS = float(os.getenv("REDIS_SOCKET_TIMEOUT_SECONDS", 1))
 
 # Logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(levelname)s - %(asctime)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(),
-        TimedRotatingFileHandler(
-            filename="/app/logs/app.log",
-            when="W0",
-            interval=1,
-            backupCount=4,
-            encoding="utf-8",
-        ),
-    ],
-)
+log_listener = configureLogging()
 logger = logging.getLogger(__name__)
 
 # Set up app
 app = FastAPI(title="MiniMe - URL Shortener")
 app.include_router(router)
+app.add_middleware(RequestTimingMiddleware)
+if ASGI_FAST_PATH:
+    # Added last, so it runs first and redirects skip the timing middleware.
+    app.add_middleware(RedirectFastPath)
+# Outermost, so that shed requests cost as little as possible.
+app.add_middleware(AdmissionControl)
 
 
 # App lifecycle
 @app.on_event("startup")
 async def startup_event():
-    app.state.db_pool = await asyncpg.create_pool(DATABASE_URL, min_size=5, max_size=20)
+    app.state.db_pool = await asyncpg.create_pool(
+        DATABASE_URL, min_size=5, max_size=20, command_timeout=COMMAND_TIMEOUT
+    )
+    await shard_router.connect(app.state.db_pool, DATABASE_SHARD_URLS)
+    await replica_set.connect(DATABASE_REPLICA_URLS)
     app.state.redis = Redis.from_url(
-        cast(str, REDIS_URL), encoding="utf-8", decode_responses=True
+        cast(str, REDIS_URL),
+        encoding="utf-8",
+        decode_responses=True,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT_SECONDS or None,
+        socket_timeout=REDIS_SOCKET_TIMEOUT_SECONDS or None,
+    )
+    # The invalidation listener blocks on reads for as long as the channel is
+    # idle, so its client has no socket timeout; keepalives detect dead peers.
+    app.state.listener_redis = Redis.from_url(
+        cast(str, REDIS_URL),
+        encoding="utf-8",
+        decode_responses=True,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT_SECONDS or None,
+        socket_keepalive=True,
+    )
+    if shared_cache.enabled:
+        shared_cache.open()
+    # The listener loads the slug filter once subscribed, and reloads it after
+    # every reconnection, so that no slug written meanwhile is missed.
+    app.state.invalidation_listener = asyncio.create_task(
+        listenForInvalidations(app.state.listener_redis, shard_router.pools)
     )
+    if cache_warmer.enabled:
+        # `/ready` answers 503 until the warm-up is over.
+        app.state.cache_warmer = asyncio.create_task(
+            cache_warmer.run(shard_router.pools, app.state.redis)
+        )
+    if click_recorder.enabled:
+        app.state.click_flusher = asyncio.create_task(
+            click_recorder.run(app.state.db_pool)
+        )
+    if reaper.enabled:
+        app.state.reaper = asyncio.create_task(
+            reaper.run(app.state.db_pool, shard_router.pools)
+        )
     logger.info("Application started, postgres database and redis initialized")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    app.state.invalidation_listener.cancel()
+    cancelSlugFilterLoad()
+    if cache_warmer.enabled:
+        app.state.cache_warmer.cancel()
+    if reaper.enabled:
+        app.state.reaper.cancel()
+    if click_recorder.enabled:
+        # Cancelling the flusher writes out the clicks still buffered.
+        app.state.click_flusher.cancel()
+        await asyncio.gather(app.state.click_flusher, return_exceptions=True)
     await app.state.db_pool.close()
+    await replica_set.close()
+    await shard_router.close()
     await app.state.redis.aclose()
+    await app.state.listener_redis.aclose()
+    shared_cache.close()
     logger.info("Application shut down, postgres database and redis connections closed")
+    if log_listener is not None:
+        log_listener.stop()
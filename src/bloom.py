@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import math
+import os
+from typing import Optional
+
+import xxhash
+from asyncpg import Pool
+
+from src.metrics import registerStats
+from src.repository import streamSlugs
+
+logger = logging.getLogger(__name__)
+
+BLOOM_FILTER_CAPACITY = int(os.getenv("BLOOM_FILTER_CAPACITY", 0))
+BLOOM_FILTER_ERROR_RATE = float(os.getenv("BLOOM_FILTER_ERROR_RATE", 0.01))
+
+
+class BloomFilter:
+    """Bloom filter of existing slugs, sized for `capacity` items at `error_rate`.
+
+    Until `ready` is set, membership checks answer "maybe" so that lookups are
+    never rejected while the filter is still being built.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.enabled = capacity > 0
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(
+            8, math.ceil(-max(capacity, 1) * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / max(capacity, 1) * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8 if self.enabled else 0)
+        self.ready = False
+        self.count = 0
+        self.checks = 0
+        self.rejections = 0
+
+    def _positions(self, item: str):
+        # Double hashing: two 64-bit halves of one 128-bit digest give k indexes.
+        digest = xxhash.xxh3_128_intdigest(item)
+        first, second = digest & 0xFFFFFFFFFFFFFFFF, (digest >> 64) | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        if not self.enabled:
+            return
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def clear(self) -> None:
+        """Forget every slug and answer "maybe" until the filter is reloaded."""
+
+        self.ready = False
+        self._bits = bytearray(len(self._bits))
+        self.count = 0
+
+    def __contains__(self, item: str) -> bool:
+        if not (self.enabled and self.ready):
+            return True
+        self.checks += 1
+        for position in self._positions(item):
+            if not self._bits[position >> 3] & (1 << (position & 7)):
+                self.rejections += 1
+                return False
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "capacity": self.capacity,
+            "error_rate": self.error_rate,
+            "bytes": len(self._bits),
+            "hashes": self.hashes,
+            "count": self.count,
+            "checks": self.checks,
+            "rejections": self.rejections,
+        }
+
+
+slug_filter = BloomFilter(BLOOM_FILTER_CAPACITY, BLOOM_FILTER_ERROR_RATE)
+registerStats("slug_filter", slug_filter.stats)
+
+_load_task: Optional[asyncio.Task] = None
+
+
+async def loadSlugFilter(*pools: Pool):
+    """Add every slug in `url_mappings` on each pool to the filter, then use it."""
+
+    if not slug_filter.enabled:
+        return
+
+    try:
+        for pool in pools:
+            async with pool.acquire() as conn:
+                async for slug in streamSlugs(conn):
+                    slug_filter.add(slug)
+    except Exception as exc:
+        logger.error("Could not load slug filter, leaving it disabled: %s", exc)
+        return
+
+    slug_filter.ready = True
+    if slug_filter.count > slug_filter.capacity:
+        logger.warning(
+            "Slug filter holds %d slugs, over its capacity of %d; "
+            "its false-positive rate will degrade",
+            slug_filter.count,
+            slug_filter.capacity,
+        )
+    logger.info("Slug filter loaded with %d slugs", slug_filter.count)
+
+
+def reloadSlugFilter(*pools: Pool):
+    """Empty the filter and reload it in the background.
+
+    Slugs added meanwhile are kept, so this must be called only once the
+    invalidation listener is subscribed.
+    """
+
+    global _load_task
+    if not slug_filter.enabled:
+        return
+    cancelSlugFilterLoad()
+    slug_filter.clear()
+    _load_task = asyncio.create_task(loadSlugFilter(*pools))
+
+
+def cancelSlugFilterLoad():
+    if _load_task is not None:
+        _load_task.cancel()
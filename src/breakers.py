@@ -0,0 +1,192 @@
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+import asyncpg
+from redis import exceptions as redis_exceptions
+
+from src.metrics import breaker_transitions, registerStats
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", 5))
+
+# Errors meaning the service is unreachable or too slow, as opposed to errors in
+# a particular command. TimeoutError and ConnectionError are OSErrors.
+REDIS_ERRORS = (
+    redis_exceptions.ConnectionError,
+    redis_exceptions.TimeoutError,
+    OSError,
+)
+POSTGRES_ERRORS = (
+    asyncpg.PostgresConnectionError,
+    asyncpg.CannotConnectNowError,
+    # Raised by the server's statement_timeout; client-side command timeouts
+    # raise TimeoutError.
+    asyncpg.QueryCanceledError,
+    OSError,
+)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+STATE_CODES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+T = TypeVar("T")
+
+
+class BreakerOpen(Exception):
+    def __init__(self, breaker: str, retry_after: float):
+        self.breaker = breaker
+        self.retry_after = retry_after
+        self.message = f"{breaker} is unavailable, retry in {retry_after:.0f}s"
+        super().__init__(self.message)
+
+
+class CircuitBreaker:
+    """Fails calls to a service fast after repeated connection errors.
+
+    Closed, calls go through and `failure_threshold` consecutive `errors` open
+    the breaker. Open, calls raise BreakerOpen without reaching the service,
+    for `reset_seconds`. Half-open, a single probe call is let through: its
+    success closes the breaker and its failure opens it again, while the calls
+    made meanwhile still raise BreakerOpen. A threshold of 0 never opens.
+
+    Used as `async with breaker:` around the call, or `async with
+    breaker.observe():` around calls on a connection obtained under it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_seconds: float,
+        errors: tuple[type[BaseException], ...],
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.errors = errors
+        # What callers catch to fall back when the service cannot be used.
+        self.unavailable = (BreakerOpen, *errors)
+        self.enabled = failure_threshold > 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.consecutive_failures = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        reopen_at = self._opened_at + self.reset_seconds
+        if self._state == OPEN and time.monotonic() >= reopen_at:
+            return HALF_OPEN
+        return self._state
+
+    def _transition(self, state: str):
+        if state != self._state:
+            self._state = state
+            breaker_transitions.inc(self.name, state)
+
+    def _open(self):
+        self._opened_at = time.monotonic()
+        self.opened += 1
+        self._transition(OPEN)
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            self._transition(HALF_OPEN)
+            return True
+        return False
+
+    def success(self):
+        self.consecutive_failures = 0
+        if self._probing or self._state != CLOSED:
+            self._probing = False
+            self._transition(CLOSED)
+
+    def failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self._probing:
+            self._probing = False
+            self._open()
+        elif (
+            self.enabled
+            and self._state == CLOSED
+            and self.consecutive_failures >= self.failure_threshold
+        ):
+            self._open()
+
+    def reset(self):
+        self._state = CLOSED
+        self._probing = False
+        self.consecutive_failures = 0
+
+    async def __aenter__(self):
+        if not self.allow():
+            self.rejected += 1
+            remaining = self._opened_at + self.reset_seconds - time.monotonic()
+            raise BreakerOpen(self.name, max(1.0, remaining))
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.success()
+        elif issubclass(exc_type, self.errors):
+            self.failure()
+        else:
+            # Other errors, including cancellation, say nothing about the
+            # service, but a probe that did not finish must not block the next.
+            self._probing = False
+        return False
+
+    @asynccontextmanager
+    async def observe(self) -> AsyncIterator[None]:
+        """Count errors in the block as failures, without refusing the call.
+
+        For queries on a connection already checked out: a brownout mostly shows
+        up there, as timeouts and dropped connections. Successes only reset the
+        failure count while closed, so that they cannot cut an open period short.
+        """
+
+        try:
+            yield
+        except self.errors:
+            self.failure()
+            raise
+        if self._state == CLOSED:
+            self.consecutive_failures = 0
+
+    async def call(self, fn: Callable[[], Awaitable[T]], default: T) -> T:
+        """The result of `fn()` under the breaker, or `default` if unavailable."""
+
+        try:
+            async with self:
+                return await fn()
+        except self.unavailable:
+            return default
+
+    def stats(self) -> dict:
+        state = self.state
+        return {
+            "state": state,
+            "state_code": STATE_CODES[state],
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "opened": self.opened,
+        }
+
+
+redis_breaker = CircuitBreaker(
+    "redis", BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS, REDIS_ERRORS
+)
+postgres_breaker = CircuitBreaker(
+    "postgres", BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS, POSTGRES_ERRORS
+)
+registerStats("redis_breaker", redis_breaker.stats)
+registerStats("postgres_breaker", postgres_breaker.stats)
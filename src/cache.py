@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Sequence, TypeVar
+
+from asyncpg import Pool
+from cachetools import TTLCache
+from redis.asyncio import Redis
+
+from src.bloom import reloadSlugFilter, slug_filter
+from src.metrics import registerStats
+from src.sharedcache import shared_cache
+
+logger = logging.getLogger(__name__)
+
+LOCAL_CACHE_SIZE = int(os.getenv("LOCAL_CACHE_SIZE", 10000))
+LOCAL_CACHE_TTL_SECONDS = int(os.getenv("LOCAL_CACHE_TTL_SECONDS", 60))
+INVALIDATION_CHANNEL = os.getenv("INVALIDATION_CHANNEL", "url:invalidate")
+# Published in place of slugs when invalidations may have been lost: every
+# worker then drops its caches and reloads its slug filter.
+RESYNC_MESSAGE = "*"
+
+T = TypeVar("T")
+
+
+class _CountingTTLCache(TTLCache):
+    """TTLCache that counts capacity evictions (expirations are not counted)."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.evictions = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+
+class LocalCache:
+    """Bounded, TTL-aware in-process cache placed in front of Redis."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.enabled = maxsize > 0 and ttl > 0
+        self._entries = _CountingTTLCache(maxsize=max(maxsize, 1), ttl=max(ttl, 1))
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def maxsize(self) -> int:
+        return self._entries.maxsize
+
+    def get(self, key: str) -> Any:
+        if not self.enabled:
+            return None
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        if self.enabled:
+            self._entries[key] = value
+
+    def invalidate(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self._entries.evictions,
+        }
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into a single call."""
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        while (future := self._calls.get(key)) is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The leading call was cancelled, retry (possibly as the leader).
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.calls += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Mark the exception as retrieved in case nobody was waiting.
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
+
+
+url_cache = LocalCache(LOCAL_CACHE_SIZE, LOCAL_CACHE_TTL_SECONDS)
+url_loads = SingleFlight()
+registerStats("local_cache", url_cache.stats)
+registerStats("single_flight", url_loads.stats)
+
+
+_resync_pending = False
+
+
+def applyInvalidation(*slugs: str):
+    """Drop `slugs` from this worker's caches and add them to its slug filter."""
+
+    # An invalidation means the slug was just written, so it also exists now.
+    url_cache.invalidate(*slugs)
+    shared_cache.invalidate(*slugs)
+    for slug in slugs:
+        slug_filter.add(slug)
+
+
+def missedInvalidation():
+    """Record writes that other workers could not be told about.
+
+    They are resynchronized by the next invalidation this worker publishes, or
+    as soon as its listener subscribes again.
+    """
+
+    global _resync_pending
+    _resync_pending = True
+
+
+async def _publishResync(redis: Redis):
+    global _resync_pending
+    if not _resync_pending:
+        return
+    _resync_pending = False
+    try:
+        await redis.publish(INVALIDATION_CHANNEL, RESYNC_MESSAGE)
+    except BaseException:
+        _resync_pending = True
+        raise
+
+
+async def publishInvalidation(redis: Redis, *slugs: str):
+    """Have every worker, including this one, apply an invalidation of `slugs`."""
+
+    await _publishResync(redis)
+    if slugs:
+        await redis.publish(INVALIDATION_CHANNEL, " ".join(slugs))
+
+
+def _resynchronize(pools: Sequence[Pool]):
+    # Invalidations published while no subscription was active are lost: the
+    # caches may hold replaced URLs and the slug filter may lack new slugs.
+    url_cache.clear()
+    shared_cache.clear()
+    reloadSlugFilter(*pools)
+
+
+async def listenForInvalidations(redis: Redis, pools: Sequence[Pool] = ()):
+    """Apply invalidations published by other workers until cancelled.
+
+    Each time the subscription is confirmed, and on a resync message, the local
+    caches are dropped and the slug filter is rebuilt from `pools`.
+    """
+
+    while True:
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                if message["type"] == "subscribe":
+                    _resynchronize(pools)
+                    await _publishResync(redis)
+                elif message["type"] != "message":
+                    continue
+                elif message["data"] == RESYNC_MESSAGE:
+                    _resynchronize(pools)
+                else:
+                    applyInvalidation(*message["data"].split())
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.error("Cache invalidation listener failed: %s", exc)
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
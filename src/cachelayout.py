@@ -0,0 +1,170 @@
+import os
+import time
+from collections import defaultdict
+from typing import Optional
+
+import xxhash
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+
+CACHE_LAYOUT = os.getenv("CACHE_LAYOUT", "keys")
+CACHE_BUCKET_COUNT = int(os.getenv("CACHE_BUCKET_COUNT", 16384))
+CACHE_BUCKET_SWEEP_ENTRIES = int(os.getenv("CACHE_BUCKET_SWEEP_ENTRIES", 200))
+CACHE_DUAL_READ = os.getenv("CACHE_DUAL_READ", "false").lower() == "true"
+
+# Entries are stored as `expires|value`, with `expires` in Unix seconds taken
+# from the application clock (ARGV[1]), which is also what readers compare it
+# against. Once a bucket holds more than ARGV[2] entries, each write that adds
+# entries checks a random sample of BUCKET_SWEEP_SAMPLE entries per entry added
+# and drops the expired ones, so a write never scans the whole bucket. The
+# bucket key itself lives as long as its longest-lived entry.
+BUCKET_SWEEP_SAMPLE = 4
+BUCKET_WRITE_SCRIPT = f"""
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local sweep_entries = tonumber(ARGV[2])
+
+local max_ttl = 0
+local added = 0
+for i = 3, #ARGV, 3 do
+    local ttl = tonumber(ARGV[i + 1])
+    local entry = (now + ttl) .. '|' .. ARGV[i + 2]
+    added = added + redis.call('HSET', key, ARGV[i], entry)
+    max_ttl = math.max(max_ttl, ttl)
+end
+
+if added > 0 and redis.call('HLEN', key) > sweep_entries then
+    local sample = math.min(added * {BUCKET_SWEEP_SAMPLE}, sweep_entries)
+    local entries = redis.call('HRANDFIELD', key, sample, 'WITHVALUES')
+    for i = 1, #entries, 2 do
+        local expires = tonumber(string.match(entries[i + 1], '^(%d+)|'))
+        if expires == nil or expires <= now then
+            redis.call('HDEL', key, entries[i])
+        end
+    end
+end
+
+if redis.call('TTL', key) < max_ttl then
+    redis.call('EXPIRE', key, max_ttl)
+end
+return 1
+"""
+
+
+class KeyLayout:
+    """One `url:{slug}` string key per entry, expired by Redis."""
+
+    async def get(self, redis: Redis, slug: str) -> Optional[str]:
+        return await redis.get(f"url:{slug}")
+
+    async def getWithTTL(self, redis: Redis, slug: str) -> tuple[Optional[str], int]:
+        async with redis.pipeline(transaction=False) as pipe:
+            value, ttl = await pipe.get(f"url:{slug}").ttl(f"url:{slug}").execute()
+        return value, ttl
+
+    async def set(self, redis: Redis, slug: str, value: str, ttl: int):
+        await redis.setex(f"url:{slug}", ttl, value)
+
+    async def setMany(self, redis: Redis, entries: list[tuple[str, str, int]]):
+        async with redis.pipeline(transaction=False) as pipe:
+            for slug, value, ttl in entries:
+                pipe.setex(f"url:{slug}", ttl, value)
+            await pipe.execute()
+
+    async def deleteMany(self, redis: Redis, slugs: list[str]):
+        await redis.delete(*(f"url:{slug}" for slug in slugs))
+
+
+class BucketLayout:
+    """Entries grouped into `urls:{bucket}` hashes, expired by the application.
+
+    Small hashes use Redis' compact ziplist/listpack encoding, which avoids the
+    per-key overhead of KeyLayout as long as buckets stay within the server's
+    `hash-max-*-entries` and `hash-max-*-value` limits. With `dual_read`, misses
+    fall back to KeyLayout keys so that the layout can be switched on a live
+    cache; the fallback can be turned off once those keys have expired.
+    """
+
+    def __init__(self, bucket_count: int, sweep_entries: int, dual_read: bool):
+        self.bucket_count = bucket_count
+        self.sweep_entries = sweep_entries
+        self.dual_read = dual_read
+        self._script: Optional[AsyncScript] = None
+
+    def bucketKey(self, slug: str) -> str:
+        return f"urls:{xxhash.xxh3_64_intdigest(slug) % self.bucket_count}"
+
+    async def get(self, redis: Redis, slug: str) -> Optional[str]:
+        value, _ = await self.getWithTTL(redis, slug)
+        return value
+
+    async def getWithTTL(self, redis: Redis, slug: str) -> tuple[Optional[str], int]:
+        if self.dual_read:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.hget(self.bucketKey(slug), slug)
+                pipe.get(f"url:{slug}").ttl(f"url:{slug}")
+                entry, legacy_value, legacy_ttl = await pipe.execute()
+            if entry is None and legacy_value is not None:
+                return legacy_value, legacy_ttl
+        else:
+            entry = await redis.hget(self.bucketKey(slug), slug)
+
+        if entry is None:
+            return None, -2
+        expires, _, value = entry.partition("|")
+        ttl = int(expires) - int(time.time())
+        if ttl <= 0:
+            return None, -2
+        return value, ttl
+
+    async def set(self, redis: Redis, slug: str, value: str, ttl: int):
+        script = self._getScript(redis)
+        await script(
+            keys=[self.bucketKey(slug)],
+            args=[int(time.time()), self.sweep_entries, slug, ttl, value],
+            client=redis,
+        )
+
+    async def setMany(self, redis: Redis, entries: list[tuple[str, str, int]]):
+        buckets: dict[str, list] = defaultdict(list)
+        for slug, value, ttl in entries:
+            buckets[self.bucketKey(slug)].extend((slug, ttl, value))
+
+        script = self._getScript(redis)
+        now = int(time.time())
+        async with redis.pipeline(transaction=False) as pipe:
+            for key, args in buckets.items():
+                await script(
+                    keys=[key], args=[now, self.sweep_entries, *args], client=pipe
+                )
+            await pipe.execute()
+
+    async def deleteMany(self, redis: Redis, slugs: list[str]):
+        buckets: dict[str, list[str]] = defaultdict(list)
+        for slug in slugs:
+            buckets[self.bucketKey(slug)].append(slug)
+
+        async with redis.pipeline(transaction=False) as pipe:
+            for key, bucket_slugs in buckets.items():
+                pipe.hdel(key, *bucket_slugs)
+            if self.dual_read:
+                pipe.delete(*(f"url:{slug}" for slug in slugs))
+            await pipe.execute()
+
+    def _getScript(self, redis: Redis) -> AsyncScript:
+        if self._script is None:
+            self._script = redis.register_script(BUCKET_WRITE_SCRIPT)
+        return self._script
+
+
+def createCacheLayout(layout: str) -> KeyLayout | BucketLayout:
+    if layout == "keys":
+        return KeyLayout()
+    if layout == "buckets":
+        return BucketLayout(
+            CACHE_BUCKET_COUNT, CACHE_BUCKET_SWEEP_ENTRIES, CACHE_DUAL_READ
+        )
+    raise ValueError(f"Unknown cache layout: {layout}")
+
+
+cache_layout = createCacheLayout(CACHE_LAYOUT)
@@ -0,0 +1,335 @@
+"""Import and export url_mappings as CSV or NDJSON.
+
+Usage:
+    DATABASE_URL=postgresql://... REDIS_URL=redis://... minime import links.csv \\
+        [--overwrite] [--prime-cache] [--collisions collisions.ndjson]
+    DATABASE_URL=postgresql://... minime export links.ndjson
+
+Files are streamed in batches of `--batch-size` rows (`-` is stdin or stdout),
+and the format follows the file extension unless `--format` is given.
+Imported rows need an `original_url` (or `url`) and may carry `slug`,
+`created_at`, `permanent` and `expires_at`, as exported. Rows without a slug
+get the one `/shorten` would give them. A slug already mapped to another URL
+is a collision. It is written to `--collisions` and keeps its existing URL
+unless `--overwrite` is given, in which case the last URL wins.
+
+Rows go to their shard when DATABASE_SHARD_URLS is set. Cached copies of the
+written slugs are dropped from Redis, or replaced with `--prime-cache`, and
+running workers are told about them. This needs REDIS_URL, without which the
+import is refused unless `--no-redis` is given.
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+from typing import IO, Iterator, Optional
+
+import asyncpg
+from asyncpg import Pool
+from pydantic import HttpUrl, TypeAdapter
+from redis.asyncio import Redis
+
+from src.cache import publishInvalidation
+from src.cachelayout import cache_layout
+from src.helpers import decode, shorten_urls
+from src.models import URLMapping
+from src.repository import (
+    DATABASE_SHARD_URLS,
+    URL_MAPPING_COLUMNS,
+    ShardRouter,
+    importURLMappings,
+    streamURLMappings,
+)
+from src.services import mappingTTL
+
+BATCH_SIZE = 10000
+PROGRESS_INTERVAL_SECONDS = 5.0
+FORMATS = ("csv", "ndjson")
+
+_http_url = TypeAdapter(HttpUrl)
+
+
+class Progress:
+    """Reports rows handled and rows/sec on stderr every few seconds."""
+
+    def __init__(self, label: str, interval: float = PROGRESS_INTERVAL_SECONDS):
+        self.label = label
+        self.interval = interval
+        self.rows = 0
+        self.start = time.perf_counter()
+        self._last_report = self.start
+
+    def update(self, rows: int):
+        self.rows += rows
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        print(
+            f"{self.label}: {self.rows:,} rows, {self.rows / elapsed:,.0f} rows/s",
+            file=sys.stderr,
+        )
+
+
+def readRows(file: IO[str], format: str) -> Iterator[Optional[dict]]:
+    """Rows of a file, with None for an NDJSON line that is not valid JSON."""
+
+    if format == "csv":
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+
+
+def _parseTimestamp(value) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _parseBool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("t", "true", "1", "yes")
+
+
+def toRecord(row: Optional[dict]) -> tuple:
+    """(slug or None, original_url, created_at, permanent, expires_at) of a row.
+
+    URLs are normalized like `/shorten` does, so that generated slugs match.
+    Raises ValueError for a row that cannot be imported.
+    """
+
+    if not isinstance(row, dict):
+        raise ValueError("not a JSON object")
+    original_url = row.get("original_url") or row.get("url")
+    if not original_url:
+        raise ValueError("missing original_url")
+    slug = row.get("slug") or None
+    if slug is not None:
+        decode(slug)
+    return (
+        slug,
+        str(_http_url.validate_python(original_url)),
+        _parseTimestamp(row.get("created_at")),
+        _parseBool(row.get("permanent") or False),
+        _parseTimestamp(row.get("expires_at")),
+    )
+
+
+def batched(rows: Iterator, size: int) -> Iterator[list]:
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+async def importMappings(
+    pools: list[Pool],
+    redis: Optional[Redis],
+    rows: Iterator[Optional[dict]],
+    batch_size: int = BATCH_SIZE,
+    overwrite: bool = False,
+    prime_cache: bool = False,
+    collisions_file: Optional[IO[str]] = None,
+) -> dict[str, int]:
+    router = ShardRouter()
+    router.pools = pools
+    counts = dict.fromkeys(
+        ("read", "invalid", "inserted", "updated", "unchanged", "collisions"), 0
+    )
+    progress = Progress("import")
+
+    def collide(slug: str, original_url: str, existing_url: str):
+        counts["collisions"] += 1
+        if collisions_file is not None:
+            collisions_file.write(
+                json.dumps(
+                    {
+                        "slug": slug,
+                        "original_url": original_url,
+                        "existing_url": existing_url,
+                    }
+                )
+                + "\n"
+            )
+
+    for batch in batched(rows, batch_size):
+        counts["read"] += len(batch)
+        parsed = []
+        for row in batch:
+            try:
+                parsed.append(toRecord(row))
+            except ValueError:
+                counts["invalid"] += 1
+
+        generated = iter(shorten_urls([url for slug, url, *_ in parsed if not slug]))
+        records: dict[str, tuple] = {}
+        for slug, *fields in parsed:
+            slug = slug or next(generated)
+            existing = records.get(slug)
+            if existing is not None:
+                # Repeated slugs keep the first row, or the last with --overwrite.
+                if existing[1] == fields[0]:
+                    counts["unchanged"] += 1
+                else:
+                    collide(slug, fields[0], existing[1])
+                if not overwrite:
+                    continue
+            records[slug] = (slug, *fields)
+
+        shards: dict[int, list[tuple]] = {}
+        for slug, record in records.items():
+            shards.setdefault(router.shardFor(slug), []).append(record)
+
+        async def importShard(shard: int, shard_records: list[tuple]):
+            async with pools[shard].acquire() as conn:
+                return await importURLMappings(conn, shard_records, overwrite)
+
+        results = await asyncio.gather(
+            *(importShard(shard, records) for shard, records in shards.items())
+        )
+        written: list[URLMapping] = []
+        for shard_written, inserted, collisions in results:
+            written += shard_written
+            counts["inserted"] += inserted
+            counts["updated"] += len(shard_written) - inserted
+            for collision in collisions:
+                collide(*collision)
+            if not overwrite:
+                counts["unchanged"] -= len(collisions)
+        counts["unchanged"] += len(records) - len(written)
+
+        if redis is not None and written:
+            # Updated slugs may be cached with their old URL, and new ones as
+            # misses.
+            if prime_cache:
+                await cache_layout.setMany(
+                    redis,
+                    [
+                        (mapping.slug, mapping.to_cache_value(), mappingTTL(mapping))
+                        for mapping in written
+                    ],
+                )
+            else:
+                await cache_layout.deleteMany(
+                    redis, [mapping.slug for mapping in written]
+                )
+            # Lets workers drop their copies and add the slugs to their filters.
+            await publishInvalidation(redis, *(mapping.slug for mapping in written))
+        progress.update(len(batch))
+
+    progress.report()
+    return counts
+
+
+async def exportMappings(pools: list[Pool], output: IO[bytes], format: str) -> int:
+    progress = Progress("export")
+    for index, pool in enumerate(pools):
+        async with pool.acquire() as conn:
+            if format == "csv":
+                result = await conn.copy_from_query(
+                    f"SELECT {URL_MAPPING_COLUMNS} FROM url_mappings",
+                    output=output,
+                    format="csv",
+                    header=index == 0,
+                )
+                progress.update(int(result.split()[-1]))
+                continue
+            async for mapping in streamURLMappings(conn):
+                output.write(mapping.model_dump_json().encode() + b"\n")
+                progress.update(1)
+    progress.report()
+    return progress.rows
+
+
+def _format(path: str, format: Optional[str]) -> str:
+    if format:
+        return format
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+async def run(args: argparse.Namespace):
+    redis_url = os.getenv("REDIS_URL")
+    if args.command == "import" and not (redis_url or args.no_redis):
+        raise SystemExit(
+            "REDIS_URL is not set: running workers would keep serving cached and "
+            "missing slugs. Set it, or pass --no-redis if no worker is running."
+        )
+
+    pools = [
+        await asyncpg.create_pool(url, min_size=1, max_size=4)
+        for url in [os.environ["DATABASE_URL"], *DATABASE_SHARD_URLS]
+    ]
+    redis = Redis.from_url(redis_url, decode_responses=True) if redis_url else None
+    try:
+        format = _format(args.path, args.format)
+        if args.command == "export":
+            output = sys.stdout.buffer if args.path == "-" else open(args.path, "wb")
+            with output:
+                await exportMappings(pools, output, format)
+            return
+
+        file = (
+            io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+            if args.path == "-"
+            else open(args.path, encoding="utf-8", newline="")
+        )
+        collisions_file = open(args.collisions, "w") if args.collisions else None
+        try:
+            counts = await importMappings(
+                pools,
+                redis,
+                readRows(file, format),
+                args.batch_size,
+                args.overwrite,
+                args.prime_cache,
+                collisions_file,
+            )
+        finally:
+            file.close()
+            if collisions_file is not None:
+                collisions_file.close()
+        print(
+            ", ".join(f"{count:,} {name}" for name, count in counts.items()),
+            file=sys.stderr,
+        )
+    finally:
+        for pool in pools:
+            await pool.close()
+        if redis is not None:
+            await redis.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="minime", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="load a file of links")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=FORMATS)
+    import_parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    import_parser.add_argument("--overwrite", action="store_true")
+    import_parser.add_argument("--prime-cache", action="store_true")
+    import_parser.add_argument("--no-redis", action="store_true")
+    import_parser.add_argument("--collisions", metavar="PATH")
+
+    export_parser = commands.add_parser("export", help="dump every link to a file")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--format", choices=FORMATS)
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
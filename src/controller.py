@@ -1,50 +1,188 @@
 import logging
-from typing import Annotated, cast
+import math
+import os
+import time
+from email.utils import formatdate
+from typing import Annotated, Optional, cast
 
-from asyncpg import Connection
-from fastapi import APIRouter, Body, Depends, Request, status
-from fastapi.responses import JSONResponse, RedirectResponse
-from pydantic import HttpUrl
+from asyncpg import Connection, Pool
+from fastapi import APIRouter, Body, Depends, Header, Request, status
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    RedirectResponse,
+    Response,
+)
+from pydantic import FutureDatetime, HttpUrl
 from redis.asyncio import Redis
 from starlette.datastructures import Address
 
-from src.dependencies import get_db_conn, get_redis
+from src.analytics import click_recorder
+from src.breakers import postgres_breaker
+from src.dependencies import (
+    LazyConnection,
+    get_db_conn,
+    get_db_pool,
+    get_lazy_db_conn,
+    get_redis,
+)
+from src.metrics import collectStats, render
 from src.models import URLMapping
 from src.services import (
+    BATCH_MAX_SIZE,
     RateLimitExceeded,
     RecordNotFound,
     UpsertFailed,
     checkRateLimit,
     findMatchingURL,
     generateSlug,
+    generateSlugs,
 )
+from src.warmup import cache_warmer
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+REDIRECT_STATUS_CODE = int(os.getenv("REDIRECT_STATUS_CODE", 307))
+PERMANENT_REDIRECT_STATUS_CODE = int(os.getenv("PERMANENT_REDIRECT_STATUS_CODE", 308))
+REDIRECT_MAX_AGE_SECONDS = int(os.getenv("REDIRECT_MAX_AGE_SECONDS", 86400))
+CACHEABLE_REDIRECT_CODES = (301, 308)
+
 
 # Routes
 @router.get("/health")
 def health_check():
     health_status = {"status": "healthy"}
-    logger.info("Health Check: OK")
+    logger.info("Health Check: OK", extra={"route": "health"})
     return JSONResponse(content=health_status, status_code=status.HTTP_200_OK)
 
 
+@router.get("/ready")
+def readiness_check():
+    # Unlike /health, waits for the cache warm-up before taking traffic.
+    if not cache_warmer.ready:
+        return JSONResponse(
+            content={"status": "warming up"},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    return JSONResponse(content={"status": "ready"}, status_code=status.HTTP_200_OK)
+
+
+# Both are async so that they render on the event loop thread, which is the
+# only one updating the counters they iterate over.
+@router.get("/stats")
+async def stats():
+    return JSONResponse(content=collectStats(), status_code=status.HTTP_200_OK)
+
+
+@router.get("/metrics")
+async def metrics(pool: Annotated[Pool, Depends(get_db_pool)]):
+    return PlainTextResponse(
+        content=render(pool), media_type="text/plain; version=0.0.4"
+    )
+
+
 @router.get("/{slug}")
 async def redirect(
     request: Request,
-    conn: Annotated[Connection, Depends(get_db_conn)],
+    conn: Annotated[LazyConnection, Depends(get_lazy_db_conn)],
     redis: Annotated[Redis, Depends(get_redis)],
     slug: str,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+):
+    # The connection is only checked out if the rate limiter or a cache miss
+    # needs Postgres, and is committed by `get_lazy_db_conn` afterwards.
+    client_ip = cast(Address, request.client).host
+    return await build_redirect_response(conn, redis, client_ip, slug, if_none_match)
+
+
+def redirect_to(mapping: URLMapping, if_none_match: Optional[str] = None) -> Response:
+    """Redirect to a mapping, with caching headers if the status is permanent.
+
+    Mappings shortened with `permanent` use PERMANENT_REDIRECT_STATUS_CODE and
+    the rest REDIRECT_STATUS_CODE. 301 and 308 responses carry validators
+    derived from `created_at`, which changes whenever the slug is re-shortened.
+    """
+
+    status_code = (
+        PERMANENT_REDIRECT_STATUS_CODE if mapping.permanent else REDIRECT_STATUS_CODE
+    )
+    if status_code not in CACHEABLE_REDIRECT_CODES:
+        return RedirectResponse(url=mapping.original_url, status_code=status_code)
+
+    created_at = mapping.created_at.timestamp()
+    etag = f'"{mapping.slug}-{int(created_at)}"'
+    headers = {"ETag": etag, "Last-Modified": formatdate(created_at, usegmt=True)}
+    max_age = REDIRECT_MAX_AGE_SECONDS
+    if mapping.expires_at is not None:
+        # Caches must not keep serving the redirect once the link has expired.
+        remaining = math.floor(mapping.expires_at.timestamp() - time.time())
+        max_age = max(0, min(max_age, remaining))
+    if max_age > 0:
+        headers["Cache-Control"] = f"public, max-age={max_age}"
+    if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return RedirectResponse(
+        url=mapping.original_url, status_code=status_code, headers=headers
+    )
+
+
+async def build_redirect_response(
+    conn: LazyConnection,
+    redis: Redis,
+    client_ip: str,
+    slug: str,
+    if_none_match: Optional[str] = None,
+) -> Response:
+    """Shared by the `redirect` route and the pure-ASGI fast path."""
+
+    try:
+        await checkRateLimit(conn, redis, client_ip)
+
+        mapping = await findMatchingURL(conn, redis, slug)
+        click_recorder.record(slug)
+        return redirect_to(mapping, if_none_match)
+
+    except RateLimitExceeded as exc:
+        return JSONResponse(
+            status_code=429,
+            content={"error": "Rate limit exceeded", "detail": str(exc)},
+        )
+
+    except RecordNotFound as exc:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "Content not found", "detail": str(exc)},
+        )
+
+    except postgres_breaker.unavailable:
+        # Answered 503 by admission control.
+        raise
+
+    except Exception as exc:
+        logger.error("Error redirecting URL: %s", exc)
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Internal server error", "detail": str(exc)},
+        )
+
+
+@router.post("/shorten", response_model=URLMapping)
+async def shorten(
+    request: Request,
+    conn: Annotated[Connection, Depends(get_db_conn)],
+    redis: Annotated[Redis, Depends(get_redis)],
+    url: HttpUrl = Body(..., embed=True),
+    permanent: bool = Body(False, embed=True),
+    expires_at: Optional[FutureDatetime] = Body(None, embed=True),
 ):
     async with conn.transaction():
         try:
             client_ip = cast(Address, request.client).host
-            await checkRateLimit(conn, client_ip)
+            await checkRateLimit(conn, redis, client_ip)
 
-            original_url = await findMatchingURL(conn, redis, slug)
-            return RedirectResponse(url=original_url)
+            result = await generateSlug(conn, redis, str(url), permanent, expires_at)
+            return result
 
         except RateLimitExceeded as exc:
             return JSONResponse(
@@ -52,33 +190,48 @@ async def redirect(
                 content={"error": "Rate limit exceeded", "detail": str(exc)},
             )
 
+        except UpsertFailed as exc:
+            return JSONResponse(
+                status_code=500,
+                content={"error": "Internal Server Error", "detail": str(exc)},
+            )
+
         except RecordNotFound as exc:
             return JSONResponse(
                 status_code=404,
                 content={"error": "Content not found", "detail": str(exc)},
             )
 
+        except postgres_breaker.unavailable:
+            raise
+
         except Exception as exc:
-            logger.error(f"Error redirecting URL: {str(exc)}")
+            logger.error("Error redirecting URL: %s", exc)
             return JSONResponse(
                 status_code=500,
                 content={"error": "Internal server error", "detail": str(exc)},
             )
 
 
-@router.post("/shorten", response_model=URLMapping)
-async def shorten(
+@router.post("/shorten/batch", response_model=list[URLMapping])
+async def shorten_batch(
     request: Request,
     conn: Annotated[Connection, Depends(get_db_conn)],
     redis: Annotated[Redis, Depends(get_redis)],
-    url: HttpUrl = Body(..., embed=True),
+    urls: list[HttpUrl] = Body(
+        ..., embed=True, min_length=1, max_length=BATCH_MAX_SIZE
+    ),
+    permanent: bool = Body(False, embed=True),
+    expires_at: Optional[FutureDatetime] = Body(None, embed=True),
 ):
     async with conn.transaction():
         try:
             client_ip = cast(Address, request.client).host
-            await checkRateLimit(conn, client_ip)
+            await checkRateLimit(conn, redis, client_ip, cost=len(urls))
 
-            result = await generateSlug(conn, redis, str(url))
+            result = await generateSlugs(
+                conn, redis, [str(url) for url in urls], permanent, expires_at
+            )
             return result
 
         except RateLimitExceeded as exc:
@@ -99,8 +252,11 @@ async def shorten(
                 content={"error": "Content not found", "detail": str(exc)},
             )
 
+        except postgres_breaker.unavailable:
+            raise
+
         except Exception as exc:
-            logger.error(f"Error redirecting URL: {str(exc)}")
+            logger.error("Error shortening URL batch: %s", exc)
             return JSONResponse(
                 status_code=500,
                 content={"error": "Internal server error", "detail": str(exc)},
@@ -1,9 +1,96 @@
-from typing import Annotated, AsyncGenerator
+import time
+from typing import Annotated, Any, AsyncGenerator, Optional
 
 from asyncpg import Connection, Pool
+from asyncpg.transaction import Transaction
 from fastapi import Depends
 from redis.asyncio import Redis
 
+from src.admission import admission_controller
+from src.breakers import postgres_breaker
+from src.metrics import stage_seconds
+from src.repository import ACQUIRE_TIMEOUT, ObservedConnection
+
+
+async def acquireConnection(pool: Pool) -> Connection:
+    """Check out a connection, reporting the wait to admission control."""
+
+    # Raises BreakerOpen at once while Postgres is known to be down.
+    async with postgres_breaker:
+        start = time.perf_counter()
+        try:
+            with stage_seconds.time("pool_acquire"):
+                return await pool.acquire(timeout=ACQUIRE_TIMEOUT)
+        finally:
+            admission_controller.observeQueueDelay(time.perf_counter() - start)
+
+
+class LazyConnection:
+    """Pool connection that is checked out, inside a transaction, on first use.
+
+    Exposes the subset of the asyncpg `Connection` API used by the repository,
+    whose errors count as `postgres_breaker` failures like ObservedConnection's.
+    """
+
+    def __init__(self, pool: Pool):
+        self._pool = pool
+        self._conn: Optional[Connection] = None
+        self._transaction: Optional[Transaction] = None
+
+    @property
+    def acquired(self) -> bool:
+        return self._conn is not None
+
+    async def acquire(self) -> Connection:
+        if self._conn is None:
+            conn = await acquireConnection(self._pool)
+            try:
+                transaction = conn.transaction()
+                await transaction.start()
+            except BaseException:
+                await self._pool.release(conn)
+                raise
+            self._conn, self._transaction = conn, transaction
+        return self._conn
+
+    async def release(self, commit: bool = True):
+        if self._conn is None:
+            return
+        conn, transaction = self._conn, self._transaction
+        self._conn, self._transaction = None, None
+        try:
+            if commit:
+                await transaction.commit()
+            else:
+                await transaction.rollback()
+        finally:
+            await self._pool.release(conn)
+
+    async def execute(self, query: str, *args: Any, **kwargs: Any) -> str:
+        conn = await self.acquire()
+        async with postgres_breaker.observe():
+            return await conn.execute(query, *args, **kwargs)
+
+    async def executemany(self, command: str, args: Any, **kwargs: Any):
+        conn = await self.acquire()
+        async with postgres_breaker.observe():
+            return await conn.executemany(command, args, **kwargs)
+
+    async def fetch(self, query: str, *args: Any, **kwargs: Any) -> list:
+        conn = await self.acquire()
+        async with postgres_breaker.observe():
+            return await conn.fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query: str, *args: Any, **kwargs: Any):
+        conn = await self.acquire()
+        async with postgres_breaker.observe():
+            return await conn.fetchrow(query, *args, **kwargs)
+
+    async def fetchval(self, query: str, *args: Any, **kwargs: Any):
+        conn = await self.acquire()
+        async with postgres_breaker.observe():
+            return await conn.fetchval(query, *args, **kwargs)
+
 
 async def get_db_pool() -> AsyncGenerator[Pool, None]:
     from src.app import app
@@ -14,8 +101,23 @@ async def get_db_pool() -> AsyncGenerator[Pool, None]:
 async def get_db_conn(
     pool: Annotated[Pool, Depends(get_db_pool)],
 ) -> AsyncGenerator[Connection, None]:
-    async with pool.acquire() as conn:
+    conn = await acquireConnection(pool)
+    try:
+        yield ObservedConnection(conn)
+    finally:
+        await pool.release(conn)
+
+
+async def get_lazy_db_conn(
+    pool: Annotated[Pool, Depends(get_db_pool)],
+) -> AsyncGenerator[LazyConnection, None]:
+    conn = LazyConnection(pool)
+    try:
         yield conn
+    except BaseException:
+        await conn.release(commit=False)
+        raise
+    await conn.release()
 
 
 async def get_redis() -> AsyncGenerator[Redis, None]:
@@ -0,0 +1,67 @@
+import os
+import re
+import time
+from typing import Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.controller import build_redirect_response
+from src.dependencies import LazyConnection
+from src.helpers import DEFAULT_LENGTH, URL_SAFE_CHARS
+from src.metrics import request_seconds
+
+ASGI_FAST_PATH = os.getenv("ASGI_FAST_PATH", "false").lower() == "true"
+
+# Hash slugs have DEFAULT_LENGTH characters and sequence slugs one more.
+SLUG_PATH = re.compile(f"/[{URL_SAFE_CHARS}]{{{DEFAULT_LENGTH},{DEFAULT_LENGTH + 1}}}")
+
+
+class RedirectFastPath:
+    """Serves `GET /{slug}` without FastAPI routing or dependency injection.
+
+    Paths shaped like a slug are answered directly with the same response the
+    `redirect` route would build; every other request falls through to `app`.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._reserved: Optional[frozenset[str]] = None
+
+    def _isRedirect(self, scope: Scope) -> bool:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return False
+        path = scope["path"]
+        if not SLUG_PATH.fullmatch(path):
+            return False
+        if self._reserved is None:
+            # Fixed routes such as /metrics can look like a slug too.
+            self._reserved = frozenset(
+                route.path
+                for route in scope["app"].routes
+                if "{" not in getattr(route, "path", "{")
+            )
+        return path not in self._reserved
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if not self._isRedirect(scope):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        state = scope["app"].state
+        conn = LazyConnection(state.db_pool)
+        try:
+            client_ip = scope["client"][0] if scope.get("client") else ""
+            if_none_match = None
+            for name, value in scope["headers"]:
+                if name == b"if-none-match":
+                    if_none_match = value.decode("latin-1")
+            response = await build_redirect_response(
+                conn, state.redis, client_ip, scope["path"][1:], if_none_match
+            )
+        except BaseException:
+            await conn.release(commit=False)
+            raise
+        await conn.release()
+        await response(scope, receive, send)
+        request_seconds.observe("/{slug}", time.perf_counter() - start)
@@ -1,9 +1,21 @@
+from typing import Iterable
+
 import xxhash
 from cachetools import LFUCache, cached
 
 URL_SAFE_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
 BASE = len(URL_SAFE_CHARS)
 DEFAULT_LENGTH = 7
+CHAR_VALUES = {char: value for value, char in enumerate(URL_SAFE_CHARS)}
+SLUG_SPACE = BASE**DEFAULT_LENGTH - 1
+
+# Lookup tables for the batch functions below, which work on fixed-width
+# strings of up to BATCH_MAX_WIDTH characters: every two-character pair in
+# order, and a byte table mapping each character to its digit (255 if invalid).
+BATCH_MAX_WIDTH = 8
+PAIR_BASE = BASE**2
+_PAIRS = [high + low for high in URL_SAFE_CHARS for low in URL_SAFE_CHARS]
+_DIGITS = bytes(CHAR_VALUES.get(chr(byte), 255) for byte in range(256))
 
 
 def encode(number: int, base: int = BASE) -> str:
@@ -19,14 +31,83 @@ def encode(number: int, base: int = BASE) -> str:
     return encoding
 
 
+def decode(encoded: str, base: int = BASE) -> int:
+    """Decode a base string back to its integer; the inverse of `encode`."""
+
+    number = 0
+    for char in encoded:
+        value = CHAR_VALUES.get(char)
+        if value is None or value >= base:
+            raise ValueError(f"Invalid character for base {base}: {char!r}")
+        number = number * base + value
+    return number
+
+
 @cached(LFUCache(maxsize=1000))
 def shorten_url(url: str) -> str:
     """Generate a shortened URL code."""
 
     hash_int = xxhash.xxh64(url).intdigest()
 
-    max_value = BASE**DEFAULT_LENGTH - 1
-    hash_int = hash_int % max_value
+    hash_int = hash_int % SLUG_SPACE
 
     encoded = encode(hash_int)
     return encoded.rjust(DEFAULT_LENGTH, URL_SAFE_CHARS[0])
+
+
+def encode_many(numbers: Iterable[int], width: int = DEFAULT_LENGTH) -> list[str]:
+    """Encode integers to base strings left-padded with "0" to `width`.
+
+    Gives the same strings as `encode(number).rjust(width, "0")`, four
+    character pairs per number instead of one character at a time.
+    """
+
+    numbers = list(numbers)
+    if not 0 < width <= BATCH_MAX_WIDTH:
+        raise ValueError(f"Width must be between 1 and {BATCH_MAX_WIDTH}: {width}")
+    if numbers and (min(numbers) < 0 or max(numbers) >= BASE**width):
+        raise ValueError(f"Numbers must fit in {width} base {BASE} digits")
+
+    pairs, cut = _PAIRS, BATCH_MAX_WIDTH - width
+    base, base_2, base_3 = PAIR_BASE, PAIR_BASE**2, PAIR_BASE**3
+    return [
+        (
+            pairs[number // base_3]
+            + pairs[number // base_2 % base]
+            + pairs[number // base % base]
+            + pairs[number % base]
+        )[cut:]
+        for number in numbers
+    ]
+
+
+def decode_many(encoded: Iterable[str], width: int = DEFAULT_LENGTH) -> list[int]:
+    """Decode base strings of exactly `width` characters; inverse of encode_many."""
+
+    encoded = list(encoded)
+    if not 0 < width <= BATCH_MAX_WIDTH:
+        raise ValueError(f"Width must be between 1 and {BATCH_MAX_WIDTH}: {width}")
+    if not encoded:
+        return []
+    if not set(map(len, encoded)) <= {width}:
+        raise ValueError(f"Every string must have {width} characters")
+
+    # All strings are padded to 8 digits and translated to digit values at once.
+    pad = URL_SAFE_CHARS[0] * (BATCH_MAX_WIDTH - width)
+    digits = (pad + pad.join(encoded)).encode().translate(_DIGITS)
+    if 255 in digits or len(digits) != BATCH_MAX_WIDTH * len(encoded):
+        raise ValueError(f"Invalid character for base {BASE}")
+
+    it, base = iter(digits), BASE
+    return [
+        ((((((a * base + b) * base + c) * base + d) * base + e) * base + f) * base + g)
+        * base
+        + h
+        for a, b, c, d, e, f, g, h in zip(it, it, it, it, it, it, it, it)
+    ]
+
+
+def shorten_urls(urls: Iterable[str]) -> list[str]:
+    """Batch `shorten_url`, without its per-URL cache."""
+
+    return encode_many([xxhash.xxh64_intdigest(url) % SLUG_SPACE for url in urls])
@@ -0,0 +1,121 @@
+import json
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from typing import Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FILE = os.getenv("LOG_FILE", "/app/logs/app.log")
+LOG_MODE = os.getenv("LOG_MODE", "sync")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+TEXT_FORMAT = "%(levelname)s - %(asctime)s - %(message)s"
+
+
+def parseSampleRates(value: str) -> dict[str, float]:
+    """Parse `route=rate` pairs, e.g. "redirect=0.01,health=0"."""
+
+    rates = {}
+    for pair in value.split(","):
+        if pair.strip():
+            route, rate = pair.split("=")
+            rates[route.strip()] = float(rate)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a fraction of the success-path records logged for a route.
+
+    Records opt in by passing `extra={"route": ...}`; warnings and errors are
+    always kept.
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        route = getattr(record, "route", None)
+        if route is None or record.levelno >= logging.WARNING:
+            return True
+        # Decide once per record, so every handler keeps or drops it alike.
+        sampled = getattr(record, "sampled", None)
+        if sampled is None:
+            rate = self.rates.get(route, 1.0)
+            sampled = record.sampled = rate >= 1.0 or random.random() < rate
+        return sampled
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        route = getattr(record, "route", None)
+        if route is not None:
+            entry["route"] = route
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats the message before enqueueing it, which would
+    keep that work on the event loop. Records stay in this process, so they
+    can be enqueued as is. A full queue drops the record instead of blocking.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def configureLogging() -> Optional[QueueListener]:
+    """Configure the root logger; returns the listener to stop on shutdown.
+
+    In `sync` mode handlers write on the calling thread. In `queue` mode records
+    are handed to a background thread that formats and writes them.
+    """
+
+    formatter = JSONFormatter() if LOG_FORMAT == "json" else None
+    handlers: list[logging.Handler] = [
+        logging.StreamHandler(),
+        TimedRotatingFileHandler(
+            filename=LOG_FILE,
+            when="W0",
+            interval=1,
+            backupCount=4,
+            encoding="utf-8",
+        ),
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter or logging.Formatter(TEXT_FORMAT))
+
+    sampling = SamplingFilter(parseSampleRates(LOG_SAMPLE_RATES))
+    listener = None
+    if LOG_MODE == "queue":
+        listener = QueueListener(
+            queue.Queue(LOG_QUEUE_SIZE), *handlers, respect_handler_level=True
+        )
+        handlers = [DeferredQueueHandler(listener.queue)]
+    for handler in handlers:
+        handler.addFilter(sampling)
+
+    logging.basicConfig(level=LOG_LEVEL, handlers=handlers, force=True)
+    if listener is not None:
+        listener.start()
+    return listener
@@ -0,0 +1,222 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Optional
+
+from asyncpg import Pool
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], **extra: str) -> str:
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter, one series per combination of label values."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        for labelvalues, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_labelvalue", "_start")
+
+    def __init__(self, histogram: "Histogram", labelvalue: str):
+        self._histogram = histogram
+        self._labelvalue = labelvalue
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(self._labelvalue, time.perf_counter() - self._start)
+
+
+class Histogram:
+    """Latency histogram with one label, e.g. the hot-path stage being timed."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelname: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelname = labelname
+        self.buckets = buckets
+        # Per label value: a count per bucket plus one for +Inf, then the sum.
+        self._series: dict[str, list[float]] = {}
+
+    def observe(self, labelvalue: str, value: float) -> None:
+        series = self._series.get(labelvalue)
+        if series is None:
+            series = self._series[labelvalue] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, labelvalue: str) -> _Timer:
+        return _Timer(self, labelvalue)
+
+    def count(self, labelvalue: str) -> int:
+        series = self._series.get(labelvalue)
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        names = (self.labelname,)
+        for labelvalue, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series[:-1]):
+                cumulative += count
+                labels = _labels(names, (labelvalue,), le=str(bound))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(names, (labelvalue,))
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+        return lines
+
+
+stage_seconds = Histogram(
+    "minime_stage_duration_seconds", "Time spent in each hot-path stage.", "stage"
+)
+request_seconds = Histogram(
+    "minime_request_duration_seconds", "Time spent handling each route.", "route"
+)
+cache_requests = Counter(
+    "minime_cache_requests_total",
+    "URL cache lookups by cache layer and result.",
+    ("layer", "result"),
+)
+rate_limit_rejections = Counter(
+    "minime_rate_limit_rejections_total", "Requests rejected by the rate limiter."
+)
+writes_avoided = Counter(
+    "minime_writes_avoided_total",
+    "Re-shortened URLs returned without a write, by where the mapping was found.",
+    ("source",),
+)
+requests_shed = Counter(
+    "minime_requests_shed_total",
+    "Requests answered 503 by admission control, by route class and reason.",
+    ("route", "reason"),
+)
+breaker_transitions = Counter(
+    "minime_breaker_transitions_total",
+    "Circuit breaker state changes, by breaker and new state.",
+    ("breaker", "state"),
+)
+
+METRICS = [
+    stage_seconds,
+    request_seconds,
+    cache_requests,
+    rate_limit_rejections,
+    writes_avoided,
+    requests_shed,
+    breaker_transitions,
+]
+
+# Components that report a `stats()` dict, exported as gauges under their name.
+_stats_sources: dict[str, Callable[[], dict]] = {}
+
+
+def registerStats(component: str, stats: Callable[[], dict]) -> None:
+    _stats_sources[component] = stats
+
+
+def collectStats() -> dict:
+    return {component: stats() for component, stats in _stats_sources.items()}
+
+
+def _renderStats() -> list[str]:
+    lines = []
+    for component, stats in collectStats().items():
+        for key, value in stats.items():
+            if isinstance(value, (bool, int, float)):
+                name = f"minime_{component}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {float(value)}")
+    return lines
+
+
+def _renderPool(pool: Pool) -> list[str]:
+    size, idle = pool.get_size(), pool.get_idle_size()
+    return [
+        "# HELP minime_db_pool_connections Postgres pool connections by state.",
+        "# TYPE minime_db_pool_connections gauge",
+        f'minime_db_pool_connections{{state="in_use"}} {size - idle}',
+        f'minime_db_pool_connections{{state="idle"}} {idle}',
+        f"minime_db_pool_max_size {pool.get_max_size()}",
+    ]
+
+
+def render(pool: Optional[Pool] = None) -> str:
+    """Render every metric in the Prometheus text exposition format."""
+
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    lines.extend(_renderStats())
+    if pool is not None:
+        lines.extend(_renderPool(pool))
+    return "\n".join(lines) + "\n"
+
+
+class RequestTimingMiddleware:
+    """Records the duration of every HTTP request, labelled by route template."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            request_seconds.observe(route, time.perf_counter() - start)
@@ -1,12 +1,52 @@
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Optional
 
 from pydantic import BaseModel
 
+CACHE_FORMAT_VERSION = "2"
+
 
 class URLMapping(BaseModel):
     slug: str
     original_url: str
     created_at: datetime
+    permanent: bool = False
+    expires_at: Optional[datetime] = None
+
+    def is_expired(self) -> bool:
+        return (
+            self.expires_at is not None
+            and self.expires_at.timestamp() <= datetime.now(timezone.utc).timestamp()
+        )
+
+    def to_cache_value(self) -> str:
+        """Encode for Redis as `version|created_at|permanent|expires_at|url`."""
+
+        expires_at = "" if self.expires_at is None else self.expires_at.timestamp()
+        return (
+            f"{CACHE_FORMAT_VERSION}|{self.created_at.timestamp()}|"
+            f"{int(self.permanent)}|{expires_at}|{self.original_url}"
+        )
+
+    @classmethod
+    def from_cache_value(cls, slug: str, value: str) -> Optional["URLMapping"]:
+        """Decode `to_cache_value`; None for values in any other format."""
+
+        parts = value.split("|", 4)
+        if len(parts) != 5 or parts[0] != CACHE_FORMAT_VERSION:
+            return None
+        # The value was validated when it was written, so skip validation here.
+        return cls.model_construct(
+            slug=slug,
+            original_url=parts[4],
+            created_at=datetime.fromtimestamp(float(parts[1]), timezone.utc),
+            permanent=parts[2] == "1",
+            expires_at=(
+                datetime.fromtimestamp(float(parts[3]), timezone.utc)
+                if parts[3]
+                else None
+            ),
+        )
 
 
 class RateLimit(BaseModel):
@@ -0,0 +1,129 @@
+import os
+import time
+from datetime import datetime
+from typing import Optional
+from uuid import uuid4
+
+from asyncpg import Connection
+from cachetools import TTLCache
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+
+from src.breakers import redis_breaker
+from src.metrics import registerStats
+from src.models import RateLimit
+from src.repository import RATE_LIMIT_DURATION_SECONDS, getRateLimit
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "postgres")
+RATE_LIMIT_REQUESTS = int(os.getenv("RATE_LIMIT_REQUESTS", 100))
+LOCAL_RATE_LIMIT_CLIENTS = int(os.getenv("LOCAL_RATE_LIMIT_CLIENTS", 100000))
+
+# Sliding-window log: one sorted-set member per admitted unit of cost, scored by
+# the Redis server clock in microseconds. Rejected requests are not logged, so a
+# key never holds more than `limit` members.
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local token = ARGV[3]
+local cost = tonumber(ARGV[4])
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000000 + tonumber(time[2])
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+local count = redis.call('ZCARD', key) + cost
+if count < limit then
+    for i = 1, cost do
+        redis.call('ZADD', key, now, token .. ':' .. i)
+    end
+    redis.call('PEXPIRE', key, math.ceil(window / 1000))
+end
+return count
+"""
+
+
+class PostgresRateLimiter:
+    """Counts requests per IP in the `rate_limits` table."""
+
+    async def hit(
+        self, conn: Connection, redis: Redis, client_ip: str, cost: int = 1
+    ) -> Optional[RateLimit]:
+        return await getRateLimit(conn, client_ip, cost)
+
+
+class RedisRateLimiter:
+    """Counts requests per IP in a sliding window kept in Redis."""
+
+    def __init__(self, limit: int, window_seconds: int):
+        self.limit = limit
+        self.window_us = window_seconds * 1_000_000
+        self._script: Optional[AsyncScript] = None
+
+    async def hit(
+        self, conn: Connection, redis: Redis, client_ip: str, cost: int = 1
+    ) -> Optional[RateLimit]:
+        if self._script is None:
+            self._script = redis.register_script(SLIDING_WINDOW_SCRIPT)
+
+        async with redis_breaker:
+            request_count = await self._script(
+                keys=[f"ratelimit:{client_ip}"],
+                args=[self.window_us, self.limit, uuid4().hex, cost],
+                client=redis,
+            )
+        return RateLimit(
+            ip_address=client_ip,
+            request_count=int(request_count),
+            last_request=datetime.utcnow(),
+        )
+
+
+class LocalRateLimiter:
+    """Counts requests per IP in this worker's memory, in fixed windows.
+
+    The fallback while the configured backend is unavailable: each worker
+    applies the whole limit on its own, and counts are lost on restart.
+    """
+
+    def __init__(self, window_seconds: int, max_clients: int):
+        self.window_seconds = window_seconds
+        # client IP -> (end of its current window, request count in it)
+        self._windows: TTLCache = TTLCache(
+            maxsize=max(max_clients, 1), ttl=max(window_seconds, 1)
+        )
+        self.hits = 0
+
+    async def hit(
+        self, conn: Connection, redis: Redis, client_ip: str, cost: int = 1
+    ) -> Optional[RateLimit]:
+        self.hits += 1
+        now = time.monotonic()
+        window_end, request_count = self._windows.get(client_ip, (0.0, 0))
+        if window_end <= now:
+            window_end, request_count = now + self.window_seconds, 0
+        request_count += cost
+        self._windows[client_ip] = (window_end, request_count)
+        return RateLimit(
+            ip_address=client_ip,
+            request_count=request_count,
+            last_request=datetime.utcnow(),
+        )
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "clients": len(self._windows)}
+
+
+def createRateLimiter(backend: str) -> PostgresRateLimiter | RedisRateLimiter:
+    if backend == "postgres":
+        return PostgresRateLimiter()
+    if backend == "redis":
+        return RedisRateLimiter(RATE_LIMIT_REQUESTS, RATE_LIMIT_DURATION_SECONDS)
+    raise ValueError(f"Unknown rate limit backend: {backend}")
+
+
+rate_limiter = createRateLimiter(RATE_LIMIT_BACKEND)
+local_rate_limiter = LocalRateLimiter(
+    RATE_LIMIT_DURATION_SECONDS, LOCAL_RATE_LIMIT_CLIENTS
+)
+registerStats("local_rate_limiter", local_rate_limiter.stats)
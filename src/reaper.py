@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+
+from asyncpg import Connection, Pool
+
+from src.metrics import registerStats
+from src.repository import (
+    RATE_LIMIT_DURATION_SECONDS,
+    advisoryUnlock,
+    deleteExpiredURLMappings,
+    deleteIdleRateLimits,
+    tryAdvisoryLock,
+)
+
+logger = logging.getLogger(__name__)
+
+REAPER_ENABLED = os.getenv("REAPER_ENABLED", "false").lower() == "true"
+REAPER_INTERVAL_SECONDS = float(os.getenv("REAPER_INTERVAL_SECONDS", 300))
+REAPER_BATCH_SIZE = int(os.getenv("REAPER_BATCH_SIZE", 500))
+REAPER_BATCH_DELAY_SECONDS = float(os.getenv("REAPER_BATCH_DELAY_SECONDS", 0.05))
+RATE_LIMIT_RETENTION_SECONDS = int(
+    os.getenv("RATE_LIMIT_RETENTION_SECONDS", RATE_LIMIT_DURATION_SECONDS)
+)
+REAPER_LOCK_ID = 0x6D696E696D65  # "minime"
+
+
+class Reaper:
+    """Deletes expired links and idle `rate_limits` rows in the background.
+
+    Each run is taken by one worker at a time, through a Postgres advisory lock.
+    Rows are deleted in batches of `batch_size`, each its own short statement
+    followed by a `batch_delay` pause, so that a large backlog never holds many
+    row locks at once or saturates the database.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        interval: float,
+        batch_size: int,
+        batch_delay: float,
+        rate_limit_retention: int,
+    ):
+        self.enabled = enabled
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        # Rows idle for a whole window would restart their count anyway.
+        self.rate_limit_retention = max(
+            rate_limit_retention, RATE_LIMIT_DURATION_SECONDS
+        )
+        self.runs = 0
+        self.skipped = 0
+        self.mappings_purged = 0
+        self.rate_limits_purged = 0
+        self.last_run: dict = {}
+
+    async def purge(
+        self, pool: Pool, delete: Callable[[Connection], Awaitable[int]]
+    ) -> int:
+        purged = 0
+        while True:
+            async with pool.acquire() as conn:
+                deleted = await delete(conn)
+            purged += deleted
+            if deleted < self.batch_size:
+                return purged
+            await asyncio.sleep(self.batch_delay)
+
+    async def runOnce(self, primary: Pool, shards: list[Pool]) -> Optional[dict]:
+        """Purge every shard and the primary; None if another worker is at it."""
+
+        start = time.perf_counter()
+        async with primary.acquire() as lock_conn:
+            if not await tryAdvisoryLock(lock_conn, REAPER_LOCK_ID):
+                self.skipped += 1
+                return None
+            try:
+                mappings = 0
+                for pool in shards or [primary]:
+                    mappings += await self.purge(
+                        pool,
+                        lambda conn: deleteExpiredURLMappings(conn, self.batch_size),
+                    )
+                idle_before = datetime.now(timezone.utc) - timedelta(
+                    seconds=self.rate_limit_retention
+                )
+                rate_limits = await self.purge(
+                    primary,
+                    lambda conn: deleteIdleRateLimits(
+                        conn, idle_before, self.batch_size
+                    ),
+                )
+            finally:
+                await advisoryUnlock(lock_conn, REAPER_LOCK_ID)
+
+        self.runs += 1
+        self.mappings_purged += mappings
+        self.rate_limits_purged += rate_limits
+        self.last_run = {
+            "mappings": mappings,
+            "rate_limits": rate_limits,
+            "seconds": time.perf_counter() - start,
+        }
+        logger.info(
+            "Reaper purged %d expired links and %d idle rate limit rows in %.2fs",
+            mappings,
+            rate_limits,
+            self.last_run["seconds"],
+        )
+        return self.last_run
+
+    async def run(self, primary: Pool, shards: list[Pool]) -> None:
+        """Purge every `interval` seconds until cancelled."""
+
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.runOnce(primary, shards)
+            except Exception as exc:
+                logger.error("Reaper run failed: %s", exc)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "mappings_purged": self.mappings_purged,
+            "rate_limits_purged": self.rate_limits_purged,
+            "last_run_mappings": self.last_run.get("mappings", 0),
+            "last_run_rate_limits": self.last_run.get("rate_limits", 0),
+            "last_run_seconds": self.last_run.get("seconds", 0.0),
+        }
+
+
+reaper = Reaper(
+    REAPER_ENABLED,
+    REAPER_INTERVAL_SECONDS,
+    REAPER_BATCH_SIZE,
+    REAPER_BATCH_DELAY_SECONDS,
+    RATE_LIMIT_RETENTION_SECONDS,
+)
+registerStats("reaper", reaper.stats)
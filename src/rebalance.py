@@ -0,0 +1,108 @@
+"""Move url_mappings rows to the shard that the shard router assigns them.
+
+Usage:
+    DATABASE_URL=postgresql://... DATABASE_SHARD_URLS=postgresql://...,... \\
+        python -m src.rebalance [--copy-only] [--dry-run]
+
+To add a shard, append its URL to DATABASE_SHARD_URLS and:
+
+1. Create the schema on the new database from init.sql.
+2. Run with the new shard list and `--copy-only`. Rows are copied to their new
+   shard and kept on the old one, where workers still on the old list look.
+3. Deploy the workers with the new DATABASE_SHARD_URLS.
+4. Run again without `--copy-only`, to copy rows written during the rollout
+   and delete every row from the shard it no longer belongs to.
+
+Copies keep the newest version of a row, so the tool can be re-run safely.
+"""
+
+import argparse
+import asyncio
+import os
+
+import asyncpg
+from asyncpg import Pool
+
+from src.models import URLMapping
+from src.repository import (
+    DATABASE_SHARD_URLS,
+    ShardRouter,
+    copyURLMappings,
+    deleteURLMappings,
+    streamURLMappings,
+)
+
+BATCH_SIZE = 1000
+
+
+async def _move(
+    router: ShardRouter, source: int, batch: list[URLMapping], copy_only: bool
+) -> int:
+    targets: dict[int, list[URLMapping]] = {}
+    for mapping in batch:
+        targets.setdefault(router.shardFor(mapping.slug), []).append(mapping)
+    for target, mappings in targets.items():
+        async with router.pools[target].acquire() as conn:
+            await copyURLMappings(conn, mappings)
+
+    if copy_only:
+        return 0
+    # Deleted on a second connection, as the first one holds the read cursor.
+    async with router.pools[source].acquire() as conn:
+        return await deleteURLMappings(conn, [mapping.slug for mapping in batch])
+
+
+async def rebalance(
+    pools: list[Pool],
+    copy_only: bool = False,
+    dry_run: bool = False,
+    batch_size: int = BATCH_SIZE,
+) -> dict[str, int]:
+    router = ShardRouter()
+    router.pools = pools
+    counts = {"scanned": 0, "misplaced": 0, "deleted": 0}
+
+    for source, pool in enumerate(pools):
+        async with pool.acquire() as conn:
+            batch: list[URLMapping] = []
+            async for mapping in streamURLMappings(conn):
+                counts["scanned"] += 1
+                if router.shardFor(mapping.slug) == source:
+                    continue
+                counts["misplaced"] += 1
+                if dry_run:
+                    continue
+                batch.append(mapping)
+                if len(batch) >= batch_size:
+                    counts["deleted"] += await _move(router, source, batch, copy_only)
+                    batch = []
+            if batch:
+                counts["deleted"] += await _move(router, source, batch, copy_only)
+    return counts
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--copy-only", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    pools = [
+        await asyncpg.create_pool(url, min_size=1, max_size=4)
+        for url in [os.environ["DATABASE_URL"], *DATABASE_SHARD_URLS]
+    ]
+    try:
+        counts = await rebalance(pools, args.copy_only, args.dry_run, args.batch_size)
+    finally:
+        for pool in pools:
+            await pool.close()
+
+    print(
+        f"{counts['scanned']} rows scanned on {len(pools)} shards, "
+        f"{counts['misplaced']} misplaced, {counts['deleted']} deleted"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
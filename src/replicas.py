@@ -0,0 +1,100 @@
+import logging
+import os
+import time
+from typing import Optional
+
+import asyncpg
+from asyncpg import Pool
+from redis.asyncio import Redis
+
+from src.metrics import registerStats
+from src.repository import COMMAND_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+DATABASE_REPLICA_URLS = [
+    url.strip()
+    for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",")
+    if url.strip()
+]
+REPLICA_WRITE_MARKER_SECONDS = int(os.getenv("REPLICA_WRITE_MARKER_SECONDS", 5))
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", 5))
+
+
+class ReplicaSet:
+    """Read replica pools, used round-robin and skipped for a while after errors."""
+
+    def __init__(self, retry_seconds: float):
+        self.retry_seconds = retry_seconds
+        self.pools: list[Pool] = []
+        self._unhealthy_until: dict[Pool, float] = {}
+        self._next = 0
+        self.reads = 0
+        self.fallbacks = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.pools)
+
+    async def connect(self, urls: list[str]):
+        for url in urls:
+            try:
+                self.pools.append(
+                    await asyncpg.create_pool(
+                        url, min_size=1, max_size=20, command_timeout=COMMAND_TIMEOUT
+                    )
+                )
+            except Exception as exc:
+                # The primary still serves reads, so a replica that is down at
+                # startup is left out rather than failing the worker.
+                logger.error("Could not connect to read replica: %s", exc)
+
+    def choose(self) -> Optional[Pool]:
+        now = time.monotonic()
+        for _ in range(len(self.pools)):
+            pool = self.pools[self._next % len(self.pools)]
+            self._next += 1
+            if self._unhealthy_until.get(pool, 0) <= now:
+                return pool
+        return None
+
+    def markFailed(self, pool: Pool):
+        self.failures += 1
+        self._unhealthy_until[pool] = time.monotonic() + self.retry_seconds
+
+    async def close(self):
+        for pool in self.pools:
+            await pool.close()
+        self.pools = []
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "replicas": len(self.pools),
+            "healthy": sum(
+                self._unhealthy_until.get(pool, 0) <= now for pool in self.pools
+            ),
+            "reads": self.reads,
+            "fallbacks": self.fallbacks,
+            "failures": self.failures,
+        }
+
+
+replica_set = ReplicaSet(REPLICA_RETRY_SECONDS)
+registerStats("replicas", replica_set.stats)
+
+
+async def markWritten(redis: Redis, *slugs: str):
+    """Route reads of `slugs` to the primary until replicas have caught up."""
+
+    if not replica_set.enabled:
+        return
+    async with redis.pipeline(transaction=False) as pipe:
+        for slug in slugs:
+            pipe.set(f"written:{slug}", 1, ex=REPLICA_WRITE_MARKER_SECONDS)
+        await pipe.execute()
+
+
+async def recentlyWritten(redis: Redis, slug: str) -> bool:
+    return bool(await redis.exists(f"written:{slug}"))
@@ -1,64 +1,493 @@
 import os
+from contextlib import AsyncExitStack, asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, AsyncIterator, Optional
 
-from asyncpg import Connection
+import asyncpg
+import xxhash
+from asyncpg import Connection, Pool
 
+from src.breakers import postgres_breaker
+from src.helpers import decode
 from src.models import RateLimit, URLMapping
 
 RATE_LIMIT_DURATION_SECONDS = int(os.getenv("RATE_LIMIT_DURATION_SECONDS", 600))
 RATE_LIMIT_DURATION = timedelta(seconds=RATE_LIMIT_DURATION_SECONDS)
+DATABASE_SHARD_URLS = [
+    url.strip()
+    for url in os.getenv("DATABASE_SHARD_URLS", "").split(",")
+    if url.strip()
+]
+# 0 waits for as long as it takes.
+DATABASE_ACQUIRE_TIMEOUT_SECONDS = float(
+    os.getenv("DATABASE_ACQUIRE_TIMEOUT_SECONDS", 5)
+)
+DATABASE_COMMAND_TIMEOUT_SECONDS = float(
+    os.getenv("DATABASE_COMMAND_TIMEOUT_SECONDS", 10)
+)
+ACQUIRE_TIMEOUT = DATABASE_ACQUIRE_TIMEOUT_SECONDS or None
+COMMAND_TIMEOUT = DATABASE_COMMAND_TIMEOUT_SECONDS or None
+
+
+def jumpHash(key: int, buckets: int) -> int:
+    """Jump consistent hash: adding a bucket only moves keys into the new one."""
+
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+class ObservedConnection:
+    """Connection whose query errors count as `postgres_breaker` failures.
+
+    Exposes the subset of the asyncpg `Connection` API used by the repository;
+    anything else, such as `transaction()`, goes to the connection unobserved.
+    """
+
+    def __init__(self, conn: Connection):
+        self._conn = conn
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+    async def execute(self, query: str, *args: Any, **kwargs: Any) -> str:
+        async with postgres_breaker.observe():
+            return await self._conn.execute(query, *args, **kwargs)
+
+    async def executemany(self, command: str, args: Any, **kwargs: Any):
+        async with postgres_breaker.observe():
+            return await self._conn.executemany(command, args, **kwargs)
+
+    async def fetch(self, query: str, *args: Any, **kwargs: Any) -> list:
+        async with postgres_breaker.observe():
+            return await self._conn.fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query: str, *args: Any, **kwargs: Any):
+        async with postgres_breaker.observe():
+            return await self._conn.fetchrow(query, *args, **kwargs)
+
+    async def fetchval(self, query: str, *args: Any, **kwargs: Any):
+        async with postgres_breaker.observe():
+            return await self._conn.fetchval(query, *args, **kwargs)
+
+    async def copy_records_to_table(self, table_name: str, **kwargs: Any):
+        async with postgres_breaker.observe():
+            return await self._conn.copy_records_to_table(table_name, **kwargs)
+
+
+class ShardRouter:
+    """Maps each slug to the database holding its `url_mappings` row.
+
+    Shard 0 is the primary database, which also keeps every other table; the
+    shards after it only hold `url_mappings`. Slugs already encode the xxhash
+    of their URL, so the decoded slug is used as the hash key. New shards must
+    be appended, and existing rows moved with `python -m src.rebalance`.
+    """
+
+    def __init__(self):
+        self.pools: list[Pool] = []
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.pools) > 1
+
+    def shardFor(self, slug: str, shards: Optional[int] = None) -> int:
+        shards = len(self.pools) if shards is None else shards
+        if shards <= 1:
+            return 0
+        try:
+            key = decode(slug)
+        except ValueError:
+            # Not a generated slug, so not stored anywhere; any shard will do.
+            key = xxhash.xxh64_intdigest(slug)
+        return jumpHash(key, shards)
+
+    def groupByShard(self, slugs: list[str]) -> dict[int, list[str]]:
+        groups: dict[int, list[str]] = {}
+        for slug in slugs:
+            groups.setdefault(self.shardFor(slug), []).append(slug)
+        return groups
+
+    @asynccontextmanager
+    async def connection(self, conn: Connection, shard: int) -> AsyncIterator:
+        """Yield `conn` (the primary) for shard 0, else a connection to `shard`."""
+
+        if shard == 0:
+            yield conn
+            return
+        async with AsyncExitStack() as stack:
+            # Raises BreakerOpen at once while Postgres is known to be down.
+            async with postgres_breaker:
+                shard_conn = await stack.enter_async_context(
+                    self.pools[shard].acquire(timeout=ACQUIRE_TIMEOUT)
+                )
+            yield ObservedConnection(shard_conn)
+
+    async def connect(self, primary: Pool, urls: list[str]):
+        self.pools = [primary]
+        for url in urls:
+            self.pools.append(
+                await asyncpg.create_pool(
+                    url, min_size=1, max_size=20, command_timeout=COMMAND_TIMEOUT
+                )
+            )
+
+    async def close(self):
+        for pool in self.pools[1:]:
+            await pool.close()
+        self.pools = []
+
+
+shard_router = ShardRouter()
+
+
+URL_MAPPING_COLUMNS = "slug, original_url, created_at, permanent, expires_at"
+# Appended to the upserts' DO UPDATE, so that re-shortening a URL with the same
+# options neither rewrites the row nor returns it.
+CHANGED_MAPPING_FILTER = """
+        WHERE (
+            url_mappings.original_url, url_mappings.permanent, url_mappings.expires_at
+        ) IS DISTINCT FROM (
+            EXCLUDED.original_url, EXCLUDED.permanent, EXCLUDED.expires_at
+        )
+"""
+
+
+def _toURLMapping(record) -> URLMapping:
+    return URLMapping(
+        slug=record["slug"],
+        original_url=record["original_url"],
+        created_at=record["created_at"],
+        permanent=record["permanent"],
+        expires_at=record["expires_at"],
+    )
 
 
 async def upsertURLMapping(
-    conn: Connection, original_url: str, slug: str
+    conn: Connection,
+    original_url: str,
+    slug: str,
+    permanent: bool = False,
+    expires_at: Optional[datetime] = None,
+    skip_unchanged: bool = False,
 ) -> Optional[URLMapping]:
+    # With `skip_unchanged`, None also means the row exists and was left as is.
     result = await conn.fetchrow(
-        """
-        INSERT INTO url_mappings (slug, original_url)
-        VALUES ($1, $2)
+        f"""
+        INSERT INTO url_mappings (slug, original_url, permanent, expires_at)
+        VALUES ($1, $2, $3, $4)
         ON CONFLICT (slug) DO UPDATE
         SET original_url = EXCLUDED.original_url,
+            permanent = EXCLUDED.permanent,
+            expires_at = EXCLUDED.expires_at,
             created_at = CURRENT_TIMESTAMP
-        RETURNING slug, original_url, created_at
+        {CHANGED_MAPPING_FILTER if skip_unchanged else ""}
+        RETURNING {URL_MAPPING_COLUMNS}
         """,
         slug,
         original_url,
+        permanent,
+        expires_at,
     )
     if result:
-        return URLMapping(
-            slug=result["slug"],
-            original_url=result["original_url"],
-            created_at=result["created_at"],
-        )
+        return _toURLMapping(result)
     return None
 
 
-async def getOriginalURL(conn: Connection, slug: str) -> Optional[str]:
-    result = await conn.fetchrow(
+async def upsertURLMappings(
+    conn: Connection,
+    original_urls: list[str],
+    slugs: list[str],
+    permanent: bool = False,
+    expires_at: Optional[datetime] = None,
+    skip_unchanged: bool = False,
+    overwrite: bool = True,
+) -> list[URLMapping]:
+    # Set-based variant of upsertURLMapping. Slugs must be unique within a call,
+    # since a single statement cannot update the same row twice. Without
+    # `overwrite`, slugs that already exist are left as is and not returned.
+    conflict = (
+        f"""
+        DO UPDATE
+        SET original_url = EXCLUDED.original_url,
+            permanent = EXCLUDED.permanent,
+            expires_at = EXCLUDED.expires_at,
+            created_at = CURRENT_TIMESTAMP
+        {CHANGED_MAPPING_FILTER if skip_unchanged else ""}
         """
-        SELECT original_url FROM url_mappings WHERE slug = $1
+        if overwrite
+        else "DO NOTHING"
+    )
+    results = await conn.fetch(
+        f"""
+        INSERT INTO url_mappings (slug, original_url, permanent, expires_at)
+        SELECT slug, original_url, $3, $4
+        FROM unnest($1::text[], $2::text[]) AS batch (slug, original_url)
+        ON CONFLICT (slug) {conflict}
+        RETURNING {URL_MAPPING_COLUMNS}
+        """,
+        slugs,
+        original_urls,
+        permanent,
+        expires_at,
+    )
+    return [_toURLMapping(result) for result in results]
+
+
+async def getURLMapping(conn: Connection, slug: str) -> Optional[URLMapping]:
+    # Expired rows are ignored here and deleted later by the reaper.
+    result = await conn.fetchrow(
+        f"""
+        SELECT {URL_MAPPING_COLUMNS}
+        FROM url_mappings
+        WHERE slug = $1 AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
         """,
         slug,
     )
 
     if result:
-        return result["original_url"]
+        return _toURLMapping(result)
     return None
 
 
-async def getRateLimit(conn: Connection, client_ip: str) -> Optional[RateLimit]:
+async def streamSlugs(conn: Connection, prefetch: int = 10000) -> AsyncIterator[str]:
+    # Server-side cursors only live inside a transaction.
+    async with conn.transaction():
+        async for record in conn.cursor(
+            "SELECT slug FROM url_mappings", prefetch=prefetch
+        ):
+            yield record["slug"]
+
+
+async def streamURLMappings(
+    conn: Connection, prefetch: int = 10000
+) -> AsyncIterator[URLMapping]:
+    async with conn.transaction():
+        async for record in conn.cursor(
+            f"SELECT {URL_MAPPING_COLUMNS} FROM url_mappings",
+            prefetch=prefetch,
+        ):
+            yield _toURLMapping(record)
+
+
+async def streamRecentURLMappings(
+    conn: Connection, limit: int, prefetch: int = 1000
+) -> AsyncIterator[URLMapping]:
+    # Newest first, along url_mappings_created_at_idx.
+    async with conn.transaction():
+        async for record in conn.cursor(
+            f"""
+            SELECT {URL_MAPPING_COLUMNS}
+            FROM url_mappings
+            WHERE expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP
+            ORDER BY created_at DESC
+            LIMIT $1
+            """,
+            limit,
+            prefetch=prefetch,
+        ):
+            yield _toURLMapping(record)
+
+
+async def streamMostClickedSlugs(
+    conn: Connection, since: datetime, limit: int, prefetch: int = 1000
+) -> AsyncIterator[str]:
+    async with conn.transaction():
+        async for record in conn.cursor(
+            """
+            SELECT slug
+            FROM url_clicks
+            WHERE clicked_at >= $1
+            GROUP BY slug
+            ORDER BY count(*) DESC
+            LIMIT $2
+            """,
+            since,
+            limit,
+            prefetch=prefetch,
+        ):
+            yield record["slug"]
+
+
+async def getURLMappings(conn: Connection, slugs: list[str]) -> list[URLMapping]:
+    results = await conn.fetch(
+        f"""
+        SELECT {URL_MAPPING_COLUMNS}
+        FROM url_mappings
+        WHERE slug = ANY($1::text[])
+            AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
+        """,
+        slugs,
+    )
+    return [_toURLMapping(result) for result in results]
+
+
+async def copyURLMappings(conn: Connection, mappings: list[URLMapping]):
+    # Unlike upsertURLMappings, rows keep their created_at, and a row that
+    # already exists is only replaced by a newer one.
+    await conn.execute(
+        """
+        INSERT INTO url_mappings (slug, original_url, created_at, permanent, expires_at)
+        SELECT * FROM unnest(
+            $1::text[], $2::text[], $3::timestamptz[], $4::bool[], $5::timestamptz[]
+        )
+        ON CONFLICT (slug) DO UPDATE
+        SET original_url = EXCLUDED.original_url,
+            created_at = EXCLUDED.created_at,
+            permanent = EXCLUDED.permanent,
+            expires_at = EXCLUDED.expires_at
+        WHERE url_mappings.created_at < EXCLUDED.created_at
+        """,
+        [mapping.slug for mapping in mappings],
+        [mapping.original_url for mapping in mappings],
+        [mapping.created_at for mapping in mappings],
+        [mapping.permanent for mapping in mappings],
+        [mapping.expires_at for mapping in mappings],
+    )
+
+
+async def importURLMappings(
+    conn: Connection, records: list[tuple], overwrite: bool = False
+) -> tuple[list[URLMapping], int, list[tuple[str, str, str]]]:
+    """COPY (slug, original_url, created_at, permanent, expires_at) records in.
+
+    Returns the mappings written, how many of them are new, and the collisions
+    as (slug, original_url, existing_url): slugs already mapped to another URL,
+    which keep it unless `overwrite` is set. A NULL created_at means now. Slugs
+    must be unique within a call.
+    """
+
+    async with conn.transaction():
+        await conn.execute(
+            """
+            CREATE TEMPORARY TABLE IF NOT EXISTS url_mappings_import
+                (LIKE url_mappings) ON COMMIT DELETE ROWS
+            """
+        )
+        await conn.copy_records_to_table(
+            "url_mappings_import",
+            records=records,
+            columns=["slug", "original_url", "created_at", "permanent", "expires_at"],
+        )
+        collisions = await conn.fetch(
+            """
+            SELECT i.slug, i.original_url, m.original_url AS existing_url
+            FROM url_mappings_import i
+            JOIN url_mappings m USING (slug)
+            WHERE m.original_url <> i.original_url
+            """
+        )
+        conflict = (
+            f"""
+            DO UPDATE
+            SET original_url = EXCLUDED.original_url,
+                created_at = EXCLUDED.created_at,
+                permanent = EXCLUDED.permanent,
+                expires_at = EXCLUDED.expires_at
+            {CHANGED_MAPPING_FILTER}
+            """
+            if overwrite
+            else "DO NOTHING"
+        )
+        written = await conn.fetch(
+            f"""
+            INSERT INTO url_mappings ({URL_MAPPING_COLUMNS})
+            SELECT slug, original_url, coalesce(created_at, CURRENT_TIMESTAMP),
+                permanent, expires_at
+            FROM url_mappings_import
+            ON CONFLICT (slug) {conflict}
+            RETURNING {URL_MAPPING_COLUMNS}, (xmax = 0) AS inserted
+            """
+        )
+    return (
+        [_toURLMapping(row) for row in written],
+        sum(row["inserted"] for row in written),
+        [tuple(row.values()) for row in collisions],
+    )
+
+
+async def deleteURLMappings(conn: Connection, slugs: list[str]) -> int:
+    result = await conn.execute(
+        "DELETE FROM url_mappings WHERE slug = ANY($1::text[])", slugs
+    )
+    return int(result.split()[-1])
+
+
+async def deleteExpiredURLMappings(conn: Connection, limit: int) -> int:
+    # Driven by url_mappings_expires_at_idx. Rows locked by a concurrent
+    # re-shorten are skipped rather than waited for.
+    result = await conn.execute(
+        """
+        DELETE FROM url_mappings
+        WHERE slug IN (
+            SELECT slug FROM url_mappings
+            WHERE expires_at <= CURRENT_TIMESTAMP
+            ORDER BY expires_at
+            LIMIT $1
+            FOR UPDATE SKIP LOCKED
+        )
+        """,
+        limit,
+    )
+    return int(result.split()[-1])
+
+
+async def leaseSlugIds(conn: Connection, count: int) -> list[int]:
+    # One round trip for the whole block. Concurrent leases may interleave, so
+    # the IDs are unique but not necessarily contiguous.
+    results = await conn.fetch(
+        "SELECT nextval('url_slug_ids') AS id FROM generate_series(1, $1)", count
+    )
+    return [result["id"] for result in results]
+
+
+async def getLastSequenceSlug(conn: Connection, length: int) -> Optional[str]:
+    # Slugs of one length sort like the numbers they encode under the C
+    # collation. This scans the table, so it is only run after a conflict.
+    return await conn.fetchval(
+        """
+        SELECT max(slug COLLATE "C")
+        FROM url_mappings
+        WHERE length(slug) = $1 AND slug ~ '^[0-9A-Za-z]+$'
+        """,
+        length,
+    )
+
+
+async def advanceSlugIds(conn: Connection, last_id: int):
+    await conn.execute(
+        """
+        SELECT setval('url_slug_ids', $1)
+        FROM url_slug_ids
+        WHERE last_value < $1
+        """,
+        last_id,
+    )
+
+
+async def insertClicks(conn: Connection, clicks: list[tuple[str, datetime]]):
+    await conn.copy_records_to_table(
+        "url_clicks", records=clicks, columns=["slug", "clicked_at"]
+    )
+
+
+async def getRateLimit(
+    conn: Connection, client_ip: str, cost: int = 1
+) -> Optional[RateLimit]:
     now = datetime.utcnow()
 
     result = await conn.fetchrow(
         """
         INSERT INTO rate_limits (ip_address, request_count, last_request)
-        VALUES ($1, 1, $2)
+        VALUES ($1, $4, $2)
         ON CONFLICT (ip_address) DO UPDATE
         SET
             request_count = CASE
-                WHEN rate_limits.last_request < $3 THEN 1
-                ELSE rate_limits.request_count + 1
+                WHEN rate_limits.last_request < $3 THEN $4
+                ELSE rate_limits.request_count + $4
             END,
             last_request = $2
         RETURNING ip_address, request_count, last_request
@@ -66,6 +495,7 @@ async def getRateLimit(conn: Connection, client_ip: str) -> Optional[RateLimit]:
         client_ip,
         now,
         now - RATE_LIMIT_DURATION,
+        cost,
     )
 
     if result:
@@ -75,3 +505,32 @@ async def getRateLimit(conn: Connection, client_ip: str) -> Optional[RateLimit]:
             last_request=result["last_request"],
         )
     return None
+
+
+async def deleteIdleRateLimits(
+    conn: Connection, idle_before: datetime, limit: int
+) -> int:
+    # Driven by rate_limits_last_request_idx, like deleteExpiredURLMappings.
+    result = await conn.execute(
+        """
+        DELETE FROM rate_limits
+        WHERE ip_address IN (
+            SELECT ip_address FROM rate_limits
+            WHERE last_request < $1
+            ORDER BY last_request
+            LIMIT $2
+            FOR UPDATE SKIP LOCKED
+        )
+        """,
+        idle_before,
+        limit,
+    )
+    return int(result.split()[-1])
+
+
+async def tryAdvisoryLock(conn: Connection, key: int) -> bool:
+    return await conn.fetchval("SELECT pg_try_advisory_lock($1)", key)
+
+
+async def advisoryUnlock(conn: Connection, key: int):
+    await conn.execute("SELECT pg_advisory_unlock($1)", key)
@@ -1,17 +1,70 @@
+import asyncio
 import logging
+import math
 import os
+import random
+import time
+from datetime import datetime
+from typing import Optional, Union, cast
 
 from asyncpg import Connection
 from redis.asyncio import Redis
 
-from src.helpers import shorten_url
+from src.bloom import slug_filter
+from src.breakers import postgres_breaker, redis_breaker
+from src.cache import (
+    applyInvalidation,
+    missedInvalidation,
+    publishInvalidation,
+    url_cache,
+    url_loads,
+)
+from src.cachelayout import cache_layout
+from src.dependencies import LazyConnection
+from src.metrics import (
+    cache_requests,
+    rate_limit_rejections,
+    stage_seconds,
+    writes_avoided,
+)
 from src.models import URLMapping
-from src.repository import getOriginalURL, getRateLimit, upsertURLMapping
+from src.ratelimit import RATE_LIMIT_REQUESTS, local_rate_limiter, rate_limiter
+from src.replicas import markWritten, recentlyWritten, replica_set
+from src.repository import (
+    ACQUIRE_TIMEOUT,
+    getURLMapping,
+    getURLMappings,
+    shard_router,
+    upsertURLMapping,
+    upsertURLMappings,
+)
+from src.sharedcache import shared_cache
+from src.slugs import slug_allocator
 
 logger = logging.getLogger(__name__)
 
-RATE_LIMIT_REQUESTS = int(os.getenv("RATE_LIMIT_REQUESTS", 100))
 CACHE_EXPIRY_SECONDS = int(os.getenv("CACHE_EXPIRY_SECONDS", 3600))
+NEGATIVE_CACHE_SECONDS = int(os.getenv("NEGATIVE_CACHE_SECONDS", 30))
+CACHE_TTL_JITTER_SECONDS = int(os.getenv("CACHE_TTL_JITTER_SECONDS", 0))
+CACHE_STALE_SECONDS = int(os.getenv("CACHE_STALE_SECONDS", 0))
+SINGLE_FLIGHT_LOCK_MS = int(os.getenv("SINGLE_FLIGHT_LOCK_MS", 0))
+SINGLE_FLIGHT_POLL_MS = 10
+# A batch of RATE_LIMIT_REQUESTS URLs or more could never be admitted, and would
+# still be charged to the client, so it is rejected by validation instead.
+BATCH_MAX_SIZE = min(
+    int(os.getenv("BATCH_MAX_SIZE", RATE_LIMIT_REQUESTS - 1)), RATE_LIMIT_REQUESTS - 1
+)
+SKIP_UNCHANGED_WRITES = os.getenv("SKIP_UNCHANGED_WRITES", "false").lower() == "true"
+# How many fresh slugs a URL may be given when non-deterministic ones collide.
+SLUG_INSERT_ATTEMPTS = 3
+
+# Errors meaning the rate limiter's backend cannot be reached right now.
+BACKEND_UNAVAILABLE = (*redis_breaker.unavailable, *postgres_breaker.unavailable)
+# Returned by a Redis call that could not be made.
+_UNAVAILABLE = object()
+
+_revalidating: set[str] = set()
+_background_tasks: set[asyncio.Task] = set()
 
 
 class RateLimitExceeded(Exception):
@@ -41,44 +94,512 @@ class UpsertFailed(Exception):
         super().__init__(self.message)
 
 
-async def checkRateLimit(conn: Connection, client_ip: str):
-    rate_limit = await getRateLimit(conn, client_ip)
+def cacheTTL() -> int:
+    """Redis TTL for a URL entry, including jitter and the stale window."""
+
+    ttl = CACHE_EXPIRY_SECONDS + CACHE_STALE_SECONDS
+    if CACHE_TTL_JITTER_SECONDS > 0:
+        ttl += random.randint(0, CACHE_TTL_JITTER_SECONDS)
+    return ttl
+
+
+def mappingTTL(mapping: URLMapping) -> int:
+    """cacheTTL, shortened so that the entry does not outlive the mapping."""
+
+    ttl = cacheTTL()
+    if mapping.expires_at is not None:
+        remaining = math.ceil(mapping.expires_at.timestamp() - time.time())
+        ttl = max(1, min(ttl, remaining))
+    return ttl
+
+
+async def checkRateLimit(conn: Connection, redis: Redis, client_ip: str, cost: int = 1):
+    with stage_seconds.time("rate_limit"):
+        try:
+            rate_limit = await rate_limiter.hit(conn, redis, client_ip, cost)
+        except BACKEND_UNAVAILABLE:
+            # Limits keep applying, per worker, while the backend is down.
+            rate_limit = await local_rate_limiter.hit(conn, redis, client_ip, cost)
     if rate_limit is None:
-        logger.error(f"Cannot find rate limit info for ip address: {client_ip}")
+        logger.error("Cannot find rate limit info for ip address: %s", client_ip)
         raise RecordNotFound("Rate limit info", client_ip)
     if rate_limit.request_count >= RATE_LIMIT_REQUESTS:
-        logger.warning(f"Rate limit exceeded for ip address: {client_ip}")
+        logger.warning("Rate limit exceeded for ip address: %s", client_ip)
+        rate_limit_rejections.inc()
         raise RateLimitExceeded(client_ip, rate_limit.request_count)
 
 
-async def generateSlug(conn: Connection, redis: Redis, original_url: str) -> URLMapping:
-    slug = shorten_url(original_url)
+def _isUnchanged(
+    mapping: Union[URLMapping, str, None],
+    original_url: str,
+    permanent: bool,
+    expires_at: Optional[datetime],
+) -> bool:
+    return (
+        isinstance(mapping, URLMapping)
+        and not mapping.is_expired()
+        and mapping.original_url == original_url
+        and mapping.permanent == permanent
+        and mapping.expires_at == expires_at
+    )
+
+
+async def _getUnchangedCachedURL(
+    redis: Redis,
+    slug: str,
+    original_url: str,
+    permanent: bool,
+    expires_at: Optional[datetime],
+) -> Optional[URLMapping]:
+    mapping = url_cache.get(slug)
+    if not _isUnchanged(mapping, original_url, permanent, expires_at):
+        cached_url = await redis_breaker.call(
+            lambda: cache_layout.get(redis, slug), None
+        )
+        mapping = _decodeCachedURL(slug, cached_url)
+    if _isUnchanged(mapping, original_url, permanent, expires_at):
+        return cast(URLMapping, mapping)
+    return None
+
+
+async def generateSlug(
+    conn: Connection,
+    redis: Redis,
+    original_url: str,
+    permanent: bool = False,
+    expires_at: Optional[datetime] = None,
+) -> URLMapping:
+    if not slug_allocator.deterministic:
+        (mapping,) = await _insertFreshSlugs(
+            conn, redis, [original_url], permanent, expires_at
+        )
+        return await _cacheWrittenMapping(redis, mapping)
+
+    (slug,) = await slug_allocator.allocate(conn, redis, [original_url])
 
-    mapping = await upsertURLMapping(conn, original_url, slug)
+    # With SKIP_UNCHANGED_WRITES, re-shortening a URL with the same options
+    # returns the existing mapping, from the caches if they have it, and only
+    # new or changed mappings are written.
+    if SKIP_UNCHANGED_WRITES:
+        cached_mapping = await _getUnchangedCachedURL(
+            redis, slug, original_url, permanent, expires_at
+        )
+        if cached_mapping is not None:
+            writes_avoided.inc("cache")
+            return cached_mapping
+
+    written = True
+    async with shard_router.connection(conn, shard_router.shardFor(slug)) as shard_conn:
+        mapping = await upsertURLMapping(
+            shard_conn,
+            original_url,
+            slug,
+            permanent,
+            expires_at,
+            skip_unchanged=SKIP_UNCHANGED_WRITES,
+        )
+        if mapping is None and SKIP_UNCHANGED_WRITES:
+            mapping = await getURLMapping(shard_conn, slug)
+            written = False
     if mapping is None:
-        logger.error(f"Could not upsert the generated slug for url: {original_url}")
+        logger.error("Could not upsert the generated slug for url: %s", original_url)
         raise UpsertFailed(
             "URL mapping", f"Failed to create or update mapping for {original_url}"
         )
 
-    await redis.setex(f"url:{mapping.slug}", CACHE_EXPIRY_SECONDS, mapping.original_url)
-    logger.info(f"URL shortened and cached: {mapping.original_url} -> {mapping.slug}")
+    if not written:
+        await _cacheMapping(redis, mapping)
+        writes_avoided.inc("database")
+        return mapping
+    return await _cacheWrittenMapping(redis, mapping)
+
+
+async def _cacheMapping(redis: Redis, mapping: URLMapping):
+    # While Redis is down, the mapping is only written to Postgres; other
+    # workers' local caches may then serve the old URL until their TTL.
+    await redis_breaker.call(
+        lambda: cache_layout.set(
+            redis, mapping.slug, mapping.to_cache_value(), mappingTTL(mapping)
+        ),
+        None,
+    )
+
+
+async def _cacheWrittenMapping(redis: Redis, mapping: URLMapping) -> URLMapping:
+    await _cacheMapping(redis, mapping)
+    await _announceWrites(redis, mapping.slug)
+    logger.info(
+        "URL shortened and cached: %s -> %s",
+        mapping.original_url,
+        mapping.slug,
+        extra={"route": "shorten"},
+    )
 
     return mapping
 
 
-async def findMatchingURL(conn: Connection, redis: Redis, slug: str) -> str:
-    cached_url = await redis.get(f"url:{slug}")
-    if cached_url:
-        logger.info(f"Cache hit - Redirecting: {slug} -> {cached_url}")
-        return cached_url
+async def generateSlugs(
+    conn: Connection,
+    redis: Redis,
+    original_urls: list[str],
+    permanent: bool = False,
+    expires_at: Optional[datetime] = None,
+) -> list[URLMapping]:
+    if slug_allocator.deterministic:
+        slugs = await slug_allocator.allocate(conn, redis, original_urls)
+
+        # Colliding slugs keep the last URL, as consecutive /shorten calls would.
+        unique = dict(zip(slugs, original_urls))
+        # Shards other than the primary are written concurrently on their own
+        # pools.
+        shards = shard_router.groupByShard(list(unique))
+        results = await asyncio.gather(
+            *(
+                _upsertOnShard(conn, shard, shard_slugs, unique, permanent, expires_at)
+                for shard, shard_slugs in shards.items()
+            )
+        )
+        written = [mapping for result, _ in results for mapping in result]
+        unchanged = [mapping for _, result in results for mapping in result]
+        mappings = written + unchanged
+        if len(mappings) != len(unique):
+            missing = len(unique) - len(mappings)
+            logger.error("Could not upsert %d batch slugs", missing)
+            raise UpsertFailed(
+                "URL mapping batch",
+                f"Failed to create or update {missing} mappings",
+            )
+    else:
+        written = await _insertFreshSlugs(
+            conn, redis, original_urls, permanent, expires_at
+        )
+        unchanged = []
+        mappings = written
+        slugs = [mapping.slug for mapping in written]
+
+    await redis_breaker.call(
+        lambda: cache_layout.setMany(
+            redis,
+            [
+                (mapping.slug, mapping.to_cache_value(), mappingTTL(mapping))
+                for mapping in mappings
+            ],
+        ),
+        None,
+    )
+    if unchanged:
+        writes_avoided.inc("database", amount=len(unchanged))
+    if written:
+        await _announceWrites(redis, *(mapping.slug for mapping in written))
+    logger.info(
+        "Batch of %d URLs shortened and cached, %d unchanged",
+        len(mappings),
+        len(unchanged),
+        extra={"route": "shorten"},
+    )
+
+    by_slug = {mapping.slug: mapping for mapping in mappings}
+    return [by_slug[slug] for slug in slugs]
+
+
+async def _insertFreshSlugs(
+    conn: Connection,
+    redis: Redis,
+    original_urls: list[str],
+    permanent: bool,
+    expires_at: Optional[datetime],
+) -> list[URLMapping]:
+    """Insert each URL under a newly allocated slug, never replacing a row.
+
+    A slug that already exists means its ID was issued twice, e.g. after the
+    Redis counter was flushed or restored: the allocator is moved past the
+    stored IDs and the URL is given another slug.
+    """
+
+    mappings: dict[int, URLMapping] = {}
+    pending = list(range(len(original_urls)))
+    for _ in range(SLUG_INSERT_ATTEMPTS):
+        slugs = await slug_allocator.allocate(
+            conn, redis, [original_urls[index] for index in pending]
+        )
+        indexes = dict(zip(slugs, pending))
+
+        async def insertOnShard(shard: int, shard_slugs: list[str]):
+            async with shard_router.connection(conn, shard) as shard_conn:
+                return await upsertURLMappings(
+                    shard_conn,
+                    [original_urls[indexes[slug]] for slug in shard_slugs],
+                    shard_slugs,
+                    permanent,
+                    expires_at,
+                    overwrite=False,
+                )
+
+        results = await asyncio.gather(
+            *(
+                insertOnShard(shard, shard_slugs)
+                for shard, shard_slugs in shard_router.groupByShard(slugs).items()
+            )
+        )
+        for result in results:
+            for mapping in result:
+                mappings[indexes[mapping.slug]] = mapping
+        pending = [index for index in pending if index not in mappings]
+        if not pending:
+            return [mappings[index] for index in range(len(original_urls))]
+        logger.warning(
+            "%d allocated slugs already exist, moving the allocator past them",
+            len(pending),
+        )
+        await slug_allocator.recover(conn, redis)
+
+    logger.error("Could not insert %d fresh slugs", len(pending))
+    raise UpsertFailed(
+        "URL mapping", f"Failed to allocate an unused slug for {len(pending)} URLs"
+    )
+
+
+async def _announceWrites(redis: Redis, *slugs: str):
+    # This worker's caches and slug filter learn about the slugs even while
+    # Redis is down; the other workers are resynchronized once it is back.
+    applyInvalidation(*slugs)
+    try:
+        async with redis_breaker:
+            await markWritten(redis, *slugs)
+            await publishInvalidation(redis, *slugs)
+    except redis_breaker.unavailable:
+        missedInvalidation()
 
-    original_url = await getOriginalURL(conn, slug)
-    if original_url is None:
-        logger.error(f"Cannot find matching URL for slug: {slug}")
+
+def _cacheLocally(slug: str, mapping: Union[URLMapping, str]):
+    # The shared cache only holds mappings; misses stay in each worker's cache.
+    url_cache.set(slug, mapping)
+    if mapping:
+        shared_cache.set(slug, mapping)
+
+
+def _decodeCachedURL(slug: str, value: Optional[str]) -> Union[URLMapping, str, None]:
+    # "" marks a slug known not to exist; values written in an older format
+    # count as misses and are overwritten by the next load.
+    if not value:
+        return value
+    return URLMapping.from_cache_value(slug, value)
+
+
+async def _upsertOnShard(
+    conn: Connection,
+    shard: int,
+    slugs: list[str],
+    urls_by_slug: dict[str, str],
+    permanent: bool,
+    expires_at: Optional[datetime],
+) -> tuple[list[URLMapping], list[URLMapping]]:
+    """Upsert `slugs` on `shard`; return the written and the unchanged mappings."""
+
+    async with shard_router.connection(conn, shard) as shard_conn:
+        written = await upsertURLMappings(
+            shard_conn,
+            [urls_by_slug[slug] for slug in slugs],
+            slugs,
+            permanent,
+            expires_at,
+            skip_unchanged=SKIP_UNCHANGED_WRITES,
+        )
+        if not SKIP_UNCHANGED_WRITES or len(written) == len(slugs):
+            return written, []
+        written_slugs = {mapping.slug for mapping in written}
+        unchanged = await getURLMappings(
+            shard_conn, [slug for slug in slugs if slug not in written_slugs]
+        )
+        return written, unchanged
+
+
+async def findMatchingURL(conn: Connection, redis: Redis, slug: str) -> URLMapping:
+    # Both cache layers store an empty string for slugs known not to exist, and
+    # can briefly hold mappings that have just expired.
+    local_mapping = url_cache.get(slug)
+    if local_mapping is not None:
+        cache_requests.inc("local", "hit")
+        if not local_mapping or local_mapping.is_expired():
+            raise RecordNotFound("Original URL", slug)
+        logger.info(
+            "Local cache hit - Redirecting: %s -> %s",
+            slug,
+            local_mapping.original_url,
+            extra={"route": "redirect"},
+        )
+        return local_mapping
+
+    cache_requests.inc("local", "miss")
+
+    if shared_cache.enabled:
+        shared_mapping = shared_cache.get(slug)
+        if shared_mapping is None:
+            cache_requests.inc("shared", "miss")
+        else:
+            cache_requests.inc("shared", "hit")
+            url_cache.set(slug, shared_mapping)
+            logger.info(
+                "Shared cache hit - Redirecting: %s -> %s",
+                slug,
+                shared_mapping.original_url,
+                extra={"route": "redirect"},
+            )
+            return shared_mapping
+
+    # While Redis is down, every local cache miss goes to Postgres.
+    with stage_seconds.time("cache_lookup"):
+        cached_url = await redis_breaker.call(lambda: _getCachedURL(redis, slug), None)
+        cached_mapping = _decodeCachedURL(slug, cached_url)
+    if cached_mapping is not None:
+        cache_requests.inc("redis", "hit")
+        _cacheLocally(slug, cached_mapping)
+        if not cached_mapping or cached_mapping.is_expired():
+            raise RecordNotFound("Original URL", slug)
+        logger.info(
+            "Cache hit - Redirecting: %s -> %s",
+            slug,
+            cached_mapping.original_url,
+            extra={"route": "redirect"},
+        )
+        return cached_mapping
+
+    cache_requests.inc("redis", "miss")
+
+    if slug not in slug_filter:
         raise RecordNotFound("Original URL", slug)
 
-    await redis.setex(f"url:{slug}", CACHE_EXPIRY_SECONDS, original_url)
-    logger.info(f"URL found and cached - Redirecting: {slug} -> {original_url}")
+    # Concurrent misses for the same slug in this worker share a single lookup.
+    return await url_loads.do(slug, lambda: _loadURL(conn, redis, slug))
+
+
+async def _getCachedURL(redis: Redis, slug: str) -> Optional[str]:
+    if CACHE_STALE_SECONDS <= 0:
+        return await cache_layout.get(redis, slug)
+
+    # Entries live CACHE_STALE_SECONDS past their freshness. Reads in that window
+    # are served as is and refresh the entry in the background, so keys that are
+    # read often never expire while cold keys age out.
+    cached_url, ttl = await cache_layout.getWithTTL(redis, slug)
+    if cached_url and 0 <= ttl <= CACHE_STALE_SECONDS and slug not in _revalidating:
+        _revalidating.add(slug)
+        task = asyncio.create_task(_revalidateURL(redis, slug))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    return cached_url
+
+
+async def _revalidateURL(redis: Redis, slug: str):
+    from src.app import app
+
+    try:
+        conn = LazyConnection(app.state.db_pool)
+        try:
+            mapping = await _readURLMapping(conn, redis, slug)
+        finally:
+            await conn.release()
+        if mapping is None:
+            await cache_layout.set(redis, slug, "", NEGATIVE_CACHE_SECONDS or 1)
+        else:
+            await cache_layout.set(
+                redis, slug, mapping.to_cache_value(), mappingTTL(mapping)
+            )
+        _cacheLocally(slug, mapping or "")
+    except Exception as exc:
+        logger.error("Could not revalidate cached URL for slug %s: %s", slug, exc)
+    finally:
+        _revalidating.discard(slug)
+
+
+async def _readURLMapping(
+    conn: Connection, redis: Redis, slug: str
+) -> Optional[URLMapping]:
+    shard = shard_router.shardFor(slug)
+    if shard != 0:
+        async with shard_router.connection(conn, shard) as shard_conn:
+            return await getURLMapping(shard_conn, slug)
+
+    # Lookups go to a replica of the primary unless the slug was written recently
+    # enough that the replicas may not have it yet. `conn` is the primary.
+    pool = replica_set.choose() if replica_set.enabled else None
+    if pool is None:
+        return await getURLMapping(conn, slug)
+    # Without Redis, recent writes cannot be told apart, so all go to the primary.
+    if await redis_breaker.call(lambda: recentlyWritten(redis, slug), True):
+        replica_set.fallbacks += 1
+        return await getURLMapping(conn, slug)
+
+    try:
+        async with pool.acquire(timeout=ACQUIRE_TIMEOUT) as replica_conn:
+            mapping = await getURLMapping(replica_conn, slug)
+    except Exception as exc:
+        logger.warning("Read replica failed, using the primary: %s", exc)
+        replica_set.markFailed(pool)
+        replica_set.fallbacks += 1
+        return await getURLMapping(conn, slug)
+    replica_set.reads += 1
+    return mapping
+
+
+async def _waitForCachedURL(redis: Redis, slug: str) -> Union[URLMapping, str, None]:
+    for _ in range(max(1, SINGLE_FLIGHT_LOCK_MS // SINGLE_FLIGHT_POLL_MS)):
+        await asyncio.sleep(SINGLE_FLIGHT_POLL_MS / 1000)
+        cached_url = await redis_breaker.call(
+            lambda: cache_layout.get(redis, slug), None
+        )
+        cached_mapping = _decodeCachedURL(slug, cached_url)
+        if cached_mapping is not None:
+            return cached_mapping
+    return None
+
+
+async def _loadURL(conn: Connection, redis: Redis, slug: str) -> URLMapping:
+    lock_key = f"lock:url:{slug}"
+    locked = False
+    if SINGLE_FLIGHT_LOCK_MS > 0:
+        # Across workers, the lock holder queries Postgres while the others wait
+        # for it to fill the cache, falling back to Postgres if it does not.
+        acquired = await redis_breaker.call(
+            lambda: redis.set(lock_key, 1, nx=True, px=SINGLE_FLIGHT_LOCK_MS),
+            _UNAVAILABLE,
+        )
+        locked = acquired is not _UNAVAILABLE and bool(acquired)
+        if acquired is not _UNAVAILABLE and not locked:
+            cached_mapping = await _waitForCachedURL(redis, slug)
+            if cached_mapping is not None:
+                _cacheLocally(slug, cached_mapping)
+                if not cached_mapping or cached_mapping.is_expired():
+                    raise RecordNotFound("Original URL", slug)
+                return cached_mapping
+
+    try:
+        with stage_seconds.time("db_lookup"):
+            mapping = await _readURLMapping(conn, redis, slug)
+        if mapping is None:
+            logger.error("Cannot find matching URL for slug: %s", slug)
+            if NEGATIVE_CACHE_SECONDS > 0:
+                await redis_breaker.call(
+                    lambda: cache_layout.set(redis, slug, "", NEGATIVE_CACHE_SECONDS),
+                    None,
+                )
+                url_cache.set(slug, "")
+            raise RecordNotFound("Original URL", slug)
+
+        await redis_breaker.call(
+            lambda: cache_layout.set(
+                redis, slug, mapping.to_cache_value(), mappingTTL(mapping)
+            ),
+            None,
+        )
+        _cacheLocally(slug, mapping)
+        logger.info(
+            "URL found and cached - Redirecting: %s -> %s",
+            slug,
+            mapping.original_url,
+            extra={"route": "redirect"},
+        )
 
-    return original_url
+        return mapping
+    finally:
+        if locked:
+            await redis_breaker.call(lambda: redis.delete(lock_key), None)
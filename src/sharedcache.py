@@ -0,0 +1,255 @@
+import fcntl
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import xxhash
+
+from src.metrics import registerStats
+from src.models import URLMapping
+
+SHARED_CACHE_SLOTS = int(os.getenv("SHARED_CACHE_SLOTS", 0))
+SHARED_CACHE_SLOT_BYTES = int(os.getenv("SHARED_CACHE_SLOT_BYTES", 512))
+SHARED_CACHE_TTL_SECONDS = int(os.getenv("SHARED_CACHE_TTL_SECONDS", 300))
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "/dev/shm/minime-slugs")
+
+# The file starts with a header naming its geometry and holding the cache's
+# generation, followed by fixed-size slots. Each slot holds a seqlock counter,
+# the slug's hash (0 when empty), the entry's expiry in Unix seconds, the
+# payload length and checksum, the generation it was written in, then the
+# payload `slug\0cache value`.
+FILE_HEADER = struct.Struct("<8sII")
+FILE_GENERATION = struct.Struct("<I")
+FILE_GENERATION_OFFSET = FILE_HEADER.size
+FILE_HEADER_BYTES = 64
+FILE_MAGIC = b"minime02"
+SLOT_HEADER = struct.Struct("<IQdHII")
+SLOT_SEQUENCE = struct.Struct("<I")
+SLOT_HEADER_BYTES = 32
+MAX_PROBES = 8
+READ_ATTEMPTS = 3
+
+
+class SharedSlugCache:
+    """Fixed-size slug -> mapping hash table in a file mapped by every worker.
+
+    Slugs are placed by open addressing, within MAX_PROBES slots of their hash;
+    a full neighbourhood evicts the entry closest to expiry. Readers take no
+    lock: each slot carries a sequence number that writers make odd while they
+    change it, and a payload checksum, so a read that overlaps a write is
+    detected and retried. Writers from every worker serialize on an exclusive
+    `flock` of the file. Entries live `ttl` seconds at most, and are dropped on
+    invalidation like local cache entries. Clearing bumps the generation in the
+    file header, and slots written in an older generation count as empty.
+    """
+
+    def __init__(self, path: str, slots: int, slot_bytes: int, ttl: float):
+        self.enabled = slots > 0
+        self.path = path
+        self.slots = slots
+        self.slot_bytes = max(slot_bytes, SLOT_HEADER_BYTES + 64)
+        self.ttl = ttl
+        self.probes = min(MAX_PROBES, max(slots, 1))
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.oversized = 0
+        self.retries = 0
+
+    @property
+    def size(self) -> int:
+        return FILE_HEADER_BYTES + self.slots * self.slot_bytes
+
+    def open(self):
+        """Map the table, creating or resetting the file if its geometry differs."""
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        header = FILE_HEADER.pack(FILE_MAGIC, self.slots, self.slot_bytes)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if (
+                os.fstat(fd).st_size != self.size
+                or os.pread(fd, FILE_HEADER.size, 0) != header
+            ):
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, self.size)
+                os.pwrite(fd, header, 0)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._map = mmap.mmap(fd, self.size)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            os.close(self._fd)
+        self._map = None
+        self._fd = None
+
+    @contextmanager
+    def _writing(self) -> Iterator[mmap.mmap]:
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield self._map
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _offsets(self, slug: str) -> tuple[int, list[int]]:
+        key = xxhash.xxh64_intdigest(slug) | 1
+        start = key % self.slots
+        return key, [
+            FILE_HEADER_BYTES + (start + probe) % self.slots * self.slot_bytes
+            for probe in range(self.probes)
+        ]
+
+    def _generation(self) -> int:
+        return FILE_GENERATION.unpack_from(self._map, FILE_GENERATION_OFFSET)[0]
+
+    def _read(
+        self, offset: int, key: int, slug: bytes, generation: int
+    ) -> Optional[tuple]:
+        """(expires, cache value) of the slot if it holds `slug`, else None."""
+
+        table = self._map
+        for _ in range(READ_ATTEMPTS):
+            sequence, slot_key, expires, length, checksum, slot_generation = (
+                SLOT_HEADER.unpack_from(table, offset)
+            )
+            if slot_key != key or slot_generation != generation:
+                return None
+            start = offset + SLOT_HEADER_BYTES
+            payload = table[start : start + length]
+            if (
+                sequence & 1
+                or SLOT_SEQUENCE.unpack_from(table, offset)[0] != sequence
+                or xxhash.xxh32_intdigest(payload) != checksum
+            ):
+                self.retries += 1
+                continue
+            stored_slug, _, value = payload.partition(b"\0")
+            if stored_slug != slug:
+                return None
+            return expires, value
+        return None
+
+    def get(self, slug: str) -> Optional[URLMapping]:
+        if self._map is None:
+            return None
+        key, offsets = self._offsets(slug)
+        encoded = slug.encode()
+        generation = self._generation()
+        for offset in offsets:
+            entry = self._read(offset, key, encoded, generation)
+            if entry is not None and entry[0] > time.time():
+                mapping = URLMapping.from_cache_value(slug, entry[1].decode())
+                if mapping is not None:
+                    self.hits += 1
+                    return mapping
+        self.misses += 1
+        return None
+
+    def _write(self, table: mmap.mmap, offset: int, fields: tuple, payload: bytes):
+        # Odd while the slot changes, so that readers retry instead of using it.
+        sequence = SLOT_SEQUENCE.unpack_from(table, offset)[0] | 1
+        SLOT_SEQUENCE.pack_into(table, offset, sequence)
+        start = offset + SLOT_HEADER_BYTES
+        table[start : start + len(payload)] = payload
+        SLOT_HEADER.pack_into(table, offset, sequence, *fields)
+        SLOT_SEQUENCE.pack_into(table, offset, (sequence + 1) & 0xFFFFFFFF)
+
+    def set(self, slug: str, mapping: URLMapping):
+        if self._map is None:
+            return
+        payload = slug.encode() + b"\0" + mapping.to_cache_value().encode()
+        if len(payload) > self.slot_bytes - SLOT_HEADER_BYTES:
+            self.oversized += 1
+            return
+        now = time.time()
+        expires = now + self.ttl
+        if mapping.expires_at is not None:
+            expires = min(expires, mapping.expires_at.timestamp())
+            if expires <= now:
+                return
+        key, offsets = self._offsets(slug)
+        encoded = slug.encode()
+
+        with self._writing() as table:
+            generation = self._generation()
+            # The slug's own slot, else a free, expired or cleared one, else the
+            # entry closest to expiry.
+            own = free = oldest = None
+            for offset in offsets:
+                slot_key, slot_expires, _, _, slot_generation = SLOT_HEADER.unpack_from(
+                    table, offset
+                )[1:]
+                if self._read(offset, key, encoded, generation) is not None:
+                    own = offset
+                    break
+                if free is None and (
+                    slot_key == 0
+                    or slot_expires <= now
+                    or slot_generation != generation
+                ):
+                    free = offset
+                if oldest is None or slot_expires < oldest[0]:
+                    oldest = (slot_expires, offset)
+            target = own or free
+            if target is None:
+                target = oldest[1]
+                self.evictions += 1
+            checksum = xxhash.xxh32_intdigest(payload)
+            self._write(
+                table,
+                target,
+                (key, expires, len(payload), checksum, generation),
+                payload,
+            )
+        self.writes += 1
+
+    def invalidate(self, *slugs: str):
+        if self._map is None:
+            return
+        with self._writing() as table:
+            generation = self._generation()
+            for slug in slugs:
+                key, offsets = self._offsets(slug)
+                for offset in offsets:
+                    if self._read(offset, key, slug.encode(), generation) is not None:
+                        self._write(table, offset, (0, 0.0, 0, 0, 0), b"")
+
+    def clear(self):
+        """Empty the cache for every worker in O(1), by starting a generation."""
+
+        if self._map is None:
+            return
+        with self._writing() as table:
+            FILE_GENERATION.pack_into(
+                table, FILE_GENERATION_OFFSET, (self._generation() + 1) & 0xFFFFFFFF
+            )
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "slots": self.slots,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "oversized": self.oversized,
+            "retries": self.retries,
+        }
+
+
+shared_cache = SharedSlugCache(
+    SHARED_CACHE_PATH,
+    SHARED_CACHE_SLOTS,
+    SHARED_CACHE_SLOT_BYTES,
+    SHARED_CACHE_TTL_SECONDS,
+)
+registerStats("shared_cache", shared_cache.stats)
@@ -0,0 +1,140 @@
+import asyncio
+import os
+from collections import deque
+
+from asyncpg import Connection
+from redis.asyncio import Redis
+
+from src.helpers import BASE, DEFAULT_LENGTH, decode, encode, shorten_url
+from src.metrics import registerStats
+from src.repository import (
+    advanceSlugIds,
+    getLastSequenceSlug,
+    leaseSlugIds,
+    shard_router,
+)
+
+SLUG_STRATEGY = os.getenv("SLUG_STRATEGY", "hash")
+SLUG_ID_SOURCE = os.getenv("SLUG_ID_SOURCE", "postgres")
+SLUG_ID_BLOCK_SIZE = int(os.getenv("SLUG_ID_BLOCK_SIZE", 1000))
+SLUG_ID_KEY = "slug:ids"
+
+# Sequence slugs start at the first 8-character value, so that they can never
+# equal a hash slug, which is at most DEFAULT_LENGTH characters long.
+SEQUENCE_SLUG_OFFSET = BASE**DEFAULT_LENGTH
+SEQUENCE_SLUG_LENGTH = DEFAULT_LENGTH + 1
+
+
+def sequenceSlug(number: int) -> str:
+    return encode(SEQUENCE_SLUG_OFFSET + number)
+
+
+class HashSlugs:
+    """Slugs derived from the URL's xxhash, so the same URL keeps its slug.
+
+    Distinct URLs can share a slug, in which case the last one shortened wins.
+    """
+
+    deterministic = True
+
+    async def allocate(
+        self, conn: Connection, redis: Redis, original_urls: list[str]
+    ) -> list[str]:
+        return [shorten_url(original_url) for original_url in original_urls]
+
+    def stats(self) -> dict:
+        return {"strategy": "hash"}
+
+
+class SequenceSlugs:
+    """Slugs encoding IDs leased in blocks from a Postgres sequence or Redis.
+
+    Every call gets fresh IDs, so slugs never collide, but shortening the same
+    URL twice gives two slugs. A worker leases `block_size` IDs at a time with
+    one round trip, and hands them out locally until the block runs out. IDs
+    left in a block when the worker stops are never used.
+
+    An ID source that goes backwards, such as a flushed or restored Redis
+    counter, reissues IDs; `recover` moves it past the slugs already stored.
+    """
+
+    deterministic = False
+
+    def __init__(self, source: str, block_size: int):
+        if source not in ("postgres", "redis"):
+            raise ValueError(f"Unknown slug ID source: {source}")
+        self.source = source
+        self.block_size = max(block_size, 1)
+        self._ids: deque[int] = deque()
+        self._lease_lock = asyncio.Lock()
+        self.leases = 0
+        self.allocated = 0
+        self.recoveries = 0
+
+    async def _lease(self, conn: Connection, redis: Redis, count: int) -> list[int]:
+        if self.source == "redis":
+            last = await redis.incrby(SLUG_ID_KEY, count)
+            return list(range(last - count + 1, last + 1))
+        # The sequence lives on the primary, which `conn` always is.
+        return await leaseSlugIds(conn, count)
+
+    async def allocate(
+        self, conn: Connection, redis: Redis, original_urls: list[str]
+    ) -> list[str]:
+        count = len(original_urls)
+        while len(self._ids) < count:
+            # Concurrent requests that find the block empty share one lease.
+            async with self._lease_lock:
+                missing = count - len(self._ids)
+                if missing > 0:
+                    self._ids.extend(
+                        await self._lease(conn, redis, max(self.block_size, missing))
+                    )
+                    self.leases += 1
+        self.allocated += count
+        return [sequenceSlug(self._ids.popleft()) for _ in range(count)]
+
+    async def recover(self, conn: Connection, redis: Redis):
+        """Drop the leased block and advance the source past every stored ID."""
+
+        last_slugs = []
+        for shard in range(max(len(shard_router.pools), 1)):
+            async with shard_router.connection(conn, shard) as shard_conn:
+                last_slugs.append(
+                    await getLastSequenceSlug(shard_conn, SEQUENCE_SLUG_LENGTH)
+                )
+        last_id = max(
+            (decode(slug) - SEQUENCE_SLUG_OFFSET for slug in last_slugs if slug),
+            default=0,
+        )
+        async with self._lease_lock:
+            self._ids.clear()
+            if self.source == "redis":
+                # Racing workers can only push the counter further forward.
+                current = int(await redis.get(SLUG_ID_KEY) or 0)
+                if current < last_id:
+                    await redis.incrby(SLUG_ID_KEY, last_id - current)
+            else:
+                await advanceSlugIds(conn, last_id)
+            self.recoveries += 1
+
+    def stats(self) -> dict:
+        return {
+            "strategy": "sequence",
+            "leases": self.leases,
+            "allocated": self.allocated,
+            "available": len(self._ids),
+            "recoveries": self.recoveries,
+        }
+
+
+def createSlugAllocator(strategy: str) -> HashSlugs | SequenceSlugs:
+    if strategy == "hash":
+        return HashSlugs()
+    if strategy == "sequence":
+        return SequenceSlugs(SLUG_ID_SOURCE, SLUG_ID_BLOCK_SIZE)
+    raise ValueError(f"Unknown slug strategy: {strategy}")
+
+
+slug_allocator = createSlugAllocator(SLUG_STRATEGY)
+registerStats("slugs", slug_allocator.stats)
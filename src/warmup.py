@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from contextlib import aclosing
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
+
+from asyncpg import Pool
+from redis.asyncio import Redis
+
+from src.cache import url_cache
+from src.cachelayout import cache_layout
+from src.metrics import registerStats
+from src.models import URLMapping
+from src.repository import (
+    getURLMappings,
+    shard_router,
+    streamMostClickedSlugs,
+    streamRecentURLMappings,
+)
+from src.services import mappingTTL
+
+logger = logging.getLogger(__name__)
+
+CACHE_WARMUP_SLUGS = int(os.getenv("CACHE_WARMUP_SLUGS", 0))
+CACHE_WARMUP_ORDER = os.getenv("CACHE_WARMUP_ORDER", "recent")
+CACHE_WARMUP_CLICK_WINDOW_SECONDS = int(
+    os.getenv("CACHE_WARMUP_CLICK_WINDOW_SECONDS", 86400)
+)
+CACHE_WARMUP_SECONDS = float(os.getenv("CACHE_WARMUP_SECONDS", 10))
+CACHE_WARMUP_MAX_BYTES = int(os.getenv("CACHE_WARMUP_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_WARMUP_BATCH_SIZE = int(os.getenv("CACHE_WARMUP_BATCH_SIZE", 1000))
+CACHE_WARMUP_LOCK_KEY = "warmup:running"
+
+WARMUP_ORDERS = ("recent", "clicks")
+
+
+class CacheWarmer:
+    """Loads the hottest links into Redis and the local cache at startup.
+
+    Links are read hottest first, `batch_size` at a time, from a server-side
+    cursor, and written to Redis in one pipeline per batch. Loading stops once
+    `max_slugs` links, `max_seconds` or `max_bytes` of cache values are
+    reached, whichever comes first. Only the first worker to start fills
+    Redis; every worker fills its own local cache. `ready` turns true once the
+    warm-up is over, however it ended.
+    """
+
+    def __init__(
+        self,
+        max_slugs: int,
+        order: str,
+        click_window: int,
+        max_seconds: float,
+        max_bytes: int,
+        batch_size: int,
+    ):
+        if order not in WARMUP_ORDERS:
+            raise ValueError(f"Unknown cache warm-up order: {order}")
+        self.enabled = max_slugs > 0
+        self.max_slugs = max_slugs
+        self.order = order
+        self.click_window = click_window
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.ready = not self.enabled
+        self.loaded = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.filled_redis = False
+        self.budget_exhausted = False
+
+    async def _recentBatches(self, shards: list[Pool]) -> AsyncIterator[list]:
+        # Slugs are spread evenly across shards, and so are recent links.
+        per_shard = math.ceil(self.max_slugs / len(shards))
+        for pool in shards:
+            async with pool.acquire() as conn:
+                batch: list[URLMapping] = []
+                async for mapping in streamRecentURLMappings(
+                    conn, per_shard, prefetch=self.batch_size
+                ):
+                    batch.append(mapping)
+                    if len(batch) >= self.batch_size:
+                        yield batch
+                        batch = []
+                if batch:
+                    yield batch
+
+    async def _fetchMappings(
+        self, shards: list[Pool], slugs: list[str]
+    ) -> list[URLMapping]:
+        groups: dict[int, list[str]] = {}
+        for slug in slugs:
+            groups.setdefault(shard_router.shardFor(slug, len(shards)), []).append(slug)
+        found: dict[str, URLMapping] = {}
+        for shard, shard_slugs in groups.items():
+            async with shards[shard].acquire() as conn:
+                for mapping in await getURLMappings(conn, shard_slugs):
+                    found[mapping.slug] = mapping
+        # Keep the click order, so that the hottest links load first.
+        return [found[slug] for slug in slugs if slug in found]
+
+    async def _clickedBatches(self, shards: list[Pool]) -> AsyncIterator[list]:
+        since = datetime.now(timezone.utc) - timedelta(seconds=self.click_window)
+        # Clicks are only kept on the primary.
+        async with shards[0].acquire() as conn:
+            slugs: list[str] = []
+            async for slug in streamMostClickedSlugs(
+                conn, since, self.max_slugs, prefetch=self.batch_size
+            ):
+                slugs.append(slug)
+                if len(slugs) >= self.batch_size:
+                    yield await self._fetchMappings(shards, slugs)
+                    slugs = []
+            if slugs:
+                yield await self._fetchMappings(shards, slugs)
+
+    async def _load(self, redis: Redis, batch: list[URLMapping]):
+        entries = []
+        for mapping in batch:
+            value = mapping.to_cache_value()
+            entries.append((mapping.slug, value, mappingTTL(mapping)))
+            # Later links are colder, and must not evict earlier ones.
+            if self.loaded < url_cache.maxsize:
+                url_cache.set(mapping.slug, mapping)
+            self.loaded += 1
+            self.bytes += len(mapping.slug) + len(value)
+        if self.filled_redis:
+            await cache_layout.setMany(redis, entries)
+
+    async def warm(self, shards: list[Pool], redis: Redis):
+        self.filled_redis = bool(
+            await redis.set(
+                CACHE_WARMUP_LOCK_KEY,
+                1,
+                nx=True,
+                ex=max(1, math.ceil(self.max_seconds)),
+            )
+        )
+        if self.order == "clicks":
+            batches = self._clickedBatches(shards)
+        else:
+            batches = self._recentBatches(shards)
+        # Closed on a break, to end the cursor's transaction right away.
+        async with aclosing(batches):
+            async for batch in batches:
+                await self._load(redis, batch)
+                if self.bytes >= self.max_bytes:
+                    self.budget_exhausted = True
+                    break
+
+    async def run(self, shards: list[Pool], redis: Redis) -> None:
+        """Warm the caches from `shards`, the primary first, then mark ready."""
+
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.max_seconds):
+                await self.warm(shards, redis)
+        except TimeoutError:
+            self.budget_exhausted = True
+        except Exception as exc:
+            logger.error("Cache warm-up failed: %s", exc)
+        finally:
+            self.seconds = time.perf_counter() - start
+            self.ready = True
+        logger.info(
+            "Cache warm-up loaded %d links (%d bytes) in %.2fs%s",
+            self.loaded,
+            self.bytes,
+            self.seconds,
+            ", stopped at its budget" if self.budget_exhausted else "",
+        )
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "loaded": self.loaded,
+            "bytes": self.bytes,
+            "seconds": self.seconds,
+            "filled_redis": self.filled_redis,
+            "budget_exhausted": self.budget_exhausted,
+        }
+
+
+cache_warmer = CacheWarmer(
+    CACHE_WARMUP_SLUGS,
+    CACHE_WARMUP_ORDER,
+    CACHE_WARMUP_CLICK_WINDOW_SECONDS,
+    CACHE_WARMUP_SECONDS,
+    CACHE_WARMUP_MAX_BYTES,
+    CACHE_WARMUP_BATCH_SIZE,
+)
+registerStats("warmup", cache_warmer.stats)
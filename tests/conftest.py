@@ -0,0 +1,23 @@
+import pytest
+
+from src.breakers import postgres_breaker, redis_breaker
+from src.cache import url_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_local_cache():
+    url_cache.clear()
+    yield
+    url_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def no_pending_resync(monkeypatch):
+    monkeypatch.setattr("src.cache._resync_pending", False)
+
+
+@pytest.fixture(autouse=True)
+def reset_breakers():
+    yield
+    redis_breaker.reset()
+    postgres_breaker.reset()
@@ -0,0 +1,182 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import FastAPI, status
+from httpx import ASGITransport, AsyncClient
+
+from src.admission import AdmissionControl, AdmissionController
+from src.breakers import BreakerOpen
+from src.controller import router
+from src.dependencies import get_db_conn, get_db_pool, get_lazy_db_conn, get_redis
+from src.metrics import requests_shed
+from src.models import URLMapping
+
+TEST_BASE_URL = "http://test"
+TEST_SLUG = "abc1234"
+TEST_MAPPING = URLMapping(
+    slug=TEST_SLUG,
+    original_url="https://example.com/",
+    created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+)
+
+
+# Fixtures
+@pytest.fixture
+def controller():
+    controller = AdmissionController(4, 0.5, 0.05, 0.1, 2)
+    with patch("src.admission.admission_controller", controller):
+        yield controller
+
+
+@pytest.fixture
+def test_app(controller):
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(AdmissionControl)
+    app.dependency_overrides.update(
+        {
+            get_db_pool: lambda: MagicMock(),
+            get_db_conn: lambda: MagicMock(),
+            get_lazy_db_conn: lambda: AsyncMock(),
+            get_redis: lambda: AsyncMock(),
+        }
+    )
+    return app
+
+
+@pytest.fixture
+async def async_client(test_app):
+    async with AsyncClient(
+        transport=ASGITransport(app=test_app), base_url=TEST_BASE_URL
+    ) as client:
+        yield client
+
+
+# Helper
+def scope(method: str, path: str) -> dict:
+    return {"type": "http", "method": method, "path": path}
+
+
+# Tests AdmissionController
+def test_classify():
+    controller = AdmissionController(0, 0.5, 0, 0.1, 1)
+
+    assert controller.classify(scope("POST", "/shorten")) == "shorten"
+    assert controller.classify(scope("POST", "/shorten/batch")) == "shorten"
+    assert controller.classify(scope("GET", f"/{TEST_SLUG}")) == "redirect"
+    assert controller.classify(scope("GET", "/ready")) is None
+    assert controller.classify({"type": "lifespan"}) is None
+
+
+def test_disabled_admits_everything():
+    controller = AdmissionController(0, 0.5, 0, 0.1, 1)
+    controller.in_flight["shorten"] = 1000
+
+    assert not controller.enabled
+    assert controller.admit("shorten") is None
+
+
+def test_shorten_is_shed_before_redirects(controller):
+    controller.in_flight["redirect"] = 2
+
+    assert controller.admit("shorten") == "in_flight"
+    assert controller.admit("redirect") is None
+
+    controller.in_flight["redirect"] = 4
+    assert controller.admit("redirect") == "in_flight"
+
+
+def test_standing_queue_sheds_shorten_only(controller):
+    controller.observeQueueDelay(0.2)
+    controller._window_start -= controller.interval
+    controller.observeQueueDelay(0.3)
+
+    assert controller.overloaded
+    assert controller.admit("shorten") == "queue_delay"
+    assert controller.admit("redirect") is None
+
+
+def test_bursts_do_not_count_as_overload(controller):
+    controller.observeQueueDelay(0.2)
+    controller.observeQueueDelay(0.0)
+    controller._window_start -= controller.interval
+    controller.observeQueueDelay(0.2)
+
+    assert not controller.overloaded
+
+
+def test_overload_clears_without_new_waits(controller):
+    controller._queue_delay = 1.0
+    assert controller.overloaded
+
+    controller._window_start = time.monotonic() - 2 * controller.interval
+    assert not controller.overloaded
+
+
+# Tests AdmissionControl
+@pytest.mark.asyncio
+async def test_shed_request_gets_retry_after(controller, async_client):
+    controller.in_flight["redirect"] = 2
+    shed = requests_shed.value("shorten", "in_flight")
+
+    response = await async_client.post("/shorten", json={"url": "https://a.com"})
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["retry-after"] == "2"
+    assert controller.stats()["shed_shorten"] == 1
+    assert requests_shed.value("shorten", "in_flight") == shed + 1
+
+
+@pytest.mark.asyncio
+async def test_probes_are_never_shed(controller, async_client):
+    controller.in_flight["redirect"] = 100
+
+    response = await async_client.get("/health")
+
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.asyncio
+@patch("src.controller.checkRateLimit", new_callable=AsyncMock)
+@patch("src.controller.findMatchingURL", new_callable=AsyncMock)
+async def test_tracks_in_flight(
+    mock_find_matching_url, mock_check_rate_limit, controller, async_client
+):
+    seen = []
+
+    async def find(conn, redis, slug):
+        seen.append(controller.in_flight["redirect"])
+        return TEST_MAPPING
+
+    mock_find_matching_url.side_effect = find
+
+    response = await async_client.get(f"/{TEST_SLUG}", follow_redirects=False)
+
+    assert response.status_code == status.HTTP_307_TEMPORARY_REDIRECT
+    assert seen == [1]
+    assert controller.in_flight["redirect"] == 0
+
+
+@pytest.mark.asyncio
+@patch("src.controller.checkRateLimit", new_callable=AsyncMock)
+async def test_timeouts_are_answered_503(mock_check_rate_limit, async_client):
+    mock_check_rate_limit.side_effect = asyncio.TimeoutError()
+
+    response = await async_client.get(f"/{TEST_SLUG}")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert "retry-after" in response.headers
+
+
+@pytest.mark.asyncio
+@patch("src.controller.checkRateLimit", new_callable=AsyncMock)
+async def test_open_breaker_is_answered_503(mock_check_rate_limit, async_client):
+    mock_check_rate_limit.side_effect = BreakerOpen("postgres", 4)
+
+    response = await async_client.get(f"/{TEST_SLUG}")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["retry-after"] == "4"
@@ -0,0 +1,88 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.analytics import ClickRecorder
+
+TEST_SLUG = "abc1234"
+
+
+# Fixtures
+@pytest.fixture
+def mock_conn():
+    return AsyncMock()
+
+
+@pytest.fixture
+def mock_pool(mock_conn):
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__.return_value = mock_conn
+    return pool
+
+
+def create_recorder(**overrides):
+    options = {
+        "enabled": True,
+        "maxsize": 10,
+        "flush_size": 4,
+        "flush_interval": 1.0,
+        "overflow_policy": "drop_newest",
+    }
+    options.update(overrides)
+    return ClickRecorder(**options)
+
+
+# Tests ClickRecorder
+def test_click_recorder_disabled():
+    recorder = create_recorder(enabled=False)
+    recorder.record(TEST_SLUG)
+    assert recorder.stats()["queue_depth"] == 0
+
+
+@pytest.mark.parametrize(
+    "overflow_policy, first_kept", [("drop_newest", "slug0"), ("drop_oldest", "slug2")]
+)
+def test_click_recorder_overflow(overflow_policy, first_kept):
+    recorder = create_recorder(maxsize=3, overflow_policy=overflow_policy)
+    for i in range(5):
+        recorder.record(f"slug{i}")
+
+    assert recorder.stats()["queue_depth"] == 3
+    assert recorder.stats()["dropped"] == 2
+    assert recorder._queue[0][0] == first_kept
+
+
+def test_click_recorder_unknown_policy():
+    with pytest.raises(ValueError):
+        create_recorder(overflow_policy="block")
+
+
+@pytest.mark.asyncio
+async def test_click_recorder_flush_in_batches(mock_pool, mock_conn):
+    recorder = create_recorder()
+    for _ in range(10):
+        recorder.record(TEST_SLUG)
+
+    await recorder.flush(mock_pool)
+
+    assert mock_conn.copy_records_to_table.call_count == 3
+    batch_sizes = [
+        len(call.kwargs["records"])
+        for call in mock_conn.copy_records_to_table.call_args_list
+    ]
+    assert batch_sizes == [4, 4, 2]
+    assert recorder.stats()["flushed"] == 10
+    assert recorder.stats()["queue_depth"] == 0
+
+
+@pytest.mark.asyncio
+async def test_click_recorder_flush_failure(mock_pool, mock_conn):
+    recorder = create_recorder()
+    mock_conn.copy_records_to_table.side_effect = OSError("connection lost")
+    for _ in range(6):
+        recorder.record(TEST_SLUG)
+
+    await recorder.flush(mock_pool)
+
+    assert recorder.stats()["failed"] == 4
+    assert recorder.stats()["queue_depth"] == 2
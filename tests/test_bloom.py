@@ -0,0 +1,49 @@
+import pytest
+
+from src.bloom import BloomFilter
+
+SLUGS = [f"slug{i:03d}" for i in range(1000)]
+
+
+# Tests BloomFilter
+def test_bloom_filter_no_false_negatives():
+    bloom = BloomFilter(capacity=len(SLUGS), error_rate=0.01)
+    bloom.ready = True
+    for slug in SLUGS:
+        bloom.add(slug)
+
+    assert all(slug in bloom for slug in SLUGS)
+    assert bloom.stats()["count"] == len(SLUGS)
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom = BloomFilter(capacity=len(SLUGS), error_rate=0.01)
+    bloom.ready = True
+    for slug in SLUGS:
+        bloom.add(slug)
+
+    unknown = [f"miss{i:04d}" for i in range(10000)]
+    false_positives = sum(slug in bloom for slug in unknown)
+
+    assert false_positives / len(unknown) < 0.03
+    assert bloom.stats()["rejections"] == len(unknown) - false_positives
+
+
+@pytest.mark.parametrize("capacity, ready", [(0, True), (1000, False)])
+def test_bloom_filter_answers_maybe_when_unusable(capacity, ready):
+    bloom = BloomFilter(capacity=capacity, error_rate=0.01)
+    bloom.ready = ready
+    assert "unknown" in bloom
+    assert bloom.stats()["checks"] == 0
+
+
+def test_bloom_filter_clear_forgets_slugs_until_reloaded():
+    bloom = BloomFilter(capacity=len(SLUGS), error_rate=0.01)
+    bloom.ready = True
+    bloom.add("stale")
+    bloom.clear()
+
+    assert not bloom.ready
+    assert bloom.stats()["count"] == 0
+    bloom.ready = True
+    assert "stale" not in bloom
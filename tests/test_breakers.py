@@ -0,0 +1,249 @@
+import time
+
+import asyncpg
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from benchmarks.standins import StandinDatabase, StandinPool, StandinRedis
+from src import services
+from src.bloom import BloomFilter
+from src.breakers import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    BreakerOpen,
+    CircuitBreaker,
+    postgres_breaker,
+    redis_breaker,
+)
+from src.cache import RESYNC_MESSAGE
+from src.dependencies import LazyConnection
+from src.ratelimit import local_rate_limiter
+from src.services import checkRateLimit, findMatchingURL, generateSlug
+
+TEST_URL = "https://example.com/"
+TEST_IP = "127.0.0.1"
+
+
+# Fixtures
+@pytest.fixture
+def breaker():
+    return CircuitBreaker("test", 2, 5, (OSError,))
+
+
+@pytest.fixture
+def db():
+    return StandinDatabase()
+
+
+@pytest.fixture
+def redis():
+    return StandinRedis()
+
+
+@pytest.fixture
+async def conn(db):
+    conn = LazyConnection(StandinPool(db))
+    yield conn
+    await conn.release(commit=False)
+
+
+# Helpers
+async def fail(breaker: CircuitBreaker, times: int = 1):
+    for _ in range(times):
+        with pytest.raises(OSError):
+            async with breaker:
+                raise ConnectionRefusedError()
+
+
+def elapse(breaker: CircuitBreaker):
+    breaker._opened_at = time.monotonic() - breaker.reset_seconds
+
+
+# Tests CircuitBreaker
+@pytest.mark.asyncio
+async def test_opens_after_consecutive_failures(breaker):
+    await fail(breaker)
+    async with breaker:
+        pass
+    await fail(breaker)
+    assert breaker.state == CLOSED
+
+    await fail(breaker)
+    assert breaker.state == OPEN
+
+    with pytest.raises(BreakerOpen) as exc_info:
+        async with breaker:
+            pytest.fail("called while open")
+    assert exc_info.value.retry_after >= 1
+    assert breaker.stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_other_errors_do_not_count(breaker):
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            async with breaker:
+                raise ValueError()
+
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.asyncio
+async def test_half_open_lets_one_probe_through(breaker):
+    await fail(breaker, 2)
+    elapse(breaker)
+    assert breaker.state == HALF_OPEN
+
+    async with breaker:
+        # Concurrent calls are still refused while the probe runs.
+        with pytest.raises(BreakerOpen):
+            async with breaker:
+                pass
+
+    assert breaker.state == CLOSED
+    assert breaker.stats()["state_code"] == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_probe_reopens(breaker):
+    await fail(breaker, 2)
+    elapse(breaker)
+
+    await fail(breaker)
+
+    assert breaker.state == OPEN
+    assert breaker.stats()["opened"] == 2
+
+
+@pytest.mark.asyncio
+async def test_threshold_zero_never_opens():
+    breaker = CircuitBreaker("test", 0, 5, (OSError,))
+
+    await fail(breaker, 10)
+
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.asyncio
+async def test_call_returns_default_when_unavailable(breaker):
+    async def broken():
+        raise ConnectionRefusedError()
+
+    assert await breaker.call(broken, "default") == "default"
+    await fail(breaker)
+    assert await breaker.call(broken, "default") == "default"
+    assert breaker.stats()["rejected"] == 1
+
+
+# Tests degraded modes against faulty stand-ins
+@pytest.mark.asyncio
+async def test_redis_down_reads_and_writes_postgres(conn, db, redis):
+    redis.fault = RedisConnectionError("Connection refused")
+
+    mapping = await generateSlug(conn, redis, TEST_URL)
+    services.url_cache.clear()
+    for _ in range(redis_breaker.failure_threshold):
+        assert await findMatchingURL(conn, redis, mapping.slug) == mapping
+        services.url_cache.clear()
+
+    assert mapping.slug in db.url_mappings
+    assert redis_breaker.state == OPEN
+    commands = redis.commands
+    assert await findMatchingURL(conn, redis, mapping.slug) == mapping
+    assert redis.commands == commands
+
+
+@pytest.mark.asyncio
+async def test_writes_while_redis_is_down_resync_other_workers(
+    conn, redis, monkeypatch
+):
+    slug_filter = BloomFilter(capacity=100, error_rate=0.01)
+    slug_filter.ready = True
+    monkeypatch.setattr("src.cache.slug_filter", slug_filter)
+    monkeypatch.setattr("src.services.slug_filter", slug_filter)
+    redis.fault = RedisConnectionError("Connection refused")
+    for _ in range(redis_breaker.failure_threshold):
+        redis_breaker.failure()
+
+    mapping = await generateSlug(conn, redis, TEST_URL)
+    services.url_cache.clear()
+
+    assert mapping.slug in slug_filter
+    assert await findMatchingURL(conn, redis, mapping.slug) == mapping
+
+    redis.fault = None
+    redis_breaker.reset()
+    other = await generateSlug(conn, redis, "https://example.org/")
+
+    assert [message for _, message in redis.published] == [
+        RESYNC_MESSAGE,
+        other.slug,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_postgres_down_serves_from_cache(conn, db, redis):
+    mapping = await generateSlug(conn, redis, TEST_URL)
+    await conn.release()
+    services.url_cache.clear()
+    db.fault = ConnectionRefusedError()
+
+    assert await findMatchingURL(conn, redis, mapping.slug) == mapping
+
+    for _ in range(postgres_breaker.failure_threshold):
+        with pytest.raises(ConnectionRefusedError):
+            await findMatchingURL(conn, redis, "zzzzzzz")
+    assert postgres_breaker.state == OPEN
+    with pytest.raises(BreakerOpen):
+        await findMatchingURL(conn, redis, "zzzzzyy")
+
+
+@pytest.mark.asyncio
+async def test_query_errors_on_a_held_connection_open_the_breaker(conn, db, redis):
+    await conn.acquire()
+    db.fault = asyncpg.ConnectionDoesNotExistError("connection was closed")
+
+    for i in range(postgres_breaker.failure_threshold):
+        with pytest.raises(asyncpg.ConnectionDoesNotExistError):
+            await findMatchingURL(conn, redis, f"zzzzzz{i}")
+
+    assert postgres_breaker.state == OPEN
+    queries = db.queries
+    with pytest.raises(BreakerOpen):
+        await generateSlug(LazyConnection(StandinPool(db)), redis, TEST_URL)
+    assert db.queries == queries
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_falls_back_to_local_limiter(conn, db, redis):
+    db.fault = ConnectionRefusedError()
+    hits = local_rate_limiter.hits
+
+    await checkRateLimit(conn, redis, TEST_IP)
+
+    assert local_rate_limiter.hits == hits + 1
+
+
+@pytest.mark.asyncio
+async def test_local_limiter_rejects_over_limit(conn, db, redis):
+    db.fault = ConnectionRefusedError()
+    client_ip = "10.0.0.1"
+
+    with pytest.raises(services.RateLimitExceeded):
+        await checkRateLimit(conn, redis, client_ip, cost=services.RATE_LIMIT_REQUESTS)
+
+
+@pytest.mark.asyncio
+async def test_postgres_recovers_after_probe(conn, db, redis):
+    db.fault = ConnectionRefusedError()
+    for _ in range(postgres_breaker.failure_threshold):
+        await checkRateLimit(conn, redis, TEST_IP)
+    assert postgres_breaker.state == OPEN
+
+    db.fault = None
+    elapse(postgres_breaker)
+    mapping = await generateSlug(conn, redis, TEST_URL)
+
+    assert postgres_breaker.state == CLOSED
+    assert mapping.slug in db.url_mappings
@@ -0,0 +1,185 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.cache import (
+    INVALIDATION_CHANNEL,
+    RESYNC_MESSAGE,
+    LocalCache,
+    SingleFlight,
+    applyInvalidation,
+    listenForInvalidations,
+    missedInvalidation,
+    publishInvalidation,
+    url_cache,
+)
+
+TEST_SLUG = "abc1234"
+TEST_URL = "https://example.com"
+
+
+# Tests LocalCache
+def test_local_cache_hit_and_miss():
+    cache = LocalCache(maxsize=10, ttl=60)
+
+    assert cache.get(TEST_SLUG) is None
+    cache.set(TEST_SLUG, TEST_URL)
+    assert cache.get(TEST_SLUG) == TEST_URL
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+
+def test_local_cache_evictions():
+    cache = LocalCache(maxsize=2, ttl=60)
+    for i in range(5):
+        cache.set(f"slug{i}", TEST_URL)
+
+    assert cache.stats()["size"] == 2
+    assert cache.stats()["evictions"] == 3
+
+
+def test_local_cache_invalidate():
+    cache = LocalCache(maxsize=10, ttl=60)
+    cache.set(TEST_SLUG, TEST_URL)
+    cache.invalidate(TEST_SLUG, "missing")
+    assert cache.get(TEST_SLUG) is None
+
+
+def test_local_cache_disabled():
+    cache = LocalCache(maxsize=0, ttl=60)
+    cache.set(TEST_SLUG, TEST_URL)
+    assert cache.get(TEST_SLUG) is None
+    assert cache.stats()["enabled"] is False
+
+
+# Tests applyInvalidation and publishInvalidation
+def test_apply_invalidation():
+    url_cache.set(TEST_SLUG, TEST_URL)
+
+    applyInvalidation(TEST_SLUG)
+
+    assert url_cache.get(TEST_SLUG) is None
+
+
+@pytest.mark.asyncio
+async def test_publish_invalidation():
+    mock_redis = AsyncMock()
+
+    await publishInvalidation(mock_redis, TEST_SLUG, "xyz9876")
+
+    mock_redis.publish.assert_called_once_with(
+        INVALIDATION_CHANNEL, f"{TEST_SLUG} xyz9876"
+    )
+
+
+@pytest.mark.asyncio
+async def test_publish_invalidation_resyncs_after_missed_one():
+    mock_redis = AsyncMock()
+    mock_redis.publish.side_effect = [ConnectionError, 1, 1, 1]
+    missedInvalidation()
+
+    with pytest.raises(ConnectionError):
+        await publishInvalidation(mock_redis, TEST_SLUG)
+    await publishInvalidation(mock_redis, TEST_SLUG)
+    await publishInvalidation(mock_redis, TEST_SLUG)
+
+    assert [call.args[1] for call in mock_redis.publish.call_args_list] == [
+        RESYNC_MESSAGE,
+        RESYNC_MESSAGE,
+        TEST_SLUG,
+        TEST_SLUG,
+    ]
+
+
+# Tests SingleFlight
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_calls():
+    single_flight = SingleFlight()
+    load = AsyncMock(return_value=TEST_URL)
+
+    async def slow_load():
+        await asyncio.sleep(0.01)
+        return await load()
+
+    results = await asyncio.gather(
+        *(single_flight.do(TEST_SLUG, slow_load) for _ in range(10))
+    )
+
+    assert results == [TEST_URL] * 10
+    load.assert_called_once()
+    assert single_flight.stats() == {"in_flight": 0, "calls": 1, "coalesced": 9}
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_exceptions():
+    single_flight = SingleFlight()
+
+    async def failing_load():
+        await asyncio.sleep(0.01)
+        raise KeyError(TEST_SLUG)
+
+    results = await asyncio.gather(
+        *(single_flight.do(TEST_SLUG, failing_load) for _ in range(3)),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, KeyError) for result in results)
+    assert single_flight.stats()["calls"] == 1
+
+
+@pytest.mark.asyncio
+async def test_single_flight_retries_after_cancelled_leader():
+    single_flight = SingleFlight()
+    started = asyncio.Event()
+
+    async def blocked_load():
+        started.set()
+        await asyncio.sleep(10)
+
+    leader = asyncio.create_task(single_flight.do(TEST_SLUG, blocked_load))
+    await started.wait()
+    follower = asyncio.create_task(
+        single_flight.do(TEST_SLUG, AsyncMock(return_value=TEST_URL))
+    )
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == TEST_URL
+    assert single_flight.stats()["calls"] == 2
+
+
+@pytest.mark.asyncio
+async def test_listener_resynchronizes_once_subscribed(monkeypatch):
+    reload = MagicMock()
+    monkeypatch.setattr("src.cache.reloadSlugFilter", reload)
+    pools = [object()]
+    delivered = asyncio.Event()
+
+    async def listen():
+        assert not reload.called
+        yield {"type": "subscribe", "data": 1}
+        assert reload.call_args.args == tuple(pools)
+        url_cache.set(TEST_SLUG, TEST_URL)
+        yield {"type": "message", "data": TEST_SLUG}
+        yield {"type": "message", "data": RESYNC_MESSAGE}
+        delivered.set()
+        await asyncio.sleep(10)
+
+    pubsub = AsyncMock()
+    pubsub.listen = listen
+    redis = MagicMock()
+    redis.pubsub.return_value = pubsub
+    url_cache.set("cached", TEST_URL)
+
+    listener = asyncio.create_task(listenForInvalidations(redis, pools))
+    await delivered.wait()
+    listener.cancel()
+
+    assert reload.call_count == 2
+    assert url_cache.get("cached") is None
+    assert url_cache.get(TEST_SLUG) is None
+    pubsub.subscribe.assert_awaited_once_with(INVALIDATION_CHANNEL)
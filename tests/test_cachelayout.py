@@ -0,0 +1,126 @@
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.cachelayout import (
+    BUCKET_WRITE_SCRIPT,
+    BucketLayout,
+    KeyLayout,
+    createCacheLayout,
+)
+
+TEST_SLUG = "abc1234"
+TEST_VALUE = "1|1704067200.0|0|https://example.com"
+
+
+# Fixtures
+@pytest.fixture
+def layout():
+    return BucketLayout(bucket_count=16, sweep_entries=200, dual_read=False)
+
+
+@pytest.fixture
+def pipe():
+    pipe = MagicMock()
+    pipe.__aenter__.return_value = pipe
+    pipe.get.return_value = pipe
+    pipe.ttl.return_value = pipe
+    pipe.execute = AsyncMock()
+    return pipe
+
+
+# Tests createCacheLayout
+def test_create_cache_layout():
+    assert isinstance(createCacheLayout("keys"), KeyLayout)
+    assert isinstance(createCacheLayout("buckets"), BucketLayout)
+    with pytest.raises(ValueError):
+        createCacheLayout("memcached")
+
+
+# Tests BucketLayout
+def test_bucket_key_is_stable(layout):
+    key = layout.bucketKey(TEST_SLUG)
+
+    assert key == layout.bucketKey(TEST_SLUG)
+    assert key.startswith("urls:")
+    assert 0 <= int(key.split(":")[1]) < 16
+
+
+@pytest.mark.asyncio
+async def test_bucket_layout_get(layout):
+    mock_redis = AsyncMock()
+    mock_redis.hget.return_value = f"{int(time.time()) + 60}|{TEST_VALUE}"
+
+    value, ttl = await layout.getWithTTL(mock_redis, TEST_SLUG)
+
+    assert value == TEST_VALUE
+    assert 59 <= ttl <= 60
+    mock_redis.hget.assert_called_once_with(layout.bucketKey(TEST_SLUG), TEST_SLUG)
+
+
+@pytest.mark.asyncio
+async def test_bucket_layout_get_expired(layout):
+    mock_redis = AsyncMock()
+    mock_redis.hget.return_value = f"{int(time.time()) - 1}|{TEST_VALUE}"
+
+    assert await layout.get(mock_redis, TEST_SLUG) is None
+
+
+@pytest.mark.asyncio
+async def test_bucket_layout_dual_read_falls_back_to_keys(pipe):
+    layout = BucketLayout(bucket_count=16, sweep_entries=200, dual_read=True)
+    pipe.execute.return_value = [None, TEST_VALUE, 120]
+    mock_redis = MagicMock()
+    mock_redis.pipeline.return_value = pipe
+
+    value, ttl = await layout.getWithTTL(mock_redis, TEST_SLUG)
+
+    assert (value, ttl) == (TEST_VALUE, 120)
+    pipe.get.assert_called_once_with(f"url:{TEST_SLUG}")
+
+
+@pytest.mark.asyncio
+async def test_bucket_layout_set(layout):
+    script = AsyncMock()
+    mock_redis = MagicMock()
+    mock_redis.register_script.return_value = script
+
+    await layout.set(mock_redis, TEST_SLUG, TEST_VALUE, 3600)
+
+    mock_redis.register_script.assert_called_once_with(BUCKET_WRITE_SCRIPT)
+    # Full buckets are swept by sampling, never by reading them whole.
+    assert "HRANDFIELD" in BUCKET_WRITE_SCRIPT
+    assert "HGETALL" not in BUCKET_WRITE_SCRIPT
+    kwargs = script.call_args.kwargs
+    assert kwargs["keys"] == [layout.bucketKey(TEST_SLUG)]
+    assert kwargs["args"][1:] == [200, TEST_SLUG, 3600, TEST_VALUE]
+
+
+@pytest.mark.asyncio
+async def test_bucket_layout_set_many_groups_by_bucket(pipe):
+    layout = BucketLayout(bucket_count=1, sweep_entries=200, dual_read=False)
+    script = AsyncMock()
+    mock_redis = MagicMock()
+    mock_redis.register_script.return_value = script
+    mock_redis.pipeline.return_value = pipe
+
+    await layout.setMany(mock_redis, [("a", "x", 10), ("b", "", 5)])
+
+    script.assert_called_once()
+    assert script.call_args.kwargs["args"][2:] == ["a", 10, "x", "b", 5, ""]
+    assert script.call_args.kwargs["client"] is pipe
+    pipe.execute.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_bucket_layout_delete_many(pipe):
+    layout = BucketLayout(bucket_count=1, sweep_entries=200, dual_read=True)
+    mock_redis = MagicMock()
+    mock_redis.pipeline.return_value = pipe
+
+    await layout.deleteMany(mock_redis, ["a", "b"])
+
+    pipe.hdel.assert_called_once_with("urls:0", "a", "b")
+    pipe.delete.assert_called_once_with("url:a", "url:b")
+    pipe.execute.assert_called_once()
@@ -0,0 +1,225 @@
+import argparse
+import io
+import json
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.cli import exportMappings, importMappings, readRows, run, toRecord
+from src.helpers import shorten_url
+from src.models import URLMapping
+
+TEST_URL = "https://example.com/"
+TEST_MAPPING = URLMapping(
+    slug=shorten_url(TEST_URL),
+    original_url=TEST_URL,
+    created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+)
+
+
+# Fixtures
+@pytest.fixture
+def mock_conn():
+    return AsyncMock()
+
+
+@pytest.fixture
+def mock_pool(mock_conn):
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__.return_value = mock_conn
+    return pool
+
+
+@pytest.fixture
+def mock_import():
+    def written(conn, records, overwrite):
+        mappings = [
+            URLMapping(
+                slug=slug,
+                original_url=url,
+                created_at=created_at or TEST_MAPPING.created_at,
+                permanent=permanent,
+                expires_at=expires_at,
+            )
+            for slug, url, created_at, permanent, expires_at in records
+        ]
+        return mappings, len(mappings), []
+
+    with patch("src.cli.importURLMappings", side_effect=written) as mock:
+        yield mock
+
+
+# Tests readRows and toRecord
+def test_read_rows_csv_and_ndjson():
+    csv_file = io.StringIO("original_url,permanent\nhttps://a.com,t\n")
+    ndjson_file = io.StringIO('{"url": "https://a.com", "permanent": true}\n\n')
+
+    assert list(readRows(csv_file, "csv")) == [
+        {"original_url": "https://a.com", "permanent": "t"}
+    ]
+    assert list(readRows(ndjson_file, "ndjson")) == [
+        {"url": "https://a.com", "permanent": True}
+    ]
+
+
+def test_read_rows_ndjson_yields_none_for_bad_lines():
+    ndjson_file = io.StringIO('{"url": "https://a.com"}\n{"url": \n')
+
+    assert list(readRows(ndjson_file, "ndjson")) == [{"url": "https://a.com"}, None]
+
+
+def test_to_record_normalizes_like_shorten():
+    record = toRecord(
+        {
+            "original_url": "https://example.com",
+            "created_at": "2024-01-01 00:00:00+00",
+            "permanent": "t",
+            "expires_at": "",
+        }
+    )
+
+    assert record == (None, TEST_URL, TEST_MAPPING.created_at, True, None)
+
+
+@pytest.mark.parametrize(
+    "row",
+    [None, [], {}, {"url": "not a url"}, {"url": TEST_URL, "slug": "abc/123"}],
+)
+def test_to_record_invalid(row):
+    with pytest.raises(ValueError):
+        toRecord(row)
+
+
+# Tests importMappings
+@pytest.mark.asyncio
+async def test_import_generates_slugs_in_batches(mock_pool, mock_import):
+    rows = iter([{"url": f"https://example.com/{i}"} for i in range(5)])
+
+    counts = await importMappings([mock_pool], None, rows, batch_size=2)
+
+    assert mock_import.call_count == 3
+    records = [record for call in mock_import.call_args_list for record in call[0][1]]
+    assert [slug for slug, *_ in records] == [
+        shorten_url(f"https://example.com/{i}") for i in range(5)
+    ]
+    assert counts["read"] == counts["inserted"] == 5
+
+
+@pytest.mark.asyncio
+async def test_import_keeps_given_slugs_and_skips_invalid_rows(mock_pool, mock_import):
+    rows = iter([{"slug": "Abc12345", "url": TEST_URL}, {"url": "not a url"}])
+
+    counts = await importMappings([mock_pool], None, rows)
+
+    assert mock_import.call_args[0][1][0][0] == "Abc12345"
+    assert counts["invalid"] == 1
+    assert counts["inserted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_import_counts_malformed_ndjson_lines_as_invalid(mock_pool, mock_import):
+    ndjson_file = io.StringIO(f'{{"url": "{TEST_URL}"}}\nnot json\n[1]\n')
+
+    counts = await importMappings([mock_pool], None, readRows(ndjson_file, "ndjson"))
+
+    assert counts["read"] == 3
+    assert counts["invalid"] == 2
+    assert counts["inserted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_import_reports_collisions(mock_pool, mock_import):
+    slug = TEST_MAPPING.slug
+    mock_import.side_effect = lambda conn, records, overwrite: (
+        [],
+        0,
+        [(slug, TEST_URL, "https://other.com/")],
+    )
+    rows = iter(
+        [
+            {"slug": slug, "url": TEST_URL},
+            {"slug": slug, "url": "https://third.com"},
+        ]
+    )
+    collisions_file = io.StringIO()
+
+    counts = await importMappings(
+        [mock_pool], None, rows, collisions_file=collisions_file
+    )
+
+    assert len(mock_import.call_args[0][1]) == 1
+    assert counts["collisions"] == 2
+    assert counts["unchanged"] == 0
+    lines = [json.loads(line) for line in collisions_file.getvalue().splitlines()]
+    assert lines[0] == {
+        "slug": slug,
+        "original_url": "https://third.com/",
+        "existing_url": TEST_URL,
+    }
+    assert lines[1]["existing_url"] == "https://other.com/"
+
+
+@pytest.mark.asyncio
+async def test_import_primes_cache_and_notifies_workers(mock_pool, mock_import):
+    redis = AsyncMock()
+    pipe = MagicMock()
+    pipe.__aenter__.return_value = pipe
+    pipe.execute = AsyncMock()
+    redis.pipeline = MagicMock(return_value=pipe)
+
+    await importMappings(
+        [mock_pool], redis, iter([{"url": TEST_URL}]), prime_cache=True
+    )
+
+    pipe.setex.assert_called_once()
+    redis.publish.assert_called_once()
+    assert redis.publish.call_args.args[1] == TEST_MAPPING.slug
+
+
+@pytest.mark.asyncio
+async def test_import_drops_cached_copies_without_priming(mock_pool, mock_import):
+    redis = AsyncMock()
+
+    await importMappings([mock_pool], redis, iter([{"url": TEST_URL}]), overwrite=True)
+
+    redis.delete.assert_called_once_with(f"url:{TEST_MAPPING.slug}")
+    redis.publish.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_import_refused_without_redis(monkeypatch):
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    args = argparse.Namespace(command="import", path="links.csv", no_redis=False)
+
+    with patch("src.cli.asyncpg.create_pool") as create_pool:
+        with pytest.raises(SystemExit, match="REDIS_URL"):
+            await run(args)
+
+    create_pool.assert_not_called()
+
+
+# Tests exportMappings
+@pytest.mark.asyncio
+async def test_export_ndjson(mock_pool):
+    async def stream(conn):
+        yield TEST_MAPPING
+
+    output = io.BytesIO()
+    with patch("src.cli.streamURLMappings", stream):
+        assert await exportMappings([mock_pool, mock_pool], output, "ndjson") == 2
+
+    lines = output.getvalue().decode().splitlines()
+    assert URLMapping.model_validate_json(lines[0]) == TEST_MAPPING
+
+
+@pytest.mark.asyncio
+async def test_export_csv_uses_copy(mock_pool, mock_conn):
+    mock_conn.copy_from_query.return_value = "COPY 3"
+    output = io.BytesIO()
+
+    assert await exportMappings([mock_pool, mock_pool], output, "csv") == 6
+
+    headers = [call.kwargs["header"] for call in mock_conn.copy_from_query.mock_calls]
+    assert headers == [True, False]
+    assert mock_conn.copy_from_query.call_args.kwargs["output"] is output
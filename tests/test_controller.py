@@ -1,5 +1,6 @@
-from datetime import datetime
-from unittest.mock import AsyncMock, patch
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from asyncpg import Connection
@@ -8,13 +9,24 @@ from httpx import ASGITransport, AsyncClient
 from redis.asyncio import Redis
 
 from src.controller import router
-from src.dependencies import get_db_conn, get_redis
+from src.dependencies import get_db_conn, get_db_pool, get_lazy_db_conn, get_redis
 from src.models import URLMapping
-from src.services import RateLimitExceeded, RecordNotFound, UpsertFailed
+from src.services import (
+    BATCH_MAX_SIZE,
+    RATE_LIMIT_REQUESTS,
+    RateLimitExceeded,
+    RecordNotFound,
+    UpsertFailed,
+)
 
 TEST_BASE_URL = "http://test"
 EXAMPLE_URL = "https://example.com"
 TEST_SLUG = "abc1234"
+TEST_MAPPING = URLMapping(
+    slug=TEST_SLUG,
+    original_url=EXAMPLE_URL,
+    created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+)
 
 
 # Fixtures
@@ -33,7 +45,12 @@ def test_app(mock_conn, mock_redis):
     app = FastAPI()
     app.include_router(router)
     app.dependency_overrides.update(
-        {get_db_conn: lambda: mock_conn, get_redis: lambda: mock_redis}
+        {
+            get_db_pool: lambda: MagicMock(),
+            get_db_conn: lambda: mock_conn,
+            get_lazy_db_conn: lambda: mock_conn,
+            get_redis: lambda: mock_redis,
+        }
     )
     return app
 
@@ -61,6 +78,51 @@ async def test_health_check(async_client):
     assert response.json() == {"status": "healthy"}
 
 
+@pytest.mark.asyncio
+async def test_readiness_waits_for_cache_warmup(async_client):
+    with patch("src.controller.cache_warmer.ready", False):
+        response = await async_client.get(f"{TEST_BASE_URL}/ready")
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    with patch("src.controller.cache_warmer.ready", True):
+        response = await async_client.get(f"{TEST_BASE_URL}/ready")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"status": "ready"}
+
+
+@pytest.mark.asyncio
+async def test_stats(async_client):
+    response = await async_client.get(f"{TEST_BASE_URL}/stats")
+    assert response.status_code == status.HTTP_200_OK
+    assert "hits" in response.json()["local_cache"]
+
+
+@pytest.mark.asyncio
+async def test_metrics(async_client):
+    response = await async_client.get(f"{TEST_BASE_URL}/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "minime_db_pool_connections" in response.text
+
+
+@pytest.mark.asyncio
+async def test_metrics_render_on_the_event_loop_thread(async_client):
+    threads = []
+
+    def record(*args):
+        threads.append(threading.get_ident())
+        return {}
+
+    with (
+        patch("src.controller.render", side_effect=lambda pool: record() or ""),
+        patch("src.controller.collectStats", side_effect=record),
+    ):
+        await async_client.get(f"{TEST_BASE_URL}/metrics")
+        await async_client.get(f"{TEST_BASE_URL}/stats")
+
+    assert threads == [threading.get_ident()] * 2
+
+
 @pytest.mark.asyncio
 @patch("src.controller.checkRateLimit", new_callable=AsyncMock)
 @patch("src.controller.findMatchingURL", new_callable=AsyncMock)
@@ -68,7 +130,7 @@ async def test_redirect_success(
     mock_find_matching_url, mock_check_rate_limit, async_client
 ):
     mock_check_rate_limit.return_value = None
-    mock_find_matching_url.return_value = EXAMPLE_URL
+    mock_find_matching_url.return_value = TEST_MAPPING
 
     response = await async_client.get(f"{TEST_BASE_URL}/{TEST_SLUG}")
 
@@ -76,6 +138,76 @@ async def test_redirect_success(
     assert mock_find_matching_url.called
     assert response.status_code == status.HTTP_307_TEMPORARY_REDIRECT
     assert response.headers["location"] == EXAMPLE_URL
+    assert "cache-control" not in response.headers
+
+
+@pytest.mark.asyncio
+@patch("src.controller.checkRateLimit", new_callable=AsyncMock)
+@patch("src.controller.findMatchingURL", new_callable=AsyncMock)
+async def test_redirect_permanent_is_cacheable(
+    mock_find_matching_url, mock_check_rate_limit, async_client
+):
+    mock_find_matching_url.return_value = TEST_MAPPING.model_copy(
+        update={"permanent": True}
+    )
+
+    response = await async_client.get(f"{TEST_BASE_URL}/{TEST_SLUG}")
+
+    assert response.status_code == status.HTTP_308_PERMANENT_REDIRECT
+    assert response.headers["location"] == EXAMPLE_URL
+    assert response.headers["cache-control"] == "public, max-age=86400"
+    assert response.headers["etag"] == f'"{TEST_SLUG}-1704067200"'
+    assert response.headers["last-modified"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+
+    response = await async_client.get(
+        f"{TEST_BASE_URL}/{TEST_SLUG}",
+        headers={"If-None-Match": response.headers["etag"]},
+    )
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert "location" not in response.headers
+
+
+@pytest.mark.asyncio
+@patch("src.controller.REDIRECT_STATUS_CODE", 301)
+@patch("src.controller.checkRateLimit", new_callable=AsyncMock)
+@patch("src.controller.findMatchingURL", new_callable=AsyncMock)
+async def test_redirect_deployment_status_code(
+    mock_find_matching_url, mock_check_rate_limit, async_client
+):
+    mock_find_matching_url.return_value = TEST_MAPPING
+
+    response = await async_client.get(f"{TEST_BASE_URL}/{TEST_SLUG}")
+
+    assert response.status_code == status.HTTP_301_MOVED_PERMANENTLY
+    assert response.headers["cache-control"] == "public, max-age=86400"
+
+
+@pytest.mark.asyncio
+@patch("src.controller.checkRateLimit", new_callable=AsyncMock)
+@patch("src.controller.findMatchingURL", new_callable=AsyncMock)
+async def test_redirect_max_age_capped_by_expiry(
+    mock_find_matching_url, mock_check_rate_limit, async_client
+):
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=120)
+    mock_find_matching_url.return_value = TEST_MAPPING.model_copy(
+        update={"permanent": True, "expires_at": expires_at}
+    )
+
+    response = await async_client.get(f"{TEST_BASE_URL}/{TEST_SLUG}")
+
+    max_age = int(response.headers["cache-control"].split("max-age=")[1])
+    assert 118 <= max_age <= 120
+
+
+@pytest.mark.asyncio
+async def test_shorten_rejects_past_expiry(async_client):
+    response = await async_client.post(
+        f"{TEST_BASE_URL}/shorten",
+        json={"url": EXAMPLE_URL, "expires_at": "2020-01-01T00:00:00Z"},
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
 
 @pytest.mark.asyncio
@@ -125,7 +257,10 @@ async def test_shorten_url_success(
         "slug": TEST_SLUG,
         "original_url": EXAMPLE_URL,
         "created_at": created_at.isoformat(),
+        "permanent": False,
+        "expires_at": None,
     }
+    assert mock_generate_slug.call_args.args[3] is False
 
 
 @pytest.mark.asyncio
@@ -157,3 +292,49 @@ async def test_shorten_url_upsert_failed(
         f"Failed to create or update mapping for {EXAMPLE_URL}"
         in response.json()["detail"]
     )
+
+
+@pytest.mark.asyncio
+@patch("src.controller.checkRateLimit", new_callable=AsyncMock)
+@patch("src.controller.generateSlugs", new_callable=AsyncMock)
+async def test_shorten_batch_success(
+    mock_generate_slugs, mock_check_rate_limit, async_client
+):
+    created_at = datetime.utcnow()
+    urls = [EXAMPLE_URL, "https://example.org"]
+    mock_generate_slugs.return_value = [
+        URLMapping(slug=TEST_SLUG, original_url=url, created_at=created_at)
+        for url in urls
+    ]
+
+    response = await async_client.post(
+        f"{TEST_BASE_URL}/shorten/batch", json={"urls": urls}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [item["original_url"] for item in response.json()] == urls
+    assert mock_check_rate_limit.call_args.kwargs["cost"] == len(urls)
+
+
+@pytest.mark.asyncio
+async def test_shorten_batch_empty(async_client):
+    response = await async_client.post(
+        f"{TEST_BASE_URL}/shorten/batch", json={"urls": []}
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+@patch("src.controller.checkRateLimit", new_callable=AsyncMock)
+async def test_shorten_batch_over_rate_limit_is_not_charged(
+    mock_check_rate_limit, async_client
+):
+    urls = [f"https://example.com/{i}" for i in range(RATE_LIMIT_REQUESTS)]
+
+    response = await async_client.post(
+        f"{TEST_BASE_URL}/shorten/batch", json={"urls": urls}
+    )
+
+    assert BATCH_MAX_SIZE < RATE_LIMIT_REQUESTS
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    mock_check_rate_limit.assert_not_called()
@@ -0,0 +1,88 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.breakers import postgres_breaker
+from src.dependencies import LazyConnection, get_lazy_db_conn
+from src.repository import ACQUIRE_TIMEOUT, ObservedConnection
+
+
+# Fixtures
+@pytest.fixture
+def mock_transaction():
+    return AsyncMock()
+
+
+@pytest.fixture
+def mock_pool(mock_transaction):
+    conn = AsyncMock()
+    conn.transaction = MagicMock(return_value=mock_transaction)
+    pool = AsyncMock()
+    pool.acquire.return_value = conn
+    return pool
+
+
+# Tests LazyConnection
+@pytest.mark.asyncio
+async def test_lazy_connection_unused(mock_pool):
+    conn = LazyConnection(mock_pool)
+    await conn.release()
+
+    assert not conn.acquired
+    mock_pool.acquire.assert_not_called()
+    mock_pool.release.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_lazy_connection_acquires_once(mock_pool, mock_transaction):
+    conn = LazyConnection(mock_pool)
+
+    await conn.fetchrow("SELECT 1")
+    await conn.execute("SELECT 2")
+
+    assert conn.acquired
+    mock_pool.acquire.assert_called_once()
+    mock_transaction.start.assert_called_once()
+
+    await conn.release()
+
+    assert not conn.acquired
+    mock_transaction.commit.assert_called_once()
+    mock_pool.release.assert_called_once()
+
+
+# Tests get_lazy_db_conn
+@pytest.mark.asyncio
+async def test_get_lazy_db_conn_rolls_back_on_error(mock_pool, mock_transaction):
+    dependency = get_lazy_db_conn(mock_pool)
+    conn = await anext(dependency)
+    await conn.fetchval("SELECT 1")
+
+    with pytest.raises(RuntimeError):
+        await dependency.athrow(RuntimeError("boom"))
+
+    mock_transaction.rollback.assert_called_once()
+    mock_transaction.commit.assert_not_called()
+    mock_pool.release.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_acquire_uses_timeout_and_reports_wait(mock_pool):
+    with patch("src.dependencies.admission_controller") as controller:
+        await LazyConnection(mock_pool).acquire()
+
+    mock_pool.acquire.assert_called_once_with(timeout=ACQUIRE_TIMEOUT)
+    controller.observeQueueDelay.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_query_timeouts_count_as_breaker_failures(mock_pool):
+    mock_pool.acquire.return_value.fetchrow.side_effect = TimeoutError()
+    conn = LazyConnection(mock_pool)
+
+    with pytest.raises(TimeoutError):
+        await conn.fetchrow("SELECT 1")
+    with pytest.raises(TimeoutError):
+        await ObservedConnection(mock_pool.acquire.return_value).fetchrow("SELECT 1")
+
+    assert postgres_breaker.consecutive_failures == 2
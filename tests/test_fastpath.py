@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import FastAPI, status
+from httpx import ASGITransport, AsyncClient
+
+from src.controller import router
+from src.dependencies import get_db_pool
+from src.fastpath import RedirectFastPath
+from src.models import URLMapping
+from src.services import RecordNotFound
+
+TEST_BASE_URL = "http://test"
+EXAMPLE_URL = "https://example.com"
+TEST_SLUG = "abc1234"
+
+
+# Fixtures
+@pytest.fixture
+def test_app():
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(RedirectFastPath)
+    app.state.db_pool = AsyncMock()
+    app.state.redis = AsyncMock()
+    app.dependency_overrides[get_db_pool] = lambda: MagicMock()
+    return app
+
+
+@pytest.fixture
+async def async_client(test_app):
+    async with AsyncClient(
+        transport=ASGITransport(app=test_app), base_url=TEST_BASE_URL
+    ) as client:
+        yield client
+
+
+# Tests RedirectFastPath
+@pytest.mark.asyncio
+@patch("src.controller.checkRateLimit", new_callable=AsyncMock)
+@patch("src.controller.findMatchingURL", new_callable=AsyncMock)
+async def test_fast_path_redirect(
+    mock_find_matching_url, mock_check_rate_limit, test_app, async_client
+):
+    mock_find_matching_url.return_value = URLMapping(
+        slug=TEST_SLUG,
+        original_url=EXAMPLE_URL,
+        created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    )
+
+    response = await async_client.get(f"{TEST_BASE_URL}/{TEST_SLUG}")
+
+    assert response.status_code == status.HTTP_307_TEMPORARY_REDIRECT
+    assert response.headers["location"] == EXAMPLE_URL
+    assert mock_find_matching_url.call_args.args[2] == TEST_SLUG
+    test_app.state.db_pool.acquire.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("src.controller.checkRateLimit", new_callable=AsyncMock)
+@patch("src.controller.findMatchingURL", new_callable=AsyncMock)
+async def test_fast_path_not_found(
+    mock_find_matching_url, mock_check_rate_limit, async_client
+):
+    mock_find_matching_url.side_effect = RecordNotFound("Original URL", TEST_SLUG)
+
+    response = await async_client.get(f"{TEST_BASE_URL}/{TEST_SLUG}")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert "Original URL not found" in response.json()["detail"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/health", "/metrics"])
+@patch("src.fastpath.build_redirect_response", new_callable=AsyncMock)
+async def test_fast_path_falls_through(mock_build_response, async_client, path):
+    response = await async_client.get(f"{TEST_BASE_URL}{path}")
+
+    assert response.status_code == status.HTTP_200_OK
+    mock_build_response.assert_not_called()
@@ -1,6 +1,16 @@
 import pytest
 
-from src.helpers import DEFAULT_LENGTH, URL_SAFE_CHARS, encode, shorten_url
+from src.helpers import (
+    DEFAULT_LENGTH,
+    SLUG_SPACE,
+    URL_SAFE_CHARS,
+    decode,
+    decode_many,
+    encode,
+    encode_many,
+    shorten_url,
+    shorten_urls,
+)
 
 EXAMPLE_URL = "https://www.example.com"
 LONG_URL_SUFFIX = "a" * 1000
@@ -35,6 +45,65 @@ def test_encode_max_value():
     assert len(encoded) <= DEFAULT_LENGTH
 
 
+# Tests decode
+@pytest.mark.parametrize("number, encoded", ENCODE_TEST_CASES)
+def test_decode(number, encoded):
+    assert decode(encoded) == number
+
+
+def test_decode_padded_slug():
+    assert decode(shorten_url(EXAMPLE_URL)) == decode(
+        shorten_url(EXAMPLE_URL).lstrip(URL_SAFE_CHARS[0])
+    )
+
+
+@pytest.mark.parametrize("encoded", ["abc-123", "favicon.ico"])
+def test_decode_invalid(encoded):
+    with pytest.raises(ValueError):
+        decode(encoded)
+
+
+# Tests encode_many and decode_many
+@pytest.mark.parametrize("width", [1, 4, DEFAULT_LENGTH, 8])
+def test_encode_many_matches_encode(width):
+    limit = len(URL_SAFE_CHARS) ** width
+    numbers = [0, 1, 61, 62 % limit, limit - 1]
+    numbers += [(i * 7919) % limit for i in range(1000)]
+
+    encoded = encode_many(numbers, width)
+
+    assert encoded == [encode(number).rjust(width, "0") for number in numbers]
+    assert decode_many(encoded, width) == numbers
+    assert decode_many(encoded, width) == [decode(string) for string in encoded]
+
+
+@pytest.mark.parametrize("width", [1, 7, 8])
+def test_encode_many_empty(width):
+    assert encode_many([], width) == []
+    assert decode_many([], width) == []
+
+
+@pytest.mark.parametrize("numbers", [[-1], [SLUG_SPACE + 1]])
+def test_encode_many_out_of_range(numbers):
+    with pytest.raises(ValueError):
+        encode_many(numbers)
+
+
+@pytest.mark.parametrize(
+    "encoded", [["abc-123"], ["abc123"], ["abc1234", "abc12345"], ["abc123é"]]
+)
+def test_decode_many_invalid(encoded):
+    with pytest.raises(ValueError):
+        decode_many(encoded)
+
+
+def test_batch_functions_reject_wide_strings():
+    with pytest.raises(ValueError):
+        encode_many([1], width=9)
+    with pytest.raises(ValueError):
+        decode_many(["0" * 9], width=9)
+
+
 # Tests shorten_url
 @pytest.mark.parametrize(
     "url",
@@ -59,3 +128,11 @@ def test_shorten_url_different_urls():
     url1 = EXAMPLE_URL
     url2 = "https://www.example.org"
     assert shorten_url(url1) != shorten_url(url2)
+
+
+# Tests shorten_urls
+def test_shorten_urls_matches_shorten_url():
+    urls = [EXAMPLE_URL, "", f"https://www.{LONG_URL_SUFFIX}.com", "https://例え.jp"]
+    urls += [f"https://example.com/{i}" for i in range(1000)]
+
+    assert shorten_urls(urls) == [shorten_url(url) for url in urls]
@@ -0,0 +1,78 @@
+import json
+import logging
+import queue
+
+import pytest
+
+from src.logs import (
+    DeferredQueueHandler,
+    JSONFormatter,
+    SamplingFilter,
+    parseSampleRates,
+)
+
+
+def create_record(level=logging.INFO, route=None, msg="Redirecting: %s", args=("x",)):
+    record = logging.LogRecord("test", level, __file__, 1, msg, args, None)
+    if route is not None:
+        record.route = route
+    return record
+
+
+# Tests parseSampleRates
+def test_parse_sample_rates():
+    assert parseSampleRates("redirect=0.01, health=0") == {
+        "redirect": 0.01,
+        "health": 0.0,
+    }
+    assert parseSampleRates("") == {}
+
+
+# Tests SamplingFilter
+@pytest.mark.parametrize(
+    "level, route, expected",
+    [
+        (logging.INFO, "health", False),
+        (logging.INFO, "shorten", True),
+        (logging.INFO, None, True),
+        (logging.ERROR, "health", True),
+    ],
+)
+def test_sampling_filter(level, route, expected):
+    sampling = SamplingFilter({"health": 0.0})
+    assert sampling.filter(create_record(level, route)) is expected
+
+
+def test_sampling_filter_rate():
+    sampling = SamplingFilter({"redirect": 0.1})
+    kept = sum(sampling.filter(create_record(route="redirect")) for _ in range(5000))
+    assert 300 < kept < 700
+
+
+def test_sampling_filter_decides_once_per_record():
+    sampling = SamplingFilter({"redirect": 0.5})
+    record = create_record(route="redirect")
+    first = sampling.filter(record)
+    assert all(sampling.filter(record) is first for _ in range(20))
+
+
+# Tests JSONFormatter
+def test_json_formatter():
+    entry = json.loads(JSONFormatter().format(create_record(route="redirect")))
+    assert entry["message"] == "Redirecting: x"
+    assert entry["route"] == "redirect"
+    assert entry["level"] == "INFO"
+
+
+# Tests DeferredQueueHandler
+def test_deferred_queue_handler_does_not_format():
+    handler = DeferredQueueHandler(queue.Queue(1))
+    record = create_record()
+
+    handler.handle(record)
+    handler.handle(create_record())
+
+    queued = handler.queue.get_nowait()
+    assert queued is record
+    assert queued.args == ("x",)
+    assert handler.queue.empty()
@@ -0,0 +1,52 @@
+from unittest.mock import MagicMock
+
+from src.metrics import Counter, Histogram, registerStats, render
+
+
+# Tests Counter
+def test_counter_render():
+    counter = Counter("test_total", "Test counter.", ("layer", "result"))
+    counter.inc("redis", "hit")
+    counter.inc("redis", "hit", amount=2)
+
+    assert counter.value("redis", "hit") == 3
+    assert 'test_total{layer="redis",result="hit"} 3' in counter.render()
+
+
+# Tests Histogram
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "Test histogram.", "stage", (0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        histogram.observe("db", value)
+
+    lines = histogram.render()
+
+    assert 'test_seconds_bucket{stage="db",le="0.1"} 2' in lines
+    assert 'test_seconds_bucket{stage="db",le="1.0"} 3' in lines
+    assert 'test_seconds_bucket{stage="db",le="+Inf"} 4' in lines
+    assert 'test_seconds_count{stage="db"} 4' in lines
+    assert histogram.count("db") == 4
+
+
+def test_histogram_timer():
+    histogram = Histogram("test_seconds", "Test histogram.", "stage")
+    with histogram.time("redis"):
+        pass
+    assert histogram.count("redis") == 1
+
+
+# Tests render
+def test_render_stats_and_pool():
+    registerStats("test_component", lambda: {"hits": 3, "enabled": True, "name": "x"})
+    pool = MagicMock()
+    pool.get_size.return_value = 5
+    pool.get_idle_size.return_value = 2
+    pool.get_max_size.return_value = 20
+
+    output = render(pool)
+
+    assert "minime_test_component_hits 3.0" in output
+    assert "minime_test_component_enabled 1.0" in output
+    assert "minime_test_component_name" not in output
+    assert 'minime_db_pool_connections{state="in_use"} 3' in output
+    assert "minime_db_pool_max_size 20" in output
@@ -0,0 +1,40 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.ratelimit import (
+    SLIDING_WINDOW_SCRIPT,
+    PostgresRateLimiter,
+    RedisRateLimiter,
+    createRateLimiter,
+)
+
+TEST_IP = "127.0.0.1"
+
+
+# Tests createRateLimiter
+def test_create_rate_limiter():
+    assert isinstance(createRateLimiter("postgres"), PostgresRateLimiter)
+    assert isinstance(createRateLimiter("redis"), RedisRateLimiter)
+    with pytest.raises(ValueError):
+        createRateLimiter("memcached")
+
+
+# Tests RedisRateLimiter
+@pytest.mark.asyncio
+async def test_redis_rate_limiter_hit():
+    script = AsyncMock(return_value=42)
+    mock_redis = MagicMock()
+    mock_redis.register_script.return_value = script
+    limiter = RedisRateLimiter(limit=100, window_seconds=600)
+
+    rate_limit = await limiter.hit(AsyncMock(), mock_redis, TEST_IP)
+    await limiter.hit(AsyncMock(), mock_redis, TEST_IP)
+
+    assert rate_limit.ip_address == TEST_IP
+    assert rate_limit.request_count == 42
+    mock_redis.register_script.assert_called_once_with(SLIDING_WINDOW_SCRIPT)
+    kwargs = script.call_args.kwargs
+    assert kwargs["keys"] == [f"ratelimit:{TEST_IP}"]
+    assert kwargs["args"][:2] == [600_000_000, 100]
+    assert kwargs["client"] is mock_redis
@@ -0,0 +1,83 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.reaper import REAPER_LOCK_ID, Reaper
+
+
+# Fixtures
+@pytest.fixture
+def mock_conn():
+    conn = AsyncMock()
+    conn.fetchval.return_value = True
+    return conn
+
+
+@pytest.fixture
+def mock_pool(mock_conn):
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__.return_value = mock_conn
+    return pool
+
+
+def create_reaper(**overrides):
+    options = {
+        "enabled": True,
+        "interval": 60,
+        "batch_size": 2,
+        "batch_delay": 0,
+        "rate_limit_retention": 0,
+    }
+    options.update(overrides)
+    return Reaper(**options)
+
+
+# Tests Reaper
+@pytest.mark.asyncio
+async def test_reaper_purge_stops_after_partial_batch(mock_pool, mock_conn):
+    reaper = create_reaper()
+    delete = AsyncMock(side_effect=[2, 2, 1])
+
+    assert await reaper.purge(mock_pool, delete) == 5
+    assert delete.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_reaper_run_once(mock_pool, mock_conn):
+    reaper = create_reaper()
+    shard = MagicMock()
+    shard_conn = AsyncMock()
+    shard.acquire.return_value.__aenter__.return_value = shard_conn
+    mock_conn.execute.side_effect = lambda query, *args: (
+        "DELETE 1" if "url_mappings" in query or "rate_limits" in query else "SELECT 1"
+    )
+    shard_conn.execute.return_value = "DELETE 0"
+
+    result = await reaper.runOnce(mock_pool, [mock_pool, shard])
+
+    assert result["mappings"] == 1
+    assert result["rate_limits"] == 1
+    mock_conn.fetchval.assert_called_once_with(
+        "SELECT pg_try_advisory_lock($1)", REAPER_LOCK_ID
+    )
+    mock_conn.execute.assert_any_call("SELECT pg_advisory_unlock($1)", REAPER_LOCK_ID)
+    stats = reaper.stats()
+    assert stats["runs"] == 1
+    assert stats["mappings_purged"] == 1
+    assert stats["last_run_rate_limits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_reaper_skips_run_held_by_another_worker(mock_pool, mock_conn):
+    reaper = create_reaper()
+    mock_conn.fetchval.return_value = False
+
+    assert await reaper.runOnce(mock_pool, [mock_pool]) is None
+    mock_conn.execute.assert_not_called()
+    assert reaper.stats()["skipped"] == 1
+
+
+@pytest.mark.asyncio
+@patch("src.reaper.RATE_LIMIT_DURATION_SECONDS", 600)
+async def test_reaper_keeps_rate_limits_for_a_window():
+    assert create_reaper(rate_limit_retention=60).rate_limit_retention == 600
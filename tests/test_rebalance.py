@@ -0,0 +1,120 @@
+"""Integration tests against several local Postgres databases.
+
+They run when TEST_SHARD_DATABASE_URLS lists at least two databases, e.g.
+
+    TEST_SHARD_DATABASE_URLS=postgresql://localhost:5432/shard0,\\
+postgresql://localhost:5433/shard1 pytest tests/test_rebalance.py
+
+Every url_mappings row in those databases is deleted.
+"""
+
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import asyncpg
+import pytest
+
+from src.helpers import shorten_url
+from src.models import URLMapping
+from src.rebalance import rebalance
+from src.repository import ShardRouter, copyURLMappings, getURLMapping
+
+SHARD_URLS = [
+    url for url in os.getenv("TEST_SHARD_DATABASE_URLS", "").split(",") if url
+]
+INIT_SQL = Path(__file__).parent.parent / "init.sql"
+
+pytestmark = pytest.mark.skipif(
+    len(SHARD_URLS) < 2, reason="TEST_SHARD_DATABASE_URLS needs two databases"
+)
+
+
+# Fixtures
+@pytest.fixture
+async def pools():
+    pools = [
+        await asyncpg.create_pool(url, min_size=1, max_size=4) for url in SHARD_URLS
+    ]
+    for pool in pools:
+        await pool.execute(INIT_SQL.read_text())
+        await pool.execute("DELETE FROM url_mappings")
+    yield pools
+    for pool in pools:
+        await pool.execute("DELETE FROM url_mappings")
+        await pool.close()
+
+
+def make_mappings(count: int) -> list[URLMapping]:
+    created_at = datetime.now(timezone.utc)
+    return [
+        URLMapping(
+            slug=shorten_url(f"https://example.com/{i}"),
+            original_url=f"https://example.com/{i}",
+            created_at=created_at,
+        )
+        for i in range(count)
+    ]
+
+
+async def count_rows(pool) -> int:
+    return await pool.fetchval("SELECT count(*) FROM url_mappings")
+
+
+# Tests rebalance
+@pytest.mark.asyncio
+async def test_rebalance_moves_rows_to_their_shard(pools):
+    mappings = make_mappings(500)
+    async with pools[0].acquire() as conn:
+        await copyURLMappings(conn, mappings)
+
+    counts = await rebalance(pools, copy_only=True)
+
+    assert counts["misplaced"] > 0
+    assert counts["deleted"] == 0
+    assert await count_rows(pools[0]) == len(mappings)
+
+    counts = await rebalance(pools)
+
+    assert counts["deleted"] == counts["misplaced"]
+    assert sum([await count_rows(pool) for pool in pools]) == len(mappings)
+    router = ShardRouter()
+    router.pools = pools
+    for mapping in mappings:
+        async with pools[router.shardFor(mapping.slug)].acquire() as conn:
+            assert await getURLMapping(conn, mapping.slug) == mapping
+    assert (await rebalance(pools))["misplaced"] == 0
+
+
+@pytest.mark.asyncio
+async def test_rebalance_keeps_newest_copy(pools):
+    router = ShardRouter()
+    router.pools = pools
+    old = next(
+        mapping for mapping in make_mappings(50) if router.shardFor(mapping.slug) == 1
+    )
+    new = old.model_copy(
+        update={
+            "original_url": "https://example.com/new",
+            "created_at": datetime.now(timezone.utc),
+        }
+    )
+    async with pools[0].acquire() as conn:
+        await copyURLMappings(conn, [old])
+    async with pools[1].acquire() as conn:
+        await copyURLMappings(conn, [new])
+
+    await rebalance(pools)
+
+    async with pools[1].acquire() as conn:
+        assert await getURLMapping(conn, old.slug) == new
+    assert await count_rows(pools[0]) == 0
+
+
+@pytest.mark.asyncio
+async def test_url_mappings_is_partitioned(pools):
+    partitions = await pools[0].fetchval(
+        "SELECT count(*) FROM pg_inherits WHERE inhparent = 'url_mappings'::regclass"
+    )
+
+    assert partitions in (0, 16)
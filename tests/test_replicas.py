@@ -0,0 +1,89 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.replicas import (
+    REPLICA_WRITE_MARKER_SECONDS,
+    ReplicaSet,
+    markWritten,
+    recentlyWritten,
+)
+
+TEST_SLUG = "abc1234"
+
+
+# Fixtures
+@pytest.fixture
+def replicas():
+    replicas = ReplicaSet(retry_seconds=60)
+    replicas.pools = [MagicMock(name="first"), MagicMock(name="second")]
+    return replicas
+
+
+# Tests ReplicaSet
+def test_replica_set_round_robin(replicas):
+    first, second = replicas.pools
+
+    assert [replicas.choose() for _ in range(3)] == [first, second, first]
+
+
+def test_replica_set_skips_failed_replicas(replicas):
+    first, second = replicas.pools
+
+    replicas.markFailed(first)
+
+    assert [replicas.choose() for _ in range(2)] == [second, second]
+    replicas.markFailed(second)
+    assert replicas.choose() is None
+    assert replicas.stats()["healthy"] == 0
+    assert replicas.stats()["failures"] == 2
+
+
+@pytest.mark.asyncio
+async def test_replica_set_connect_skips_unreachable():
+    replicas = ReplicaSet(retry_seconds=60)
+    pool = MagicMock()
+
+    with patch(
+        "src.replicas.asyncpg.create_pool",
+        AsyncMock(side_effect=[OSError("refused"), pool]),
+    ):
+        await replicas.connect(["postgresql://down", "postgresql://up"])
+
+    assert replicas.pools == [pool]
+
+
+# Tests markWritten
+@pytest.mark.asyncio
+async def test_mark_written_without_replicas():
+    mock_redis = MagicMock()
+
+    await markWritten(mock_redis, TEST_SLUG)
+
+    mock_redis.pipeline.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_mark_written(replicas):
+    pipe = MagicMock()
+    pipe.__aenter__.return_value = pipe
+    pipe.execute = AsyncMock()
+    mock_redis = MagicMock()
+    mock_redis.pipeline.return_value = pipe
+
+    with patch("src.replicas.replica_set", replicas):
+        await markWritten(mock_redis, TEST_SLUG)
+
+    pipe.set.assert_called_once_with(
+        f"written:{TEST_SLUG}", 1, ex=REPLICA_WRITE_MARKER_SECONDS
+    )
+    pipe.execute.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_recently_written():
+    mock_redis = AsyncMock()
+    mock_redis.exists.return_value = 1
+
+    assert await recentlyWritten(mock_redis, TEST_SLUG)
+    mock_redis.exists.assert_called_once_with(f"written:{TEST_SLUG}")
@@ -0,0 +1,109 @@
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.helpers import shorten_url
+from src.repository import (
+    ObservedConnection,
+    ShardRouter,
+    importURLMappings,
+    jumpHash,
+)
+
+SLUGS = [shorten_url(f"https://example.com/{i}") for i in range(2000)]
+
+
+# Fixtures
+@pytest.fixture
+def router():
+    router = ShardRouter()
+    router.pools = [MagicMock(name=f"shard{i}") for i in range(4)]
+    return router
+
+
+# Tests jumpHash
+def test_jump_hash_is_balanced():
+    counts = [0] * 4
+    for key in range(10000):
+        counts[jumpHash(key * 7919, 4)] += 1
+
+    assert all(2200 < count < 2800 for count in counts)
+
+
+def test_jump_hash_only_moves_keys_to_new_bucket():
+    for key in range(10000):
+        assert jumpHash(key, 5) in (jumpHash(key, 4), 4)
+
+
+# Tests ShardRouter
+def test_shard_router_single_database():
+    assert ShardRouter().shardFor(SLUGS[0]) == 0
+    assert not ShardRouter().enabled
+
+
+def test_shard_router_spreads_slugs(router):
+    shards = {router.shardFor(slug) for slug in SLUGS}
+
+    assert shards == {0, 1, 2, 3}
+    assert router.shardFor(SLUGS[0]) == router.shardFor(SLUGS[0])
+    assert router.shardFor(SLUGS[0], shards=1) == 0
+
+
+def test_shard_router_accepts_any_path(router):
+    assert 0 <= router.shardFor("favicon.ico") < 4
+
+
+def test_shard_router_groups_by_shard(router):
+    groups = router.groupByShard(SLUGS)
+
+    assert sorted(slug for slugs in groups.values() for slug in slugs) == sorted(SLUGS)
+    for shard, slugs in groups.items():
+        assert all(router.shardFor(slug) == shard for slug in slugs)
+
+
+@pytest.mark.asyncio
+async def test_shard_router_connection(router):
+    primary_conn = AsyncMock()
+    shard_conn = AsyncMock()
+    router.pools[2].acquire.return_value.__aenter__.return_value = shard_conn
+
+    async with router.connection(primary_conn, 0) as conn:
+        assert conn is primary_conn
+    async with router.connection(primary_conn, 2) as conn:
+        assert isinstance(conn, ObservedConnection)
+        await conn.fetchval("SELECT 1")
+    shard_conn.fetchval.assert_awaited_once_with("SELECT 1")
+
+
+# Tests importURLMappings
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "overwrite, conflict", [(False, "DO NOTHING"), (True, "DO UPDATE")]
+)
+async def test_import_url_mappings(overwrite, conflict):
+    conn = MagicMock()
+    conn.transaction.return_value.__aenter__ = AsyncMock()
+    conn.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+    conn.execute = AsyncMock()
+    conn.copy_records_to_table = AsyncMock()
+    row = {
+        "slug": SLUGS[0],
+        "original_url": "https://example.com/0",
+        "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+        "permanent": False,
+        "expires_at": None,
+        "inserted": True,
+    }
+    collision = {"slug": SLUGS[1], "original_url": "a", "existing_url": "b"}
+    conn.fetch = AsyncMock(side_effect=[[collision], [row]])
+    records = [(SLUGS[0], "https://example.com/0", None, False, None)]
+
+    written, inserted, collisions = await importURLMappings(conn, records, overwrite)
+
+    assert [mapping.slug for mapping in written] == [SLUGS[0]]
+    assert inserted == 1
+    assert collisions == [(SLUGS[1], "a", "b")]
+    assert conn.copy_records_to_table.call_args.args[0] == "url_mappings_import"
+    assert conn.copy_records_to_table.call_args.kwargs["records"] == records
+    assert conflict in conn.fetch.call_args.args[0]
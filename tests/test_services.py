@@ -1,22 +1,42 @@
-from datetime import datetime
-from unittest.mock import AsyncMock, patch
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
+from benchmarks.standins import StandinConnection, StandinDatabase, StandinRedis
+from src.cache import url_cache
+from src.helpers import shorten_url
+from src.metrics import writes_avoided
+from src.models import URLMapping
+from src.replicas import ReplicaSet
+from src.repository import ShardRouter
 from src.services import (
     CACHE_EXPIRY_SECONDS,
+    NEGATIVE_CACHE_SECONDS,
     RATE_LIMIT_REQUESTS,
     RateLimitExceeded,
     RecordNotFound,
     UpsertFailed,
+    cacheTTL,
     checkRateLimit,
     findMatchingURL,
     generateSlug,
+    generateSlugs,
+    mappingTTL,
 )
+from src.sharedcache import SharedSlugCache
+from src.slugs import SLUG_ID_KEY, SequenceSlugs, sequenceSlug
 
 TEST_IP = "127.0.0.1"
 TEST_SLUG = "abc1234"
 TEST_URL = "https://example.com"
+TEST_MAPPING = URLMapping(
+    slug=TEST_SLUG,
+    original_url=TEST_URL,
+    created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+)
+TEST_CACHE_VALUE = TEST_MAPPING.to_cache_value()
 
 
 # Fixtures
@@ -39,6 +59,29 @@ def create_rate_limit_data(request_count):
     }
 
 
+# Tests cacheTTL
+def test_cache_ttl_default():
+    assert cacheTTL() == CACHE_EXPIRY_SECONDS
+
+
+@patch("src.services.CACHE_TTL_JITTER_SECONDS", 300)
+@patch("src.services.CACHE_STALE_SECONDS", 60)
+def test_cache_ttl_jitter_and_stale_window():
+    ttls = {cacheTTL() for _ in range(200)}
+    assert min(ttls) >= CACHE_EXPIRY_SECONDS + 60
+    assert max(ttls) <= CACHE_EXPIRY_SECONDS + 360
+    assert len(ttls) > 1
+
+
+# Tests mappingTTL
+def test_mapping_ttl_capped_by_expiry():
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=90)
+    expiring = TEST_MAPPING.model_copy(update={"expires_at": expires_at})
+
+    assert mappingTTL(TEST_MAPPING) == CACHE_EXPIRY_SECONDS
+    assert 89 <= mappingTTL(expiring) <= 91
+
+
 # Tests checkRateLimit
 @pytest.mark.asyncio
 @pytest.mark.parametrize(
@@ -49,35 +92,33 @@ def create_rate_limit_data(request_count):
         (RATE_LIMIT_REQUESTS + 1, RateLimitExceeded),
     ],
 )
-async def test_check_rate_limit(mock_conn, request_count, expected_exception):
+async def test_check_rate_limit(
+    mock_conn, mock_redis, request_count, expected_exception
+):
     mock_conn.fetchrow.return_value = create_rate_limit_data(request_count)
 
     if expected_exception:
         with pytest.raises(expected_exception):
-            await checkRateLimit(mock_conn, TEST_IP)
+            await checkRateLimit(mock_conn, mock_redis, TEST_IP)
     else:
-        await checkRateLimit(mock_conn, TEST_IP)
+        await checkRateLimit(mock_conn, mock_redis, TEST_IP)
 
     mock_conn.fetchrow.assert_called_once()
 
 
 @pytest.mark.asyncio
-async def test_check_rate_limit_not_found(mock_conn):
+async def test_check_rate_limit_not_found(mock_conn, mock_redis):
     mock_conn.fetchrow.return_value = None
     with pytest.raises(RecordNotFound):
-        await checkRateLimit(mock_conn, TEST_IP)
+        await checkRateLimit(mock_conn, mock_redis, TEST_IP)
 
 
 # Tests generateSlug
 @pytest.mark.asyncio
-@patch("src.services.shorten_url")
+@patch("src.slugs.shorten_url")
 async def test_generate_slug_success(mock_shorten_url, mock_conn, mock_redis):
     mock_shorten_url.return_value = TEST_SLUG
-    mock_conn.fetchrow.return_value = {
-        "slug": TEST_SLUG,
-        "original_url": TEST_URL,
-        "created_at": datetime.now(),
-    }
+    mock_conn.fetchrow.return_value = TEST_MAPPING.model_dump()
     mock_redis.setex.return_value = True
 
     result = await generateSlug(mock_conn, mock_redis, TEST_URL)
@@ -85,12 +126,13 @@ async def test_generate_slug_success(mock_shorten_url, mock_conn, mock_redis):
     assert result.original_url == TEST_URL
     assert result.slug == TEST_SLUG
     mock_redis.setex.assert_called_once_with(
-        f"url:{TEST_SLUG}", CACHE_EXPIRY_SECONDS, TEST_URL
+        f"url:{TEST_SLUG}", CACHE_EXPIRY_SECONDS, TEST_CACHE_VALUE
     )
+    mock_redis.publish.assert_called_once()
 
 
 @pytest.mark.asyncio
-@patch("src.services.shorten_url")
+@patch("src.slugs.shorten_url")
 async def test_generate_slug_upsert_failed(mock_shorten_url, mock_conn, mock_redis):
     mock_shorten_url.return_value = TEST_SLUG
     mock_conn.fetchrow.return_value = None
@@ -99,14 +141,152 @@ async def test_generate_slug_upsert_failed(mock_shorten_url, mock_conn, mock_red
         await generateSlug(mock_conn, mock_redis, TEST_URL)
 
 
+@pytest.mark.asyncio
+@patch("src.services.SKIP_UNCHANGED_WRITES", True)
+@patch("src.slugs.shorten_url")
+async def test_generate_slug_unchanged_in_cache(
+    mock_shorten_url, mock_conn, mock_redis
+):
+    mock_shorten_url.return_value = TEST_SLUG
+    mock_redis.get.return_value = TEST_CACHE_VALUE
+    avoided = writes_avoided.value("cache")
+
+    result = await generateSlug(mock_conn, mock_redis, TEST_URL)
+
+    assert result == TEST_MAPPING
+    mock_conn.fetchrow.assert_not_called()
+    mock_redis.setex.assert_not_called()
+    mock_redis.publish.assert_not_called()
+    assert writes_avoided.value("cache") == avoided + 1
+
+
+@pytest.mark.asyncio
+@patch("src.services.SKIP_UNCHANGED_WRITES", True)
+@patch("src.slugs.shorten_url")
+async def test_generate_slug_unchanged_in_database(
+    mock_shorten_url, mock_conn, mock_redis
+):
+    mock_shorten_url.return_value = TEST_SLUG
+    mock_redis.get.return_value = None
+    mock_conn.fetchrow.side_effect = [None, TEST_MAPPING.model_dump()]
+    avoided = writes_avoided.value("database")
+
+    result = await generateSlug(mock_conn, mock_redis, TEST_URL)
+
+    assert result == TEST_MAPPING
+    assert "IS DISTINCT FROM" in mock_conn.fetchrow.call_args_list[0].args[0]
+    mock_redis.setex.assert_called_once()
+    mock_redis.publish.assert_not_called()
+    assert writes_avoided.value("database") == avoided + 1
+
+
+@pytest.mark.asyncio
+@patch("src.services.SKIP_UNCHANGED_WRITES", True)
+@patch("src.slugs.shorten_url")
+async def test_generate_slug_changed_options_are_written(
+    mock_shorten_url, mock_conn, mock_redis
+):
+    mock_shorten_url.return_value = TEST_SLUG
+    mock_redis.get.return_value = TEST_CACHE_VALUE
+    permanent = TEST_MAPPING.model_copy(update={"permanent": True})
+    mock_conn.fetchrow.return_value = permanent.model_dump()
+
+    result = await generateSlug(mock_conn, mock_redis, TEST_URL, permanent=True)
+
+    assert result == permanent
+    mock_conn.fetchrow.assert_called_once()
+    mock_redis.publish.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_generate_slug_uses_slug_allocator(mock_conn, mock_redis):
+    allocator = SequenceSlugs("redis", block_size=10)
+    mock_redis.incrby.return_value = 10
+    mock_conn.fetch.side_effect = lambda query, slugs, *args: [
+        {**TEST_MAPPING.model_dump(), "slug": slug} for slug in slugs
+    ]
+
+    with patch("src.services.slug_allocator", allocator):
+        first = await generateSlug(mock_conn, mock_redis, TEST_URL)
+        second = await generateSlug(mock_conn, mock_redis, TEST_URL)
+
+    assert (first.slug, second.slug) == (sequenceSlug(1), sequenceSlug(2))
+    mock_redis.incrby.assert_called_once()
+    assert "DO NOTHING" in mock_conn.fetch.call_args.args[0]
+
+
+@pytest.mark.asyncio
+async def test_sequence_slugs_never_overwrite_existing_rows():
+    # The Redis counter went backwards, e.g. restored from an older snapshot.
+    db, redis = StandinDatabase(), StandinRedis()
+    conn = StandinConnection(db)
+    allocator = SequenceSlugs("redis", block_size=2)
+
+    with patch("src.services.slug_allocator", allocator):
+        taken = [
+            await generateSlug(conn, redis, f"https://old.example/{i}") for i in "abc"
+        ]
+        await redis.delete(SLUG_ID_KEY)
+        allocator._ids.clear()
+        batch = await generateSlugs(conn, redis, [TEST_URL, "https://example.org"])
+
+    for mapping in taken:
+        assert db.url_mappings[mapping.slug]["original_url"] == mapping.original_url
+    assert [mapping.slug for mapping in batch] == [sequenceSlug(4), sequenceSlug(5)]
+    assert allocator.stats()["recoveries"] == 1
+
+
+# Tests generateSlugs
+@pytest.mark.asyncio
+@patch("src.slugs.shorten_url")
+async def test_generate_slugs_success(mock_shorten_url, mock_conn, mock_redis):
+    urls = [TEST_URL, "https://example.org", TEST_URL]
+    mock_shorten_url.side_effect = lambda url: "a" * 6 + url[-1]
+    mock_conn.fetch.return_value = [
+        {**TEST_MAPPING.model_dump(), "slug": "aaaaaam"},
+        {
+            **TEST_MAPPING.model_dump(),
+            "slug": "aaaaaag",
+            "original_url": "https://example.org",
+        },
+    ]
+    pipe = MagicMock()
+    pipe.execute = AsyncMock()
+    mock_redis.pipeline = MagicMock(return_value=pipe)
+    pipe.__aenter__.return_value = pipe
+
+    result = await generateSlugs(mock_conn, mock_redis, urls)
+
+    assert [mapping.original_url for mapping in result] == urls
+    mock_conn.fetch.assert_called_once()
+    assert mock_conn.fetch.call_args.args[1:] == (
+        ["aaaaaam", "aaaaaag"],
+        [TEST_URL, "https://example.org"],
+        False,
+        None,
+    )
+    assert pipe.setex.call_count == 2
+    pipe.execute.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("src.slugs.shorten_url")
+async def test_generate_slugs_upsert_failed(mock_shorten_url, mock_conn, mock_redis):
+    mock_shorten_url.return_value = TEST_SLUG
+    mock_conn.fetch.return_value = []
+
+    with pytest.raises(UpsertFailed):
+        await generateSlugs(mock_conn, mock_redis, [TEST_URL])
+
+
 # Tests findMatchingURL
 @pytest.mark.asyncio
 async def test_find_matching_url_cache_hit(mock_conn, mock_redis):
-    mock_redis.get.return_value = TEST_URL
+    mock_redis.get.return_value = TEST_CACHE_VALUE
 
     result = await findMatchingURL(mock_conn, mock_redis, TEST_SLUG)
 
-    assert result == TEST_URL
+    assert result == TEST_MAPPING
     mock_conn.fetchrow.assert_not_called()
     mock_redis.get.assert_called_once_with(f"url:{TEST_SLUG}")
 
@@ -114,17 +294,13 @@ async def test_find_matching_url_cache_hit(mock_conn, mock_redis):
 @pytest.mark.asyncio
 async def test_find_matching_url_cache_miss_db_hit(mock_conn, mock_redis):
     mock_redis.get.return_value = None
-    mock_conn.fetchrow.return_value = {
-        "slug": TEST_SLUG,
-        "original_url": TEST_URL,
-        "created_at": datetime.now(),
-    }
+    mock_conn.fetchrow.return_value = TEST_MAPPING.model_dump()
 
     result = await findMatchingURL(mock_conn, mock_redis, TEST_SLUG)
 
-    assert result == TEST_URL
+    assert result == TEST_MAPPING
     mock_redis.setex.assert_called_once_with(
-        f"url:{TEST_SLUG}", CACHE_EXPIRY_SECONDS, TEST_URL
+        f"url:{TEST_SLUG}", CACHE_EXPIRY_SECONDS, TEST_CACHE_VALUE
     )
     mock_conn.fetchrow.assert_called_once()
 
@@ -136,3 +312,290 @@ async def test_find_matching_url_not_found(mock_conn, mock_redis):
 
     with pytest.raises(RecordNotFound):
         await findMatchingURL(mock_conn, mock_redis, TEST_SLUG)
+
+
+@pytest.mark.asyncio
+async def test_find_matching_url_negative_cache(mock_conn, mock_redis):
+    mock_redis.get.return_value = ""
+
+    with pytest.raises(RecordNotFound):
+        await findMatchingURL(mock_conn, mock_redis, TEST_SLUG)
+
+    mock_conn.fetchrow.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_find_matching_url_not_found_is_cached(mock_conn, mock_redis):
+    mock_redis.get.return_value = None
+    mock_conn.fetchrow.return_value = None
+
+    with pytest.raises(RecordNotFound):
+        await findMatchingURL(mock_conn, mock_redis, TEST_SLUG)
+    with pytest.raises(RecordNotFound):
+        await findMatchingURL(mock_conn, mock_redis, TEST_SLUG)
+
+    mock_conn.fetchrow.assert_called_once()
+    mock_redis.setex.assert_called_once_with(
+        f"url:{TEST_SLUG}", NEGATIVE_CACHE_SECONDS, ""
+    )
+
+
+@pytest.mark.asyncio
+@patch("src.services.slug_filter", new_callable=set)
+async def test_find_matching_url_rejected_by_slug_filter(
+    mock_slug_filter, mock_conn, mock_redis
+):
+    mock_redis.get.return_value = None
+
+    with pytest.raises(RecordNotFound):
+        await findMatchingURL(mock_conn, mock_redis, TEST_SLUG)
+
+    mock_conn.fetchrow.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_find_matching_url_coalesces_misses(mock_conn, mock_redis):
+    mock_redis.get.return_value = None
+
+    async def slow_fetchrow(*args):
+        await asyncio.sleep(0.01)
+        return TEST_MAPPING.model_dump()
+
+    mock_conn.fetchrow.side_effect = slow_fetchrow
+
+    results = await asyncio.gather(
+        *(findMatchingURL(mock_conn, mock_redis, TEST_SLUG) for _ in range(5))
+    )
+
+    assert results == [TEST_MAPPING] * 5
+    mock_conn.fetchrow.assert_called_once()
+    mock_redis.setex.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("src.services.SINGLE_FLIGHT_LOCK_MS", 20)
+async def test_find_matching_url_waits_for_lock_holder(mock_conn, mock_redis):
+    mock_redis.set.return_value = None
+    mock_redis.get.side_effect = [None, None, TEST_CACHE_VALUE]
+
+    result = await findMatchingURL(mock_conn, mock_redis, TEST_SLUG)
+
+    assert result == TEST_MAPPING
+    mock_conn.fetchrow.assert_not_called()
+    mock_redis.delete.assert_not_called()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ttl, revalidated", [(30, True), (600, False)])
+@patch("src.services.CACHE_STALE_SECONDS", 60)
+@patch("src.services._revalidating", new_callable=set)
+@patch("src.services._revalidateURL", new_callable=AsyncMock)
+async def test_find_matching_url_stale_while_revalidate(
+    mock_revalidate, mock_revalidating, mock_conn, mock_redis, ttl, revalidated
+):
+    pipe = MagicMock()
+    pipe.__aenter__.return_value = pipe
+    pipe.get.return_value = pipe
+    pipe.ttl.return_value = pipe
+    pipe.execute = AsyncMock(return_value=[TEST_CACHE_VALUE, ttl])
+    mock_redis.pipeline = MagicMock(return_value=pipe)
+
+    result = await findMatchingURL(mock_conn, mock_redis, TEST_SLUG)
+    await asyncio.sleep(0)
+
+    assert result == TEST_MAPPING
+    assert mock_revalidate.called is revalidated
+    mock_conn.fetchrow.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_find_matching_url_local_cache_hit(mock_conn, mock_redis):
+    url_cache.set(TEST_SLUG, TEST_MAPPING)
+
+    result = await findMatchingURL(mock_conn, mock_redis, TEST_SLUG)
+
+    assert result == TEST_MAPPING
+    mock_redis.get.assert_not_called()
+    mock_conn.fetchrow.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_find_matching_url_ignores_legacy_cache_value(mock_conn, mock_redis):
+    mock_redis.get.return_value = TEST_URL
+    mock_conn.fetchrow.return_value = TEST_MAPPING.model_dump()
+
+    result = await findMatchingURL(mock_conn, mock_redis, TEST_SLUG)
+
+    assert result == TEST_MAPPING
+    mock_conn.fetchrow.assert_called_once()
+
+
+# Tests read replica routing
+@pytest.fixture
+def replica():
+    replica_conn = AsyncMock()
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__.return_value = replica_conn
+    replicas = ReplicaSet(retry_seconds=60)
+    replicas.pools = [pool]
+    with patch("src.services.replica_set", replicas):
+        yield replicas, replica_conn
+
+
+@pytest.mark.asyncio
+async def test_find_matching_url_reads_from_replica(mock_conn, mock_redis, replica):
+    replicas, replica_conn = replica
+    mock_redis.get.return_value = None
+    mock_redis.exists.return_value = 0
+    replica_conn.fetchrow.return_value = TEST_MAPPING.model_dump()
+
+    result = await findMatchingURL(mock_conn, mock_redis, TEST_SLUG)
+
+    assert result == TEST_MAPPING
+    mock_conn.fetchrow.assert_not_called()
+    assert replicas.reads == 1
+
+
+@pytest.mark.asyncio
+async def test_find_matching_url_recently_written_reads_primary(
+    mock_conn, mock_redis, replica
+):
+    replicas, replica_conn = replica
+    mock_redis.get.return_value = None
+    mock_redis.exists.return_value = 1
+    mock_conn.fetchrow.return_value = TEST_MAPPING.model_dump()
+
+    result = await findMatchingURL(mock_conn, mock_redis, TEST_SLUG)
+
+    assert result == TEST_MAPPING
+    replica_conn.fetchrow.assert_not_called()
+    assert replicas.fallbacks == 1
+
+
+@pytest.mark.asyncio
+async def test_find_matching_url_replica_failure_reads_primary(
+    mock_conn, mock_redis, replica
+):
+    replicas, replica_conn = replica
+    mock_redis.get.return_value = None
+    mock_redis.exists.return_value = 0
+    replica_conn.fetchrow.side_effect = OSError("replica down")
+    mock_conn.fetchrow.return_value = TEST_MAPPING.model_dump()
+
+    result = await findMatchingURL(mock_conn, mock_redis, TEST_SLUG)
+
+    assert result == TEST_MAPPING
+    assert replicas.choose() is None
+    assert replicas.failures == 1
+
+
+# Tests shard routing
+@pytest.mark.asyncio
+@patch("src.slugs.shorten_url")
+async def test_generate_slugs_routes_to_shards(mock_shorten_url, mock_conn, mock_redis):
+    router = ShardRouter()
+    shard_conn = AsyncMock()
+    router.pools = [MagicMock(), MagicMock()]
+    router.pools[1].acquire.return_value.__aenter__.return_value = shard_conn
+    slugs = {url: shorten_url(url) for url in ["https://a.com", "https://b.com"]}
+    mock_shorten_url.side_effect = slugs.get
+    by_shard = {router.shardFor(slug): slug for slug in slugs.values()}
+    assert set(by_shard) == {0, 1}
+
+    def rows(*args):
+        return [
+            {**TEST_MAPPING.model_dump(), "slug": slug, "original_url": url}
+            for slug, url in zip(args[1], args[2])
+        ]
+
+    mock_conn.fetch.side_effect = rows
+    shard_conn.fetch.side_effect = rows
+    pipe = MagicMock()
+    pipe.__aenter__.return_value = pipe
+    pipe.execute = AsyncMock()
+    mock_redis.pipeline = MagicMock(return_value=pipe)
+
+    with patch("src.services.shard_router", router):
+        result = await generateSlugs(mock_conn, mock_redis, list(slugs))
+
+    assert [mapping.slug for mapping in result] == list(slugs.values())
+    assert mock_conn.fetch.call_args.args[1] == [by_shard[0]]
+    assert shard_conn.fetch.call_args.args[1] == [by_shard[1]]
+
+
+@pytest.mark.asyncio
+async def test_find_matching_url_expired_mapping(mock_conn, mock_redis):
+    expired = TEST_MAPPING.model_copy(
+        update={"expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}
+    )
+    mock_redis.get.return_value = expired.to_cache_value()
+
+    with pytest.raises(RecordNotFound):
+        await findMatchingURL(mock_conn, mock_redis, TEST_SLUG)
+    with pytest.raises(RecordNotFound):
+        await findMatchingURL(mock_conn, mock_redis, TEST_SLUG)
+
+    mock_conn.fetchrow.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("src.services.SKIP_UNCHANGED_WRITES", True)
+@patch("src.slugs.shorten_url")
+async def test_generate_slugs_writes_only_changed(
+    mock_shorten_url, mock_conn, mock_redis
+):
+    urls = [TEST_URL, "https://example.org"]
+    mock_shorten_url.side_effect = lambda url: "a" * 6 + url[-1]
+    changed = {**TEST_MAPPING.model_dump(), "slug": "aaaaaam"}
+    unchanged = {
+        **TEST_MAPPING.model_dump(),
+        "slug": "aaaaaag",
+        "original_url": "https://example.org",
+    }
+    mock_conn.fetch.side_effect = [[changed], [unchanged]]
+    pipe = MagicMock()
+    pipe.__aenter__.return_value = pipe
+    pipe.execute = AsyncMock()
+    mock_redis.pipeline = MagicMock(return_value=pipe)
+    avoided = writes_avoided.value("database")
+
+    result = await generateSlugs(mock_conn, mock_redis, urls)
+
+    assert [mapping.original_url for mapping in result] == urls
+    assert mock_conn.fetch.call_args.args[1] == ["aaaaaag"]
+    assert pipe.setex.call_count == 2
+    mock_redis.publish.assert_called_once()
+    assert mock_redis.publish.call_args.args[1] == "aaaaaam"
+    assert writes_avoided.value("database") == avoided + 1
+
+
+# Tests the shared cache
+@pytest.fixture
+def shared(tmp_path):
+    cache = SharedSlugCache(str(tmp_path / "slugs"), 64, 256, 60)
+    cache.open()
+    with patch("src.services.shared_cache", cache):
+        yield cache
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_find_matching_url_shared_cache_hit(mock_conn, mock_redis, shared):
+    shared.set(TEST_SLUG, TEST_MAPPING)
+
+    result = await findMatchingURL(mock_conn, mock_redis, TEST_SLUG)
+
+    assert result == TEST_MAPPING
+    assert url_cache.get(TEST_SLUG) == TEST_MAPPING
+    mock_redis.get.assert_not_called()
+    mock_conn.fetchrow.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_find_matching_url_fills_shared_cache(mock_conn, mock_redis, shared):
+    mock_redis.get.return_value = None
+    mock_conn.fetchrow.return_value = TEST_MAPPING.model_dump()
+
+    await findMatchingURL(mock_conn, mock_redis, TEST_SLUG)
+
+    assert shared.get(TEST_SLUG) == TEST_MAPPING
@@ -0,0 +1,155 @@
+import multiprocessing
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.models import URLMapping
+from src.sharedcache import FILE_HEADER_BYTES, SLOT_SEQUENCE, SharedSlugCache
+
+TEST_MAPPING = URLMapping(
+    slug="abc1234",
+    original_url="https://example.com/",
+    created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+)
+
+
+def mapping(slug: str, **fields) -> URLMapping:
+    return TEST_MAPPING.model_copy(update={"slug": slug, **fields})
+
+
+# Fixtures
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "slugs")
+
+
+@pytest.fixture
+def cache(path):
+    cache = SharedSlugCache(path, 64, 256, 60)
+    cache.open()
+    yield cache
+    cache.close()
+
+
+# Helper
+def fill(path: str, count: int):
+    writer = SharedSlugCache(path, 64, 256, 60)
+    writer.open()
+    for i in range(count):
+        writer.set(f"slug{i}", mapping(f"slug{i}", original_url=f"https://e.com/{i}"))
+    writer.close()
+
+
+# Tests SharedSlugCache
+def test_get_set_invalidate(cache):
+    assert cache.get(TEST_MAPPING.slug) is None
+
+    cache.set(TEST_MAPPING.slug, TEST_MAPPING)
+    assert cache.get(TEST_MAPPING.slug) == TEST_MAPPING
+
+    cache.invalidate(TEST_MAPPING.slug)
+    assert cache.get(TEST_MAPPING.slug) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_set_replaces_existing_entry(cache):
+    cache.set(TEST_MAPPING.slug, TEST_MAPPING)
+    updated = mapping(TEST_MAPPING.slug, original_url="https://other.com/")
+
+    cache.set(TEST_MAPPING.slug, updated)
+
+    assert cache.get(TEST_MAPPING.slug) == updated
+
+
+def test_disabled_until_opened(path):
+    cache = SharedSlugCache(path, 0, 256, 60)
+
+    cache.set(TEST_MAPPING.slug, TEST_MAPPING)
+
+    assert not cache.enabled
+    assert cache.get(TEST_MAPPING.slug) is None
+
+
+def test_entries_expire_with_mapping_and_ttl(cache):
+    expired = mapping("expired", expires_at=datetime.now(timezone.utc))
+    cache.set("expired", expired)
+    assert cache.get("expired") is None
+
+    cache.ttl = 0
+    cache.set(TEST_MAPPING.slug, TEST_MAPPING)
+    assert cache.get(TEST_MAPPING.slug) is None
+
+
+def test_entry_never_outlives_mapping(cache):
+    expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+    cache.set("soon", mapping("soon", expires_at=expires_at))
+
+    assert cache.get("soon").expires_at == expires_at
+
+
+def test_oversized_mappings_are_skipped(cache):
+    cache.set("long", mapping("long", original_url="https://e.com/" + "a" * 300))
+
+    assert cache.get("long") is None
+    assert cache.stats()["oversized"] == 1
+
+
+def test_full_neighbourhood_evicts(path):
+    cache = SharedSlugCache(path, 4, 256, 60)
+    cache.open()
+    for i in range(5):
+        cache.set(f"slug{i}", mapping(f"slug{i}"))
+
+    assert cache.stats()["evictions"] == 1
+    assert sum(cache.get(f"slug{i}") is not None for i in range(5)) == 4
+    cache.close()
+
+
+def test_read_during_write_is_a_miss(cache):
+    cache.set(TEST_MAPPING.slug, TEST_MAPPING)
+    _, offsets = cache._offsets(TEST_MAPPING.slug)
+    offset = next(o for o in offsets if SLOT_SEQUENCE.unpack_from(cache._map, o)[0])
+    sequence = SLOT_SEQUENCE.unpack_from(cache._map, offset)[0]
+
+    SLOT_SEQUENCE.pack_into(cache._map, offset, sequence + 1)
+    assert cache.get(TEST_MAPPING.slug) is None
+    assert cache.stats()["retries"] > 0
+
+    SLOT_SEQUENCE.pack_into(cache._map, offset, sequence)
+    assert cache.get(TEST_MAPPING.slug) == TEST_MAPPING
+
+
+def test_clear(path, cache):
+    cache.set(TEST_MAPPING.slug, TEST_MAPPING)
+    other = SharedSlugCache(path, 64, 256, 60)
+    other.open()
+
+    other.clear()
+
+    assert cache.get(TEST_MAPPING.slug) is None
+    cache.set(TEST_MAPPING.slug, TEST_MAPPING)
+    assert other.get(TEST_MAPPING.slug) == TEST_MAPPING
+    assert cache.stats()["evictions"] == 0
+    other.close()
+
+
+def test_other_geometry_resets_file(path, cache):
+    cache.set(TEST_MAPPING.slug, TEST_MAPPING)
+    cache.close()
+
+    other = SharedSlugCache(path, 32, 256, 60)
+    other.open()
+
+    assert other.get(TEST_MAPPING.slug) is None
+    other.close()
+
+
+def test_shared_across_processes(path, cache):
+    process = multiprocessing.get_context("spawn").Process(target=fill, args=(path, 20))
+    process.start()
+    process.join(30)
+
+    assert process.exitcode == 0
+    assert cache._map[:FILE_HEADER_BYTES].startswith(b"minime02")
+    assert cache.get("slug7").original_url == "https://e.com/7"
@@ -0,0 +1,137 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.fastpath import SLUG_PATH
+from src.helpers import DEFAULT_LENGTH, decode, shorten_url
+from src.slugs import (
+    SEQUENCE_SLUG_OFFSET,
+    SLUG_ID_KEY,
+    HashSlugs,
+    SequenceSlugs,
+    createSlugAllocator,
+    sequenceSlug,
+)
+
+TEST_URLS = ["https://example.com/a", "https://example.com/b", "https://example.com/c"]
+
+
+# Fixtures
+@pytest.fixture
+def mock_conn():
+    conn = AsyncMock()
+    next_id = iter(range(1, 1000))
+    conn.fetch.side_effect = lambda query, count: [
+        {"id": next(next_id)} for _ in range(count)
+    ]
+    return conn
+
+
+@pytest.fixture
+def mock_redis():
+    redis = AsyncMock()
+    counter = {"value": 0}
+
+    async def incrby(key, amount):
+        counter["value"] += amount
+        return counter["value"]
+
+    redis.incrby.side_effect = incrby
+    return redis
+
+
+# Tests sequenceSlug
+def test_sequence_slugs_are_longer_than_hash_slugs():
+    assert len(sequenceSlug(0)) == DEFAULT_LENGTH + 1
+    assert decode(sequenceSlug(12345)) == SEQUENCE_SLUG_OFFSET + 12345
+    assert all(len(shorten_url(url)) == DEFAULT_LENGTH for url in TEST_URLS)
+    assert SLUG_PATH.fullmatch(f"/{sequenceSlug(12345)}")
+
+
+# Tests HashSlugs
+@pytest.mark.asyncio
+async def test_hash_slugs(mock_conn, mock_redis):
+    slugs = await HashSlugs().allocate(mock_conn, mock_redis, TEST_URLS)
+
+    assert slugs == [shorten_url(url) for url in TEST_URLS]
+    mock_conn.fetch.assert_not_called()
+
+
+# Tests SequenceSlugs
+@pytest.mark.asyncio
+async def test_sequence_slugs_lease_blocks_from_postgres(mock_conn, mock_redis):
+    allocator = SequenceSlugs("postgres", block_size=2)
+
+    slugs = [
+        (await allocator.allocate(mock_conn, mock_redis, [url]))[0] for url in TEST_URLS
+    ]
+
+    assert slugs == [sequenceSlug(1), sequenceSlug(2), sequenceSlug(3)]
+    assert mock_conn.fetch.call_count == 2
+    assert "nextval('url_slug_ids')" in mock_conn.fetch.call_args.args[0]
+    assert allocator.stats()["available"] == 1
+
+
+@pytest.mark.asyncio
+async def test_sequence_slugs_lease_blocks_from_redis(mock_conn, mock_redis):
+    allocator = SequenceSlugs("redis", block_size=10)
+
+    first = await allocator.allocate(mock_conn, mock_redis, TEST_URLS)
+    second = await allocator.allocate(mock_conn, mock_redis, TEST_URLS)
+
+    assert first + second == [sequenceSlug(i) for i in range(1, 7)]
+    mock_redis.incrby.assert_called_once_with(SLUG_ID_KEY, 10)
+    mock_conn.fetch.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_sequence_slugs_batch_larger_than_block(mock_conn, mock_redis):
+    allocator = SequenceSlugs("postgres", block_size=2)
+
+    slugs = await allocator.allocate(mock_conn, mock_redis, TEST_URLS * 2)
+
+    assert len(set(slugs)) == 6
+    assert allocator.stats()["leases"] == 1
+
+
+@pytest.mark.asyncio
+async def test_sequence_slugs_concurrent_requests_share_a_lease(mock_redis):
+    allocator = SequenceSlugs("redis", block_size=100)
+
+    async def slow_incrby(key, amount):
+        await asyncio.sleep(0.01)
+        return amount
+
+    mock_redis.incrby.side_effect = slow_incrby
+
+    results = await asyncio.gather(
+        *(allocator.allocate(None, mock_redis, [url]) for url in TEST_URLS)
+    )
+
+    assert len({slug for slugs in results for slug in slugs}) == len(TEST_URLS)
+    mock_redis.incrby.assert_called_once()
+
+
+# Tests createSlugAllocator
+def test_create_slug_allocator():
+    assert isinstance(createSlugAllocator("hash"), HashSlugs)
+    assert isinstance(createSlugAllocator("sequence"), SequenceSlugs)
+    with pytest.raises(ValueError):
+        createSlugAllocator("uuid")
+    with pytest.raises(ValueError):
+        SequenceSlugs("memcached", 10)
+
+
+@pytest.mark.asyncio
+async def test_sequence_slugs_recover_past_stored_ids(mock_conn, mock_redis):
+    allocator = SequenceSlugs("postgres", block_size=10)
+    await allocator.allocate(mock_conn, mock_redis, TEST_URLS)
+    mock_conn.fetchval = AsyncMock(return_value=sequenceSlug(500))
+
+    await allocator.recover(mock_conn, mock_redis)
+
+    assert 'COLLATE "C"' in mock_conn.fetchval.call_args.args[0]
+    assert mock_conn.execute.call_args.args[1:] == (500,)
+    assert allocator.stats()["available"] == 0
+    assert allocator.stats()["recoveries"] == 1
@@ -0,0 +1,164 @@
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.cache import url_cache
+from src.helpers import shorten_url
+from src.models import URLMapping
+from src.warmup import CACHE_WARMUP_LOCK_KEY, CacheWarmer
+
+MAPPINGS = [
+    URLMapping(
+        slug=shorten_url(f"https://example.com/{i}"),
+        original_url=f"https://example.com/{i}",
+        created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    )
+    for i in range(5)
+]
+
+
+# Fixtures
+@pytest.fixture
+def mock_pool():
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__.return_value = AsyncMock()
+    return pool
+
+
+@pytest.fixture
+def mock_redis():
+    redis = AsyncMock()
+    redis.set.return_value = True
+    return redis
+
+
+@pytest.fixture
+def mock_set_many():
+    with patch("src.warmup.cache_layout.setMany", new_callable=AsyncMock) as mock:
+        yield mock
+
+
+def create_warmer(**overrides):
+    options = {
+        "max_slugs": 5,
+        "order": "recent",
+        "click_window": 3600,
+        "max_seconds": 5,
+        "max_bytes": 1024 * 1024,
+        "batch_size": 2,
+    }
+    options.update(overrides)
+    return CacheWarmer(**options)
+
+
+def stream(items):
+    async def fake_stream(conn, *args, prefetch=0):
+        for item in items:
+            yield item
+
+    return fake_stream
+
+
+# Tests CacheWarmer
+def test_warmer_rejects_unknown_order():
+    with pytest.raises(ValueError):
+        create_warmer(order="random")
+
+
+def test_warmer_disabled_is_ready():
+    warmer = create_warmer(max_slugs=0)
+
+    assert not warmer.enabled
+    assert warmer.ready
+
+
+@pytest.mark.asyncio
+async def test_warmer_loads_recent_links(mock_pool, mock_redis, mock_set_many):
+    warmer = create_warmer()
+    assert not warmer.ready
+
+    with patch("src.warmup.streamRecentURLMappings", stream(MAPPINGS)):
+        await warmer.run([mock_pool], mock_redis)
+
+    assert warmer.ready
+    assert warmer.loaded == len(MAPPINGS)
+    assert mock_set_many.call_count == 3
+    written = [entry for call in mock_set_many.call_args_list for entry in call[0][1]]
+    assert [slug for slug, _, _ in written] == [mapping.slug for mapping in MAPPINGS]
+    assert written[0][1] == MAPPINGS[0].to_cache_value()
+    assert url_cache.get(MAPPINGS[0].slug) == MAPPINGS[0]
+    mock_redis.set.assert_called_once_with(CACHE_WARMUP_LOCK_KEY, 1, nx=True, ex=5)
+
+
+@pytest.mark.asyncio
+async def test_warmer_loads_most_clicked_links_in_click_order(
+    mock_pool, mock_redis, mock_set_many
+):
+    warmer = create_warmer(order="clicks", batch_size=10)
+    clicked = [mapping.slug for mapping in reversed(MAPPINGS)]
+
+    with (
+        patch("src.warmup.streamMostClickedSlugs", stream(clicked)),
+        patch("src.warmup.getURLMappings", AsyncMock(return_value=MAPPINGS)),
+    ):
+        await warmer.run([mock_pool], mock_redis)
+
+    written = mock_set_many.call_args[0][1]
+    assert [slug for slug, _, _ in written] == clicked
+
+
+@pytest.mark.asyncio
+async def test_warmer_leaves_redis_to_the_first_worker(
+    mock_pool, mock_redis, mock_set_many
+):
+    warmer = create_warmer()
+    mock_redis.set.return_value = None
+
+    with patch("src.warmup.streamRecentURLMappings", stream(MAPPINGS)):
+        await warmer.run([mock_pool], mock_redis)
+
+    mock_set_many.assert_not_called()
+    assert url_cache.get(MAPPINGS[0].slug) == MAPPINGS[0]
+    assert warmer.stats()["filled_redis"] is False
+
+
+@pytest.mark.asyncio
+async def test_warmer_stops_at_memory_budget(mock_pool, mock_redis, mock_set_many):
+    warmer = create_warmer(max_bytes=1)
+
+    with patch("src.warmup.streamRecentURLMappings", stream(MAPPINGS)):
+        await warmer.run([mock_pool], mock_redis)
+
+    assert warmer.loaded == 2
+    assert warmer.budget_exhausted
+    assert warmer.ready
+
+
+@pytest.mark.asyncio
+async def test_warmer_stops_at_time_budget(mock_pool, mock_redis, mock_set_many):
+    warmer = create_warmer(max_seconds=0.05)
+
+    async def slow_stream(conn, *args, prefetch=0):
+        for mapping in MAPPINGS:
+            await asyncio.sleep(0.02)
+            yield mapping
+
+    with patch("src.warmup.streamRecentURLMappings", slow_stream):
+        await warmer.run([mock_pool], mock_redis)
+
+    assert 0 < warmer.loaded < len(MAPPINGS)
+    assert warmer.budget_exhausted
+    assert warmer.ready
+
+
+@pytest.mark.asyncio
+async def test_warmer_is_ready_after_failure(mock_pool, mock_redis, mock_set_many):
+    warmer = create_warmer()
+    mock_redis.set.side_effect = ConnectionError("redis down")
+
+    await warmer.run([mock_pool], mock_redis)
+
+    assert warmer.ready
+    assert warmer.loaded == 0